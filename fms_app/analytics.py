@@ -0,0 +1,177 @@
+# analytics.py
+"""Collection analytics behind the Analytics dashboard.
+
+* collection rate (paid / total fees) per department, batch and/or year;
+* fee-type mix: what each fee component adds to the charges, and what
+  each fee type brought in;
+* monthly collections with their month-over-month change, overall or per
+  department / batch.
+
+Rates and charges come from the wide fee columns; collections come from the
+payments in the fee ledger, which carry their timestamp. Paid amounts
+carried over from the spreadsheet (ledger "Opening balance") have no
+payment date and stay out of the collection figures.
+
+Everything is a grouped, vectorized aggregation over a long frame with one
+row per (student, year), built once per data version. ``analytics(store)``
+caches that frame and every result with ``store.cached``, so a dashboard
+rerun without a write in between is a dictionary lookup.
+"""
+import numpy as np
+import pandas as pd
+
+from datastore import FEE_COMPONENTS, YEARS
+from ledger import OPENING_BALANCE
+
+YEAR_LABELS = [f"{year} year" for year in YEARS]
+GROUP_COLUMNS = ["Department", "Batch", "Year"]
+MONTHLY_COLUMNS = ["Month", "Collected", "Payments", "Change (%)"]
+# the student columns the aggregates read
+STUDENT_COLUMNS = (["Register Number", "Department", "Batch"]
+                   + [f"{kind} {label}" for label in YEAR_LABELS for kind in ("Total Fees", "Paid Fees")]
+                   + [f"{fee_type} {label}" for fee_type in FEE_COMPONENTS for label in YEAR_LABELS])
+
+
+def _numbers(df, column):
+    if column not in df.columns:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[column], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+
+def _keys(df, column):
+    return df[column].fillna("").astype(str).to_numpy()
+
+
+# ---------------------- FRAMES ----------------------
+def year_totals(df):
+    """Total and paid fees per student and year: one row per (student, year)."""
+    n, years = len(df), len(YEAR_LABELS)
+    return pd.DataFrame({
+        "Student": np.tile(np.arange(n), years),
+        "Department": np.tile(_keys(df, "Department"), years),
+        "Batch": np.tile(_keys(df, "Batch"), years),
+        "Year": np.repeat(YEAR_LABELS, n),
+        "Total": np.concatenate([_numbers(df, f"Total Fees {label}") for label in YEAR_LABELS]),
+        "Paid": np.concatenate([_numbers(df, f"Paid Fees {label}") for label in YEAR_LABELS]),
+    })
+
+
+def fee_charges(df):
+    """Charged amount per fee component (rows) and year (columns)."""
+    sums = [[_numbers(df, f"{fee_type} {label}").sum() for label in YEAR_LABELS] for fee_type in FEE_COMPONENTS]
+    return pd.DataFrame(sums, index=pd.Index(FEE_COMPONENTS, name="Fee Type"), columns=YEAR_LABELS)
+
+
+def collections(payments, students):
+    """Dated ledger payments (Ledger.payments) with Month and the student's Department and Batch."""
+    paid = payments[payments["fee_type"] != OPENING_BALANCE]
+    keys = pd.DataFrame({column: _keys(students, column) for column in ["Register Number", "Department", "Batch"]})
+    keys = keys.drop_duplicates("Register Number", keep="last").set_index("Register Number")
+    joined = keys.reindex(paid["register_number"].astype(str))
+    return pd.DataFrame({
+        "Month": paid["ts"].astype(str).str[:7].to_numpy(),  # ISO timestamps: YYYY-MM
+        "Department": joined["Department"].fillna("").to_numpy(),
+        "Batch": joined["Batch"].fillna("").to_numpy(),
+        "Year": paid["year"].to_numpy(),
+        "Fee Type": paid["fee_type"].to_numpy(),
+        "Amount": paid["amount"].astype(float).to_numpy(),
+    })
+
+
+# ---------------------- AGGREGATES ----------------------
+def collection_rates(totals, by=("Department",)):
+    """Billed students, total, paid, remaining and collection rate per group.
+
+    totals is a year_totals() frame; by lists columns of GROUP_COLUMNS (empty
+    for one overall row). Only (student, year) pairs with fees count; a group
+    with nothing billed has a rate of 0.
+    """
+    by = list(by)
+    unknown = [column for column in by if column not in GROUP_COLUMNS]
+    if unknown:
+        raise ValueError(f"cannot group by {', '.join(unknown)}; expected {', '.join(GROUP_COLUMNS)}")
+    billed = totals[totals["Total"] > 0]
+    if by:
+        table = billed.groupby(by).agg(Students=("Student", "nunique"), Total=("Total", "sum"),
+                                       Paid=("Paid", "sum")).reset_index()
+    else:
+        table = pd.DataFrame({"Students": [billed["Student"].nunique()], "Total": [billed["Total"].sum()],
+                              "Paid": [billed["Paid"].sum()]})
+    table["Remaining"] = table["Total"] - table["Paid"]
+    rate = table["Paid"] / table["Total"].where(table["Total"] > 0) * 100
+    table["Collection Rate (%)"] = rate.round(1).fillna(0.0)
+    return table
+
+
+def fee_mix(charges, collected, year=None):
+    """Charged and collected amount per fee type with their shares (for year, or all years)."""
+    charged = charges[year] if year else charges.sum(axis=1)
+    paid = collected[collected["Year"] == year] if year else collected
+    table = pd.DataFrame({"Charged": charged}).join(
+        paid.groupby("Fee Type")["Amount"].sum().rename("Collected"), how="outer").fillna(0.0)
+    table = table[(table["Charged"] != 0) | (table["Collected"] != 0)]
+    for column in ["Charged", "Collected"]:
+        total = table[column].sum()
+        table[f"{column} (%)"] = (table[column] / total * 100).round(1) if total else 0.0
+    table = table.sort_values("Charged", ascending=False, kind="stable")
+    return table[["Charged", "Charged (%)", "Collected", "Collected (%)"]].rename_axis("Fee Type").reset_index()
+
+
+def monthly_collections(collected, by=None):
+    """Collections per calendar month, with no gaps between the first and last month.
+
+    Without by: Month, Collected, Payments and the month-over-month Change (%).
+    With by ("Department", "Batch", "Year" or "Fee Type"): amount collected
+    per month (rows) and group (columns).
+    """
+    if collected.empty:
+        return pd.DataFrame(columns=MONTHLY_COLUMNS) if by is None else pd.DataFrame(index=pd.Index([], name="Month"))
+    months = pd.period_range(collected["Month"].min(), collected["Month"].max(), freq="M").astype(str)
+    if by is None:
+        table = collected.groupby("Month").agg(Collected=("Amount", "sum"), Payments=("Amount", "size"))
+        table = table.reindex(months, fill_value=0)
+        change = table["Collected"].pct_change() * 100
+        table["Change (%)"] = change.replace([np.inf, -np.inf], np.nan).round(1)
+    else:
+        table = collected.pivot_table(index="Month", columns=by, values="Amount", aggfunc="sum", fill_value=0.0)
+        table = table.reindex(months, fill_value=0.0)
+    table.index.name = "Month"
+    return table.reset_index() if by is None else table
+
+
+# ---------------------- CACHED PER DATA VERSION ----------------------
+class Analytics:
+    """The aggregates above for one store, each computed once per data version."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def _cached(self, name, compute):
+        return self.store.cached(f"analytics/{name}", compute)
+
+    def _frames(self):
+        def build():
+            store = self.store
+            df = store.page(offset=0, limit=store.count(), columns=STUDENT_COLUMNS)
+            return year_totals(df), fee_charges(df), collections(store.ledger.payments(), df)
+        return self._cached("frames", build)
+
+    def collection_rates(self, by=("Department",)):
+        by = tuple(by)
+        return self._cached(f"rates/{'/'.join(by)}", lambda: collection_rates(self._frames()[0], by))
+
+    def overview(self):
+        """Students billed, total, paid, remaining and collection rate over everything (a dict)."""
+        row = self.collection_rates(()).iloc[0]
+        return {name: int(value) if name == "Students" else float(value) for name, value in row.items()}
+
+    def fee_mix(self, year=None):
+        return self._cached(f"fee_mix/{year}", lambda: fee_mix(self._frames()[1], self._frames()[2], year))
+
+    def monthly_collections(self, by=None):
+        return self._cached(f"monthly/{by}", lambda: monthly_collections(self._frames()[2], by))
+
+
+def analytics(store):
+    """Analytics over store (results are cached on the store)."""
+    return Analytics(store)
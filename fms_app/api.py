@@ -0,0 +1,350 @@
+# api.py
+"""Local JSON-over-HTTP API for the fee service (service.py).
+
+Standard library only: a threading HTTP server in front of one FeeService.
+Students are addressed by register number. Errors come back as
+``{"error": message}`` with 400 (bad input), 404 (unknown student or
+receipt), 409 (concurrent change; retry) or 500 (a bug; the traceback goes
+to the log).
+
+    GET  /health
+    GET  /students?q=<name or number>&limit=20        search
+    GET  /students?batch=&department=&offset=&limit=  one page of a batch / department
+    GET  /students/<register number>
+    GET  /students/<register number>/receipts
+    POST /students                      {"Register Number": ..., "Name": ..., fee columns...}
+    POST /payments                      {"register_number", "year", "amount", "fee_type"}
+    GET  /receipts/<receipt no>.pdf
+    POST /batch-postings                {"batch", "department", "year", "fee_type", "amount", "kind"}
+    GET  /dues                          outstanding per year
+    GET  /dues/groups?year=             per Batch x Department
+    GET  /dues/top?n=10&year=
+    GET  /dues/ageing
+    GET  /dues/students?year=&offset=&limit=
+    GET  /analytics                     overall collection rate
+    GET  /analytics/rates?by=Department,Year
+    GET  /analytics/fee-mix?year=
+    GET  /analytics/monthly?by=         by: Department, Batch, Year or Fee Type
+    POST /certificates                  {"kind": "TC", "register_number", "admission_no",
+                                         "date_of_admission", "date_of_leaving"} or
+                                        {"kind": "CC", "register_number", "title", "period_from", "period_to"}
+                                        -> application/pdf
+    GET  /metrics                       Prometheus text
+
+offset, limit and n must not be negative; limit and n are capped at 500.
+
+There is no authentication: bind it to localhost (the default) or put it
+behind a proxy that authenticates. ``--workers N`` forks N processes that
+share the listening socket; the stores are safe to write from several
+processes (see journal.FileLock and SQLite WAL). /metrics reports the
+worker that answers it.
+
+Command line:
+
+    python api.py [abi.xlsx] [--host 127.0.0.1] [--port 8502] [--workers 4] [--logo clglogo.jpeg]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import traceback
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from audit import audit_context
+from batch_posting import ALL
+from certificates import CC, TC
+from config import settings
+from metrics import registry as metrics, timed
+from service import GENERAL_PAYMENT, NotFoundError, fee_service
+from storage import ConflictError
+
+DEFAULT_PORT = 8502
+MAX_BODY = 1 << 20
+MAX_LIMIT = 500  # rows per page / search / top list
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _records(df):
+    """A frame as a list of row dicts (NaN -> null)."""
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def _student(series):
+    return json.loads(series.to_json(date_format="iso"))
+
+
+class Handler(BaseHTTPRequestHandler):
+    service = None
+    server_version = "FeesAPI/1.0"
+    routes = []  # (method, compiled pattern, route name, handler function name)
+
+    # ---------------------- PLUMBING ----------------------
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        for route_method, pattern, name, handler in self.routes:
+            match = pattern.fullmatch(url.path)
+            if route_method == method and match:
+                with timed("api_request", route=f"{method} {name}"), \
+                        audit_context(user=f"api@{self.client_address[0]}", action=f"{method} {name}"):
+                    self._call(handler, [unquote(g) for g in match.groups()])
+                return
+        self._send_json(404, {"error": f"no route for {method} {url.path}"})
+
+    def _call(self, handler, args):
+        try:
+            getattr(self, handler)(*args)
+        except HTTPError as exc:
+            self._send_json(exc.status, {"error": str(exc)})
+        except NotFoundError as exc:
+            self._send_json(404, {"error": exc.args[0] if exc.args else "not found"})
+        except ValueError as exc:
+            self._send_json(400, {"error": str(exc)})
+        except ConflictError as exc:
+            self._send_json(409, {"error": str(exc) or "the data changed; retry"})
+        except Exception:
+            self.log_error("%s failed:\n%s", handler, traceback.format_exc())
+            self._send_json(500, {"error": "internal server error"})
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            raise HTTPError(413, "request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as exc:
+            raise HTTPError(400, f"invalid JSON: {exc}") from None
+        if not isinstance(body, dict):
+            raise HTTPError(400, "expected a JSON object")
+        return body
+
+    def _int(self, name, default):
+        try:
+            value = int(self.query.get(name, default))
+        except ValueError:
+            raise HTTPError(400, f"{name} must be an integer") from None
+        if value < 0:
+            raise HTTPError(400, f"{name} must not be negative")
+        return value
+
+    def _limit(self, name="limit", default=50):
+        """A page size from the query, clamped to 1..MAX_LIMIT."""
+        return min(max(self._int(name, default), 1), MAX_LIMIT)
+
+    def _send(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, default=_json_default).encode("utf-8"), "application/json")
+
+    def log_message(self, format, *args):
+        # one line per request on stderr, like the default, but with the worker pid
+        sys.stderr.write(f"[{os.getpid()}] {self.address_string()} {format % args}\n")
+
+    # ---------------------- STUDENTS ----------------------
+    def get_health(self):
+        self._send_json(200, {"status": "ok", "version": self.service.store.version()})
+
+    def get_students(self):
+        if "q" in self.query:
+            self._send_json(200, _records(self.service.search(self.query["q"], limit=self._limit(default=20))))
+            return
+        total, page = self.service.students(self.query.get("batch", ALL), self.query.get("department", ALL),
+                                            offset=self._int("offset", 0), limit=self._limit())
+        self._send_json(200, {"total": total, "students": _records(page)})
+
+    def get_student(self, register_number):
+        service = self.service
+        self._send_json(200, _student(service.student(service.student_row(register_number))))
+
+    def get_student_receipts(self, register_number):
+        self.service.student_row(register_number)
+        self._send_json(200, _records(self.service.receipts.for_student(register_number)))
+
+    def post_students(self):
+        record = self.service.add_student(self._body())
+        self._send_json(201, _student(pd.Series(record)))
+
+    # ---------------------- PAYMENTS ----------------------
+    def post_payments(self):
+        body = self._body()
+        service = self.service
+        row = service.student_row(body.get("register_number", ""))
+        receipt, _ = service.pay(row, body.get("year"), body.get("amount"),
+                                 body.get("fee_type") or GENERAL_PAYMENT)
+        receipt["pdf"] = f"/receipts/{receipt['receipt_no']}.pdf"
+        self._send_json(201, receipt)
+
+    def get_receipt(self, receipt_no):
+        pdf = self.service.receipts.reprint(receipt_no)
+        if pdf is None:
+            raise NotFoundError(f"no receipt {receipt_no!r}")
+        self._send(200, pdf, "application/pdf")
+
+    def post_batch_postings(self):
+        body = self._body()
+        result = self.service.post_batch(body.get("batch", ALL), body.get("department", ALL), body.get("year"),
+                                         body.get("fee_type"), body.get("amount"), body.get("kind"))
+        self._send_json(201, result)
+
+    # ---------------------- DUES ----------------------
+    def get_dues(self):
+        self._send_json(200, _records(self.service.dues_totals()))
+
+    def get_dues_groups(self):
+        self._send_json(200, _records(self.service.dues_by_group(self.query.get("year")).reset_index()))
+
+    def get_dues_top(self):
+        top = self.service.top_debtors(self._limit("n", 10), self.query.get("year"))
+        self._send_json(200, _records(top))
+
+    def get_dues_ageing(self):
+        self._send_json(200, _records(self.service.dues_ageing()))
+
+    def get_dues_students(self):
+        total, page = self.service.students_with_dues(self.query.get("year", ""), offset=self._int("offset", 0),
+                                                      limit=self._limit())
+        self._send_json(200, {"total": total, "students": _records(page)})
+
+    # ---------------------- ANALYTICS ----------------------
+    def get_analytics(self):
+        self._send_json(200, self.service.collection_overview())
+
+    def get_analytics_rates(self):
+        by = [column.strip() for column in self.query.get("by", "Department").split(",") if column.strip()]
+        self._send_json(200, _records(self.service.collection_rates(by)))
+
+    def get_analytics_fee_mix(self):
+        self._send_json(200, _records(self.service.fee_mix(self.query.get("year"))))
+
+    def get_analytics_monthly(self):
+        by = self.query.get("by")
+        table = self.service.monthly_collections(by)
+        self._send_json(200, _records(table if by is None else table.reset_index()))
+
+    # ---------------------- CERTIFICATES / METRICS ----------------------
+    def post_certificates(self):
+        body = self._body()
+        if body.get("kind") not in (TC, CC):
+            raise HTTPError(400, f"kind must be {TC!r} or {CC!r}")
+        service = self.service
+        student = service.student(service.student_row(body.get("register_number", "")))
+        if body.get("kind") == TC:
+            number, _, pdf = service.transfer_certificate(student, body.get("admission_no", ""),
+                                                          body.get("date_of_admission", ""),
+                                                          body.get("date_of_leaving", ""))
+        else:
+            number, _, pdf = service.conduct_certificate(student, body.get("title", "Selvan"),
+                                                         body.get("period_from", ""), body.get("period_to", ""))
+        self._send(200, pdf.result(), "application/pdf",
+                   [("Content-Disposition", f'attachment; filename="{number}.pdf"')])
+
+    def get_metrics(self):
+        self._send(200, metrics.prometheus_text().encode("utf-8"), "text/plain; version=0.0.4")
+
+
+ROUTES = [
+    ("GET", r"/health", "get_health"),
+    ("GET", r"/students", "get_students"),
+    ("POST", r"/students", "post_students"),
+    ("GET", r"/students/([^/]+)", "get_student"),
+    ("GET", r"/students/([^/]+)/receipts", "get_student_receipts"),
+    ("POST", r"/payments", "post_payments"),
+    ("GET", r"/receipts/([^/]+)\.pdf", "get_receipt"),
+    ("POST", r"/batch-postings", "post_batch_postings"),
+    ("GET", r"/dues", "get_dues"),
+    ("GET", r"/dues/groups", "get_dues_groups"),
+    ("GET", r"/dues/top", "get_dues_top"),
+    ("GET", r"/dues/ageing", "get_dues_ageing"),
+    ("GET", r"/dues/students", "get_dues_students"),
+    ("GET", r"/analytics", "get_analytics"),
+    ("GET", r"/analytics/rates", "get_analytics_rates"),
+    ("GET", r"/analytics/fee-mix", "get_analytics_fee_mix"),
+    ("GET", r"/analytics/monthly", "get_analytics_monthly"),
+    ("POST", r"/certificates", "post_certificates"),
+    ("GET", r"/metrics", "get_metrics"),
+]
+Handler.routes = [(method, re.compile(path), re.sub(r"\(\[\^/\]\+\)", "{id}", path).replace("\\", ""), handler)
+                  for method, path, handler in ROUTES]
+
+
+def make_server(data_file, host="127.0.0.1", port=DEFAULT_PORT, logo_path=None):
+    """A ThreadingHTTPServer serving the fee service for data_file (not started)."""
+    handler = type("FeeHandler", (Handler,), {"service": fee_service(data_file, logo_path)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(server, workers=1):
+    """Serve forever, forking workers-1 extra processes that share the listening socket."""
+    if workers > 1 and not hasattr(os, "fork"):
+        raise RuntimeError("--workers needs os.fork (not available on Windows); run one process per port instead")
+    children = []
+    for _ in range(workers - 1):
+        pid = os.fork()
+        if pid == 0:
+            children = []
+            break
+        children.append(pid)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        for pid in children:
+            os.waitpid(pid, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the fee system as a local JSON API.")
+    parser.add_argument("data_file", nargs="?", help="data file of the app, e.g. abi.xlsx or abi.db "
+                                                     "(default: the configured one, see config.py)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=1, help="processes sharing the port")
+    parser.add_argument("--logo", help="logo image for receipts and certificates (default: the configured one)")
+    args = parser.parse_args(argv)
+    current = settings()
+    args.data_file = args.data_file or current.data_file
+    args.logo = args.logo or current.logo
+
+    server = make_server(args.data_file, args.host, args.port, args.logo)
+    print(f"Serving {args.data_file} on http://{args.host}:{server.server_port} with {args.workers} worker(s)")
+    try:
+        serve(server, args.workers)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
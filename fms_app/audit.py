@@ -0,0 +1,410 @@
+# audit.py
+"""Append-only audit log of fee changes, with point-in-time balances.
+
+Every store gets an AuditLog next to its ledger (``attach``, called by
+``open_store``). Each write hands the log the rows it wrote as they were
+just before and just after it, and the log appends one row per fee value
+that write changed: timestamp, user, action, register number, column,
+before, after and receipt number. Changes made by other writers are never
+charged to the current one.
+
+The SQLite store records the audit rows in the transaction of the write
+itself. The journaled store records them while it still holds the journal
+lock, tagged with the event id (like its ledger postings); every journal
+event carries its audit context, so ``JournaledStore.sync_audit`` can log
+the events a crash kept out of the audit log, with the right user.
+
+Who and why come from ``audit_context(user=..., action=..., receipt_no=...)``,
+which the pages, the service and the API set around their writes; scripts
+are logged under the OS user and the script name.
+
+Point-in-time state: the state of every student is snapshotted when the
+log starts and again every ``SNAPSHOT_EVERY`` log rows. ``state_at(ts)``
+starts from the last snapshot taken at or before ts and replays only the
+log rows between that snapshot and ts, so old balances do not need a scan
+of the whole history.
+
+Command line:
+
+    python audit.py abi.xlsx history [--student REG] [--since 2025-06-01] [--until 2025-07-01]
+    python audit.py abi.xlsx balance REG --at "2025-06-30 18:00"
+    python audit.py abi.xlsx snapshot
+"""
+import argparse
+import contextvars
+import getpass
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from datastore import FEE_COLUMNS, YEARS
+
+SNAPSHOT_EVERY = 5000
+TOLERANCE = 0.005
+LOG_COLUMNS = ["ts", "user", "action", "register_number", "field", "before", "after", "receipt_no"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    user TEXT NOT NULL DEFAULT '',
+    action TEXT NOT NULL DEFAULT '',
+    register_number TEXT NOT NULL,
+    field TEXT NOT NULL,
+    before REAL,
+    after REAL,
+    receipt_no TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_audit_student ON audit_log (register_number, ts);
+CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_log (ts);
+CREATE TABLE IF NOT EXISTS audit_current (
+    register_number TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS audit_snapshots (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    last_log_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS audit_snapshot_rows (
+    snapshot_id INTEGER NOT NULL,
+    register_number TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, register_number)
+);
+CREATE TABLE IF NOT EXISTS audit_events (
+    event_id TEXT PRIMARY KEY,
+    generation TEXT NOT NULL
+);
+"""
+
+_context = contextvars.ContextVar("audit_context", default=None)
+
+
+def _default_context():
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = ""
+    return {"user": user, "action": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "",
+            "receipt_no": ""}
+
+
+def current_context():
+    """The (user, action, receipt_no) dict store writes are attributed to right now."""
+    return _context.get() or _default_context()
+
+
+@contextmanager
+def audit_context(**values):
+    """Attribute the store writes made inside the block (user, action, receipt_no)."""
+    current = current_context()
+    token = _context.set({**current, **{k: v for k, v in values.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def _values(df):
+    """Fee columns of df as floats indexed by register number (one row per student)."""
+    regs = df["Register Number"].fillna("").astype(str).str.strip()
+    # one to_numeric over the flattened block: per-column conversion dominates small writes
+    cells = df.reindex(columns=FEE_COLUMNS).to_numpy(dtype=object).ravel()
+    numbers = pd.to_numeric(pd.Series(cells, dtype=object), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    values = pd.DataFrame(np.nan_to_num(numbers.reshape(len(df), len(FEE_COLUMNS))), index=regs.to_numpy(),
+                          columns=FEE_COLUMNS)
+    values = values[values.index != ""]
+    return values[~values.index.duplicated(keep="last")]
+
+
+def _state_json(row):
+    return json.dumps({field: value for field, value in zip(FEE_COLUMNS, row) if value})
+
+
+def _states_frame(pairs):
+    """Wide float frame (index register number) from (register number, state json) pairs."""
+    pairs = list(pairs)
+    frame = pd.DataFrame.from_records([json.loads(state) for _, state in pairs],
+                                      index=pd.Index([reg for reg, _ in pairs], name="Register Number"),
+                                      columns=FEE_COLUMNS)
+    return frame.astype(float).fillna(0.0)
+
+
+class AuditLog:
+    """Audit tables inside an SQLite database (one connection per thread)."""
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _select_in(self, conn, sql, keys, params=()):
+        """Rows of sql (with one IN (...) placeholder) for keys, 500 at a time."""
+        rows = []
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows += conn.execute(sql.format(", ".join("?" for _ in chunk)), [*params, *chunk]).fetchall()
+        return rows
+
+    # ---------------------- RECORDING ----------------------
+    def started(self):
+        return self._conn().execute("SELECT 1 FROM audit_snapshots LIMIT 1").fetchone() is not None
+
+    def start(self, df):
+        """Take the first snapshot (state of df) unless the log has already started."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM audit_snapshots LIMIT 1").fetchone() is None:
+                values = _values(df)
+                conn.executemany("INSERT OR REPLACE INTO audit_current (register_number, state) VALUES (?, ?)",
+                                 ((reg, _state_json(row)) for reg, row in zip(values.index, values.to_numpy())))
+                self._snapshot(conn, pd.Timestamp.now().isoformat())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def record(self, df, complete=False, before=None, conn=None, event=None, context=None, ts=None):
+        """Log every fee value in df (written rows) that differs from the audited state.
+
+        complete means df is the whole dataset. before holds the same rows as
+        they were just before the write (missing rows are new students); the
+        values are then compared with it instead of the audited state, so
+        only this write's changes are logged. Pass conn to join a transaction
+        the caller already holds on the same file. event = (event id, journal
+        generation) logs one journal event at most once, and context / ts
+        default to the current audit context and time. Returns the number of
+        log rows.
+        """
+        values = _values(df)
+        if values.empty and event is None:
+            return 0
+        context = context or current_context()
+        late = ts is not None  # catching up an event logged after later writes
+        ts = ts or pd.Timestamp.now().isoformat()
+        own = conn is None
+        conn = conn or self._conn()
+        if own:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            if event is not None and conn.execute(
+                    "INSERT OR IGNORE INTO audit_events (event_id, generation) VALUES (?, ?)", event).rowcount == 0:
+                if own:
+                    conn.execute("COMMIT")
+                return 0
+            if before is not None:
+                previous = _values(before)
+            elif complete:
+                previous = _states_frame(conn.execute("SELECT register_number, state FROM audit_current"))
+            else:
+                previous = _states_frame(self._select_in(conn, "SELECT register_number, state FROM audit_current "
+                                                               "WHERE register_number IN ({})", values.index))
+            previous = previous.reindex(values.index)
+            known = previous.notna().all(axis=1).to_numpy()
+            after = values.to_numpy()
+            old = previous.to_numpy()
+            changed = np.where(known[:, None], np.abs(after - np.nan_to_num(old)) > TOLERANCE, after != 0)
+            rows, cols = np.nonzero(changed)
+            entries = [(ts, context["user"], context["action"], values.index[r], FEE_COLUMNS[c],
+                        None if np.isnan(old[r, c]) else float(old[r, c]), float(after[r, c]),
+                        context["receipt_no"]) for r, c in zip(rows, cols)]
+            if entries:
+                conn.executemany(f"INSERT INTO audit_log ({', '.join(LOG_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 entries)
+                touched = np.unique(rows)
+                if late:
+                    # a later write already stored the newer state of these students
+                    newer = {r[0] for r in self._select_in(
+                        conn, "SELECT DISTINCT register_number FROM audit_log WHERE ts > ? "
+                              "AND register_number IN ({})", values.index[touched], (ts,))}
+                    touched = [r for r in touched if values.index[r] not in newer]
+                conn.executemany("INSERT OR REPLACE INTO audit_current (register_number, state) VALUES (?, ?)",
+                                 ((values.index[r], _state_json(after[r])) for r in touched))
+                last_id, last_snapshot = conn.execute(
+                    "SELECT (SELECT MAX(id) FROM audit_log), (SELECT MAX(last_log_id) FROM audit_snapshots)"
+                ).fetchone()
+                if last_id - (last_snapshot or 0) >= SNAPSHOT_EVERY:
+                    self._snapshot(conn, ts)
+            if own:
+                conn.execute("COMMIT")
+        except Exception:
+            if own:
+                conn.execute("ROLLBACK")
+            raise
+        return len(entries)
+
+    def recorded_events(self, generation):
+        """Ids of the journal events of generation that are in the audit log."""
+        rows = self._conn().execute("SELECT event_id FROM audit_events WHERE generation = ?", (generation,))
+        return {row[0] for row in rows}
+
+    def mark_recorded(self, events):
+        """Record (event id, generation) pairs as logged without logging them (already in the start snapshot)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT OR IGNORE INTO audit_events (event_id, generation) VALUES (?, ?)", events)
+        conn.execute("COMMIT")
+
+    def forget_generations(self, keep):
+        """Drop the recorded-event ids of every journal generation except keep."""
+        self._conn().execute("DELETE FROM audit_events WHERE generation != ?", (keep,))
+
+    def _snapshot(self, conn, ts):
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM audit_log").fetchone()[0]
+        snapshot_id = conn.execute("INSERT INTO audit_snapshots (ts, last_log_id) VALUES (?, ?)",
+                                   (ts, last_id)).lastrowid
+        conn.execute("INSERT INTO audit_snapshot_rows (snapshot_id, register_number, state) "
+                     "SELECT ?, register_number, state FROM audit_current", (snapshot_id,))
+        return snapshot_id
+
+    def snapshot(self):
+        """Snapshot the current state now (also taken automatically every SNAPSHOT_EVERY log rows)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            snapshot_id = self._snapshot(conn, pd.Timestamp.now().isoformat())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return snapshot_id
+
+    # ---------------------- QUERIES ----------------------
+    def history(self, register_number=None, start=None, end=None, field=None, limit=None):
+        """Log rows in order, filtered by student, [start, end) timestamps and column."""
+        clauses, params = [], []
+        for clause, value in (("register_number = ?", register_number), ("ts >= ?", start), ("ts < ?", end),
+                              ("field = ?", field)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(pd.Timestamp(value).isoformat() if clause.startswith("ts") else str(value))
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        order = "ORDER BY id" if limit is None else f"ORDER BY id DESC LIMIT {int(limit)}"
+        history = pd.read_sql_query(f"SELECT {', '.join(LOG_COLUMNS)} FROM audit_log {where} {order}",
+                                    self._conn(), params=params)
+        return history if limit is None else history.iloc[::-1].reset_index(drop=True)
+
+    def state_at(self, ts, register_numbers=None):
+        """Fee columns of every student (or the given ones) as they were at ts.
+
+        Raises ValueError for a time before the audit log started.
+        """
+        ts = pd.Timestamp(ts).isoformat()
+        conn = self._conn()
+        snapshot = conn.execute("SELECT id, last_log_id FROM audit_snapshots WHERE ts <= ? "
+                                "ORDER BY id DESC LIMIT 1", (ts,)).fetchone()
+        if snapshot is None:
+            first = conn.execute("SELECT MIN(ts) FROM audit_snapshots").fetchone()[0]
+            raise ValueError(f"the audit log starts at {first}; no state before that")
+        snapshot_id, last_log_id = snapshot
+        # by time: rows caught up after a crash are logged after later changes to the same values
+        log_sql = ("SELECT register_number, field, after FROM audit_log WHERE id > ? AND ts <= ?{} ORDER BY ts, id")
+        if register_numbers is None:
+            base = conn.execute("SELECT register_number, state FROM audit_snapshot_rows WHERE snapshot_id = ?",
+                                (snapshot_id,)).fetchall()
+            replay = conn.execute(log_sql.format(""), (last_log_id, ts)).fetchall()
+        else:
+            regs = [str(r) for r in register_numbers]
+            base = self._select_in(conn, "SELECT register_number, state FROM audit_snapshot_rows "
+                                         "WHERE snapshot_id = ? AND register_number IN ({})", regs, (snapshot_id,))
+            replay = self._select_in(conn, log_sql.format(" AND register_number IN ({})"), regs, (last_log_id, ts))
+        state = _states_frame(base)
+        if replay:
+            # the last value each (student, column) was set to before ts
+            latest = pd.DataFrame(replay, columns=["register_number", "field", "after"]).drop_duplicates(
+                ["register_number", "field"], keep="last")
+            changes = latest.pivot(index="register_number", columns="field", values="after")
+            state = state.reindex(state.index.union(changes.index)).fillna(0.0)
+            state.update(changes)
+        if register_numbers is not None:
+            state = state.reindex([str(r) for r in register_numbers]).dropna(how="all")
+        return state
+
+    def balance_at(self, register_number, ts):
+        """Total / Paid / Remaining Fees per year for one student at ts."""
+        state = self.state_at(ts, [register_number])
+        if state.empty:
+            raise KeyError(f"no audited fees for {register_number!r} at {ts}")
+        row = state.iloc[0]
+        return pd.DataFrame({
+            "Year": [f"{year} year" for year in YEARS],
+            "Total Fees": [row[f"Total Fees {year} year"] for year in YEARS],
+            "Paid Fees": [row[f"Paid Fees {year} year"] for year in YEARS],
+            "Remaining Fees": [row[f"Remaining Fees {year} year"] for year in YEARS],
+        })
+
+
+# ---------------------- STORE HOOK ----------------------
+_attach_lock = threading.Lock()
+
+
+def attach(store):
+    """Start auditing every write made through store (once per store)."""
+    with _attach_lock:
+        if getattr(store, "_audit", None) is not None:
+            return store._audit
+        log = AuditLog(store.ledger_path())
+        seed = None
+        if not log.started():
+            seed = store.load()
+            log.start(seed)
+        store._audit = log
+        store._audit_opened(log, seed)
+        return log
+
+
+def audit_log(store):
+    """The AuditLog of store."""
+    return attach(store)
+
+
+def main(argv=None):
+    from storage import open_store
+
+    parser = argparse.ArgumentParser(description="Query the audit log of the fee data.")
+    parser.add_argument("data_file", help="data file of the app, e.g. abi.xlsx or abi.db")
+    sub = parser.add_subparsers(dest="action", required=True)
+    history = sub.add_parser("history", help="list logged changes")
+    history.add_argument("--student", help="register number")
+    history.add_argument("--since", help="from this date/time (inclusive)")
+    history.add_argument("--until", help="up to this date/time (exclusive)")
+    balance = sub.add_parser("balance", help="a student's fees per year at a point in time")
+    balance.add_argument("student", help="register number")
+    balance.add_argument("--at", default=None, help="date/time (default: now)")
+    sub.add_parser("snapshot", help="snapshot the current state")
+    args = parser.parse_args(argv)
+
+    log = audit_log(open_store(args.data_file))
+    if args.action == "history":
+        print(log.history(args.student, args.since, args.until).to_string(index=False))
+    elif args.action == "balance":
+        try:
+            print(log.balance_at(args.student, args.at or pd.Timestamp.now()).to_string(index=False))
+        except (KeyError, ValueError) as exc:
+            print(exc.args[0], file=sys.stderr)
+            return 1
+    else:
+        print(f"Snapshot {log.snapshot()} taken")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# auth.py
+"""Users, salted password hashes and roles.
+
+Credentials stay in the CSV file the app already uses, but with columns
+``username, password_hash, role`` instead of plaintext passwords. Hashes
+are PBKDF2-SHA256 with a random salt per user, stored as
+``pbkdf2_sha256$<iterations>$<salt>$<hash>`` (base64). A file that still
+has the old ``username, password`` columns is converted in place the first
+time it is read; those users become admins, as they could use every page
+before.
+
+The file is parsed once per process and re-read only when its modification
+time or size changes, so a rerun of the login page costs one ``stat``.
+
+Roles are ordered: viewer < cashier < admin. A page declares the lowest
+role that may open it (see ``allows``).
+
+Command line:
+
+    python auth.py add credentials.csv alice --role cashier     # prompts for the password
+    python auth.py passwd credentials.csv alice
+    python auth.py role credentials.csv alice --role admin
+    python auth.py remove credentials.csv alice
+    python auth.py list credentials.csv
+"""
+import argparse
+import base64
+import getpass
+import hashlib
+import hmac
+import os
+import secrets
+import sys
+import threading
+from functools import lru_cache
+
+import pandas as pd
+
+VIEWER = "viewer"
+CASHIER = "cashier"
+ADMIN = "admin"
+ROLES = [VIEWER, CASHIER, ADMIN]
+
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = 240000
+COLUMNS = ["username", "password_hash", "role"]
+MIN_PASSWORD_LENGTH = 8
+
+
+def allows(role, required):
+    """True when role may open something that needs at least the required role."""
+    return role in ROLES and ROLES.index(role) >= ROLES.index(required)
+
+
+def hash_password(password, iterations=ITERATIONS):
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return "$".join([ALGORITHM, str(iterations), base64.b64encode(salt).decode(), base64.b64encode(digest).decode()])
+
+
+def verify_password(password, encoded):
+    try:
+        algorithm, iterations, salt, digest = encoded.split("$")
+    except (AttributeError, ValueError):
+        return False
+    if algorithm != ALGORITHM:
+        return False
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), base64.b64decode(salt), int(iterations))
+    return hmac.compare_digest(candidate, base64.b64decode(digest))
+
+
+@lru_cache(maxsize=1)
+def _unknown_user_hash():
+    """Hash that passwords of unknown users are checked against, made on the first failed lookup."""
+    return hash_password(secrets.token_hex(16))
+
+
+class CredentialStore:
+    """The users of one credentials file, cached and reloaded when the file changes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._users = {}  # username -> (password_hash, role)
+
+    def _current(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if stamp != self._stamp:
+                self._stamp = stamp  # (converting an old file rewrites it and moves the stamp on)
+                self._users = self._read()
+            return self._users
+
+    def _read(self):
+        df = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+        df.columns = [str(c).strip() for c in df.columns]
+        if "password" in df.columns:
+            # old plaintext file: hash every password and rewrite it without them
+            users = {str(u).strip(): (hash_password(str(p)), ADMIN) for u, p in zip(df["username"], df["password"])}
+            self._write(users)
+            return users
+        role = df["role"] if "role" in df.columns else pd.Series(VIEWER, index=df.index)
+        return {str(u).strip(): (h, r.strip() or VIEWER) for u, h, r in zip(df["username"], df["password_hash"], role)}
+
+    def _write(self, users):
+        table = pd.DataFrame([(u, h, r) for u, (h, r) in sorted(users.items())], columns=COLUMNS)
+        tmp_path = self.path + ".tmp"
+        table.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self._stamp = (stat.st_mtime_ns, stat.st_size)
+        self._users = users
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def authenticate(self, username, password):
+        """The user's role if username/password are valid, else None."""
+        entry = self._current().get(username.strip())
+        if entry is None:
+            verify_password(password, _unknown_user_hash())  # same cost, so timing doesn't reveal usernames
+            return None
+        return entry[1] if verify_password(password, entry[0]) else None
+
+    def users(self):
+        """Username and role of every user."""
+        return pd.DataFrame([(u, r) for u, (_, r) in sorted(self._current().items())], columns=["username", "role"])
+
+    def set_user(self, username, password=None, role=None):
+        """Add a user or change an existing user's password and/or role."""
+        username = username.strip()
+        if not username:
+            raise ValueError("username is required")
+        if role is not None and role not in ROLES:
+            raise ValueError(f"unknown role {role!r}; expected one of {', '.join(ROLES)}")
+        if password is not None and len(password) < MIN_PASSWORD_LENGTH:
+            raise ValueError(f"password must have at least {MIN_PASSWORD_LENGTH} characters")
+        with self._lock:
+            users = dict(self._current())
+            if username not in users and password is None:
+                raise ValueError(f"new user {username!r} needs a password")
+            old_hash, old_role = users.get(username, (None, VIEWER))
+            users[username] = (hash_password(password) if password is not None else old_hash, role or old_role)
+            self._write(users)
+
+    def remove_user(self, username):
+        with self._lock:
+            users = dict(self._current())
+            if users.pop(username, None) is None:
+                raise KeyError(f"no user {username!r}")
+            self._write(users)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def credential_store(path):
+    """Process-wide CredentialStore for path."""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = CredentialStore(path)
+        return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the users of the fees app.")
+    parser.add_argument("action", choices=["add", "passwd", "role", "remove", "list"])
+    parser.add_argument("credentials_file", help="credentials CSV of the app")
+    parser.add_argument("username", nargs="?")
+    parser.add_argument("--role", choices=ROLES, help="role of a new user (default viewer) / new role")
+    args = parser.parse_args(argv)
+
+    store = CredentialStore(args.credentials_file)
+    if args.action == "list":
+        print(store.users().to_string(index=False))
+        return 0
+    if not args.username:
+        parser.error(f"{args.action} needs a username")
+    if args.action == "role" and not args.role:
+        parser.error("role needs --role")
+    try:
+        known = args.username.strip() in set(store.users()["username"])
+        if args.action == "add" and known:
+            raise ValueError(f"user {args.username!r} already exists; use passwd or role to change it")
+        if args.action in ("passwd", "role") and not known:
+            raise KeyError(f"no user {args.username!r}")
+        if args.action == "remove":
+            store.remove_user(args.username)
+        elif args.action == "role":
+            store.set_user(args.username, role=args.role)
+        else:
+            password = getpass.getpass(f"Password for {args.username}: ")
+            if password != getpass.getpass("Repeat password: "):
+                print("Passwords do not match", file=sys.stderr)
+                return 1
+            store.set_user(args.username, password, args.role or (VIEWER if args.action == "add" else None))
+    except (KeyError, ValueError) as exc:
+        print(exc.args[0], file=sys.stderr)
+        return 1
+    print(f"Updated {args.credentials_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# batch_posting.py
+"""Batch fee posting: one charge or payment for every student matching a filter.
+
+``select_students`` picks the rows, ``preview`` shows the before/after
+values without touching storage, and ``store.post_batch`` commits the
+change for all of them as one transaction.
+"""
+import pandas as pd
+
+from datastore import CHARGE, post_fees
+
+ALL = "All"
+
+
+def select_students(df, batch=ALL, department=ALL):
+    """Rows of df in batch and department (ALL/None matches everything; department ignores case)."""
+    mask = pd.Series(True, index=df.index)
+    if batch not in (None, ALL):
+        mask &= df["Batch"].fillna("").astype(str) == str(batch)
+    if department not in (None, ALL):
+        mask &= df["Department"].fillna("").astype(str).str.lower() == str(department).lower()
+    return df[mask]
+
+
+def preview(selected, year, fee_type, amount, kind):
+    """Before/after fee values for the selected rows if the posting were applied.
+
+    Returns (table, totals) where totals has the number of students, the
+    amount posted and the outstanding balance before and after.
+    """
+    remaining_col = f"Remaining Fees {year}"
+    changed_col = f"{fee_type} {year}" if kind == CHARGE else f"Paid Fees {year}"
+    after = post_fees(selected.copy(), selected.index, year, fee_type, float(amount), kind)
+    table = pd.DataFrame({
+        "Register Number": selected["Register Number"],
+        "Name": selected["Name"],
+        "Batch": selected["Batch"],
+        "Department": selected["Department"],
+        f"{changed_col} (before)": selected[changed_col],
+        f"{changed_col} (after)": after[changed_col],
+        f"{remaining_col} (before)": selected[remaining_col],
+        f"{remaining_col} (after)": after[remaining_col],
+    })
+    totals = {
+        "students": len(selected),
+        "amount": float(amount) * len(selected),
+        "outstanding_before": float(selected[remaining_col].sum()),
+        "outstanding_after": float(after[remaining_col].sum()),
+    }
+    return table, totals
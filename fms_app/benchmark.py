@@ -0,0 +1,242 @@
+# benchmark.py
+"""Headless benchmarks for the fee system's hot paths on synthetic data.
+
+``synthetic_students(n)`` builds a realistic dataset: batches 2021-2024,
+the college's departments, register/UMIS/EMIS numbers, per-year fee
+components and partial payments. Each benchmark times one operation the
+pages trigger on a click (load, save, payment, search, paging, dues
+dashboard, integrity check, certificate PDF) against both storage backends
+in a temporary directory, without starting Streamlit.
+
+Results are printed as JSON lines (one per benchmark, backend and size), so
+runs can be appended to a file and compared over time:
+
+    python benchmark.py --sizes 1000 10000 100000 --output bench.jsonl
+    python benchmark.py --sizes 5000 --only search page --repeat 20
+"""
+import argparse
+import base64
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from datastore import (FEE_COMPONENTS, YEARS, compute_totals, data_cache, ensure_columns, read_excel_data,
+                       write_excel_data)
+from dues import DuesIndex
+from integrity import verify
+from journal import JournaledStore
+from search_index import SearchIndex
+from sqlite_store import SQLiteStore
+from storage import EQUALS, EQUALS_IGNORE_CASE, GREATER_THAN
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_REPEAT = 5
+BACKENDS = {"journal": (JournaledStore, "abi.xlsx"), "sqlite": (SQLiteStore, "abi.db")}
+# the workbook is only read/written for sizes up to this (openpyxl is slow by design)
+EXCEL_MAX_STUDENTS = 10000
+
+DEPARTMENTS = ["CSE", "ECE", "EEE", "MECH", "CIVIL", "IT", "AI&DS"]
+BATCHES = ["2021", "2022", "2023", "2024"]
+FIRST_NAMES = ["Arun", "Priya", "Karthik", "Divya", "Suresh", "Lakshmi", "Vignesh", "Meena", "Rajesh",
+               "Anitha", "Muthu", "Kavya", "Ganesh", "Deepa", "Hari", "Revathi", "Senthil", "Nisha"]
+LAST_NAMES = ["Kumar", "Devi", "Raj", "Selvi", "Pandian", "Mari", "Krishnan", "Lakshmanan", "Murugan"]
+# typical yearly amount per component (0 = usually not charged)
+FEE_LEVELS = {"Bus Fees": 12000, "Mess Fees": 30000, "Hostel Fees": 25000, "Exam Fees": 3000,
+              "Tution Fees": 55000, "Fine": 0, "Miscellaneous": 2000, "Course Fees": 5000, "Due Fees": 0}
+
+
+# ---------------------- SYNTHETIC DATA ----------------------
+def synthetic_students(n, seed=0):
+    """n synthetic students with fee structures, Total/Remaining computed."""
+    rng = np.random.default_rng(seed)
+    batch = rng.choice(BATCHES, n)
+    dept = rng.choice(DEPARTMENTS, n)
+    serial = pd.Series(np.arange(n)).groupby([batch, dept]).cumcount().to_numpy() + 1
+    df = pd.DataFrame({
+        "UMIS Number": (rng.integers(10**11, 10**12, n)).astype(str),
+        "EMIS Number": (rng.integers(10**9, 10**10, n)).astype(str),
+        "Register Number": [f"9530{b[2:]}{d.replace('&', '')}{s:04d}" for b, d, s in zip(batch, dept, serial)],
+        "Batch": batch,
+        "Name": [f"{f} {l}" for f, l in zip(rng.choice(FIRST_NAMES, n), rng.choice(LAST_NAMES, n))],
+        "Sex": rng.choice(["Male", "Female"], n),
+        "Department": dept,
+        "Mobile Number": (rng.integers(6 * 10**9, 10**10, n)).astype(str),
+        "First Graduate": rng.choice(["Yes", "No"], n),
+    })
+    hosteller = rng.random(n) < 0.4
+    bus = ~hosteller & (rng.random(n) < 0.6)
+    years_in = 2025 - batch.astype(int)  # years of study so far
+    for y, year in enumerate(YEARS):
+        studying = years_in > y
+        for fee_type in FEE_COMPONENTS:
+            level = FEE_LEVELS[fee_type]
+            amount = np.full(n, float(level))
+            if fee_type in ("Mess Fees", "Hostel Fees"):
+                amount *= hosteller
+            elif fee_type == "Bus Fees":
+                amount *= bus
+            elif fee_type == "Fine":
+                amount = np.where(rng.random(n) < 0.05, 500.0, 0.0)
+            df[f"{fee_type} {year} year"] = np.where(studying, amount, 0.0)
+        total = df[[f"{ft} {year} year" for ft in FEE_COMPONENTS]].sum(axis=1).to_numpy()
+        share = rng.choice([0.0, 0.5, 1.0], n, p=[0.15, 0.25, 0.6])
+        df[f"Paid Fees {year} year"] = np.round(total * share, -2)
+    return compute_totals(ensure_columns(df))
+
+
+# ---------------------- HARNESS ----------------------
+def measure(fn, repeat):
+    """Wall-clock milliseconds of repeat calls to fn."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return times
+
+
+def _environment():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except Exception:
+        rev = ""
+    return {"git": rev, "python": platform.python_version(), "pandas": pd.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def _record(name, backend, students, times, env):
+    return {
+        "benchmark": name, "backend": backend, "students": students, "repeat": len(times),
+        "min_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3),
+        "max_ms": round(max(times), 3), "ts": pd.Timestamp.now().isoformat(timespec="seconds"), **env,
+    }
+
+
+def _pdf_renderer():
+    try:
+        from certificates import html_to_pdf, tc_html
+    except ImportError:
+        return None
+    return html_to_pdf, tc_html
+
+
+def _sample_logo():
+    """Base64 JPEG about the size of the college logo, so PDFs embed a real image."""
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new("RGB", (240, 240), (30, 90, 160)).save(buffer, format="JPEG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def store_benchmarks(store_cls, path, df):
+    """(name, operation) for every store-level hot path on a fresh store holding df."""
+    store = store_cls(path)
+    store.save_frame(df)
+    sample = df.sample(min(len(df), 200), random_state=1)
+    queries = [name.split()[0][:4] for name in sample["Name"]] + list(sample["Register Number"].str[:8])
+
+    def cold_load():
+        data_cache.invalidate()
+        store_cls(path).load()
+
+    rows = itertools.cycle(df.index)
+    search = SearchIndex(store.load(), store.version())
+    query_iter = itertools.cycle(queries)
+    yield "load_cold", cold_load
+    yield "load_warm", store.load
+    yield "save_frame", lambda: store.save_frame(df)
+    yield "record_payment", lambda: store.record_payment(next(rows), "1st year", 100.0, "Tution Fees")
+    yield "post_batch", lambda: store.post_batch(df.index[:500], "1st year", "Fine", 10.0, "charge")
+    yield "page_by_batch", lambda: store.page([("Batch", EQUALS, "2023")], offset=0, limit=50)
+    yield "count_by_department", lambda: store.count([("Department", EQUALS_IGNORE_CASE, "cse")])
+    yield "page_with_dues", lambda: store.page([("Remaining Fees 1st year", GREATER_THAN, 0)], offset=0, limit=50)
+    yield "search_index_build", lambda: SearchIndex(store.load(), store.version())
+    yield "search_query", lambda: search.search(next(query_iter))
+    yield "dues_index_build", lambda: DuesIndex(store.load(), store.version())
+
+
+def frame_benchmarks(df, workdir, wanted):
+    """(name, operation) for the store-independent hot paths."""
+    raw = df.astype(str)
+    yield "ensure_columns", lambda: ensure_columns(raw.copy())
+    yield "compute_totals", lambda: compute_totals(df.copy())
+    yield "integrity_verify", lambda: verify(df)
+    if len(df) <= EXCEL_MAX_STUDENTS and (wanted("excel_write") or wanted("excel_read")):
+        path = os.path.join(workdir, "excel.xlsx")
+        write_excel_data(df, path)
+        yield "excel_write", lambda: write_excel_data(df, path)
+        yield "excel_read", lambda: read_excel_data(path)
+    renderer = _pdf_renderer()
+    if renderer is not None:
+        html_to_pdf, tc_html = renderer
+        source = tc_html(df.iloc[0], "TC-BENCH", "A1", "01-06-2021", "30-04-2025", "01-05-2025",
+                         logo=_sample_logo())
+        yield "certificate_pdf", lambda: html_to_pdf(source)
+
+
+def run(sizes, backends, repeat, only=None, seed=0):
+    """Yield one result record per benchmark, backend and dataset size."""
+    env = _environment()
+    only = only or [""]
+
+    def wanted(name):
+        return any(name.startswith(prefix) for prefix in only)
+
+    for size in sizes:
+        df = synthetic_students(size, seed)
+        with tempfile.TemporaryDirectory(prefix="fms-bench-") as workdir:
+            for name, operation in frame_benchmarks(df, workdir, wanted):
+                if wanted(name):
+                    yield _record(name, "-", size, measure(operation, repeat), env)
+            for backend in backends:
+                store_cls, filename = BACKENDS[backend]
+                path = os.path.join(workdir, backend, filename)
+                os.makedirs(os.path.dirname(path))
+                for name, operation in store_benchmarks(store_cls, path, df):
+                    if wanted(name):
+                        yield _record(name, backend, size, measure(operation, repeat), env)
+            data_cache.invalidate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the fee system's hot paths on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of students")
+    parser.add_argument("--backends", nargs="+", choices=sorted(BACKENDS), default=sorted(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per benchmark")
+    parser.add_argument("--only", nargs="+", help="run only benchmarks whose name starts with one of these (e.g. search load_cold)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument("--output", help="append the JSON lines to this file as well as printing them")
+    parser.add_argument("--generate", metavar="PATH", help="only write a synthetic workbook of --sizes[0] students")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        write_excel_data(synthetic_students(args.sizes[0], args.seed), args.generate)
+        print(f"Wrote {args.sizes[0]} synthetic students to {args.generate}")
+        return 0
+    out = open(args.output, "a", encoding="utf-8") if args.output else None
+    try:
+        for record in run(args.sizes, args.backends, args.repeat, args.only, args.seed):
+            line = json.dumps(record)
+            print(line, flush=True)
+            if out is not None:
+                out.write(line + "\n")
+                out.flush()
+    finally:
+        if out is not None:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
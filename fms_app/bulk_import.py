@@ -0,0 +1,103 @@
+# bulk_import.py
+"""Bulk import of students and their fee structures from CSV or Excel.
+
+The whole file is validated in one vectorized pass: required fields,
+duplicate or already-known register numbers, and non-numeric or negative
+fee amounts. Total/Remaining Fees are computed with array operations, and
+the valid rows are committed with a single store write.
+
+Command line:
+
+    python bulk_import.py students.csv abi.xlsx [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from datastore import FEE_COLUMNS, META_COLUMNS, compute_totals, ensure_columns
+from storage import open_store
+
+REQUIRED_COLUMNS = ["Register Number", "Name"]
+# Columns the import derives itself; values in the file are ignored
+DERIVED_PREFIXES = ("Total Fees", "Remaining Fees")
+
+
+def read_table(source, filename=None):
+    """Read a CSV/Excel file (path or uploaded file object) with every cell as text."""
+    name = filename or getattr(source, "name", None) or str(source)
+    if os.path.splitext(name)[1].lower() == ".csv":
+        df = pd.read_csv(source, dtype=str, keep_default_na=False)
+    else:
+        df = pd.read_excel(source, dtype=str, keep_default_na=False)
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def validate(df, existing_register_numbers=()):
+    """Split an imported table into (rows ready to store, error report).
+
+    The error report has one line per problem: the spreadsheet row number
+    (header = row 1), the column and a message. A row with any error is left
+    out of the import.
+    """
+    df = df.copy()
+    df.index = pd.RangeIndex(2, len(df) + 2)  # spreadsheet row numbers
+    errors = []
+
+    def flag(mask, column, message):
+        for row in df.index[mask]:
+            errors.append({"row": int(row), "column": column, "error": message})
+
+    for col in REQUIRED_COLUMNS:
+        if col not in df.columns:
+            errors.append({"row": 1, "column": col, "error": "missing column"})
+            return df.iloc[0:0], pd.DataFrame(errors)
+        df[col] = df[col].fillna("").astype(str).str.strip()
+        flag(df[col] == "", col, "required value is empty")
+
+    reg = df["Register Number"]
+    flag(reg.duplicated(keep=False) & (reg != ""), "Register Number", "duplicated in this file")
+    known = {str(r).strip() for r in existing_register_numbers}
+    flag(reg.isin(known) & (reg != ""), "Register Number", "already exists")
+
+    fee_cols = [c for c in FEE_COLUMNS if c in df.columns and not c.startswith(DERIVED_PREFIXES)]
+    for col in fee_cols:
+        raw = df[col].fillna("").astype(str).str.strip().str.replace(",", "", regex=False)
+        values = pd.to_numeric(raw.where(raw != "", "0"), errors="coerce")
+        flag(values.isna(), col, "not a number")
+        flag(values < 0, col, "negative amount")
+        df[col] = values.fillna(0.0)
+
+    bad_rows = {e["row"] for e in errors}
+    valid = df[~df.index.isin(bad_rows)].copy()
+    for col in META_COLUMNS:
+        if col in valid.columns:
+            valid[col] = valid[col].fillna("").astype(str).str.strip()
+    valid = compute_totals(ensure_columns(valid.reset_index(drop=True)))
+    report = pd.DataFrame(errors, columns=["row", "column", "error"])
+    return valid, report.sort_values(["row", "column"], kind="stable").reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import students and fee structures from CSV/Excel.")
+    parser.add_argument("source", help="CSV or Excel file with one student per row")
+    parser.add_argument("data_file", help="data file of the app, e.g. abi.xlsx or abi.db")
+    parser.add_argument("--dry-run", action="store_true", help="only validate and report errors")
+    args = parser.parse_args(argv)
+
+    table = read_table(args.source)
+    store = open_store(args.data_file)
+    valid, report = validate(table, store.distinct("Register Number"))
+    for e in report.itertuples(index=False):
+        print(f"row {e.row}: {e.column}: {e.error}", file=sys.stderr)
+    if not args.dry_run and not valid.empty:
+        store.append_students(valid)
+    action = "Validated" if args.dry_run else "Imported"
+    print(f"{action} {len(valid)} of {len(table)} rows ({report['row'].nunique()} rows with errors)")
+    return 1 if len(report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
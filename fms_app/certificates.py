@@ -0,0 +1,320 @@
+# certificates.py
+"""Transfer / conduct certificate rendering.
+
+The certificate layouts are compiled once into string.Template objects, and
+the base64 logo is read and encoded once per path, on first use. The
+institution name and address come from the deployment settings (config.py). HTML is converted to PDF
+by pisa in a process pool, so the Streamlit script only submits a job and
+picks up the finished bytes on a later rerun.
+
+Certificate numbers come from a per-kind, per-year counter in an SQLite
+file next to the fee ledger (``CertificateNumbers``), so two certificates
+never share a number, even when issued in the same second by different
+processes. PDFs are cached by the hash of the certificate without its
+number: asking again for the same certificate returns the number and PDF
+it was issued with instead of using up a new number.
+``render_batch_zip`` renders a whole batch in parallel across cores and
+returns one zip file.
+"""
+import base64
+import hashlib
+import html
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from string import Template
+
+import pandas as pd
+from xhtml2pdf import pisa
+
+from config import settings
+from metrics import registry as metrics, timed
+
+TC = "TC"
+CC = "CC"
+PDF_CACHE_SIZE = 64
+MAX_WORKERS = 4  # PDF worker processes; each one holds its own copy of xhtml2pdf/reportlab
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS certificate_sequence (
+    kind TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    last INTEGER NOT NULL,
+    PRIMARY KEY (kind, year)
+);
+"""
+
+TC_TEMPLATE = Template("""
+<div style="font-family:'Segoe UI', sans-serif; font-size:14px; max-width:800px;
+        margin:auto; color:#000; line-height:1.8; border:2px solid #000; padding:30px;">
+  <div style="display: flex; align-items: center; margin-bottom: 20px;">
+    <img src="data:image/jpeg;base64,$logo" width="80" style="margin-right: 20px;"/>
+    <div style="text-align: center; flex-grow: 1;">
+      <h2 style="margin: 0;">$institution</h2>
+      <h3 style="margin: 0;">$affiliation</h3>
+      <h4 style="margin: 0;">$address</h4>
+      <h5 style="margin: 5px 0;">TRANSFER CERTIFICATE</h5>
+    </div>
+  </div>
+  <div style="display:flex; justify-content:space-between;">
+    <div><p><strong>TC No:</strong> $number</p><p><strong>Date:</strong> $issue_date</p></div>
+    <div><p><strong>Admission No:</strong> $admission_no </p><p><strong>Roll No:</strong> $reg_no</p></div>
+  </div>
+  <p><strong>1.</strong> Name: $name</p>
+  <p><strong>2.</strong> Father’s Name: $father_name</p>
+  <p><strong>3.</strong> Sex: $sex</p>
+  <p><strong>4.</strong> DOB: $dob</p>
+  <p><strong>5.</strong> Nationality & Religion: $nationality_religion</p>
+  <p><strong>6.</strong> Community & Subcaste: $community</p>
+  <p><strong>7.</strong> Date of Admission: $date_of_admission</p>
+  <p><strong>8.</strong> Class and course in which the student was Admitted: $department</p>
+  <p><strong>9.</strong> Class and course studied at the time of leaving : $department</p>
+  <p><strong>10.</strong> Whether Qualified for Promotion to higher studies: REFER MARKSHEET</p>
+  <p><strong>11.</strong> Date of Leaving: $date_of_leaving</p>
+  <p><strong>12.</strong> Issue Date: $issue_date</p>
+  <p><strong>13.</strong> UMIS No: $umis</p>
+  <p><strong>14.</strong> EMIS No: $emis</p>
+  <p>This is to certify that <strong>$name</strong> has been a student of this institution and the above details are correct.</p>
+  <div style="text-align:right; margin-top:50px;"><strong>Principal</strong></div>
+</div>
+""")
+
+CC_TEMPLATE = Template("""
+<div style="font-family:Arial, sans-serif; font-size:18px; max-width:800px;
+        margin:auto; color:#000; line-height:1.8; border:2px solid #000; padding:30px;">
+  <div style="display: flex; align-items: center; margin-bottom: 20px;">
+    <img src="data:image/jpeg;base64,$logo" width="80" style="margin-right: 20px;"/>
+    <div style="text-align: center; flex-grow: 1; font-size:10px;">
+      <h2 style="margin: 0;">$institution</h2>
+      <h4 style="margin: 0;">$address</h4>
+      <h5 style="margin: 5px 0;">CONDUCT CERTIFICATE</h5>
+    </div>
+  </div>
+  <div style="display:flex; justify-content:space-between;">
+    <div><strong>Roll No:</strong> $reg_no</div>
+    <div><strong>C.C. No:</strong> $number</div>
+  </div>
+  <p>This is to certify that $title <strong>$name</strong> was a student of this college in the <strong>$department</strong> branch during <strong>$period_from to $period_to</strong>.</p>
+  <p>His/Her conduct and character were found to be <strong>Good</strong>.</p>
+  <div style="display:flex; justify-content:space-between; margin-top:50px;">
+    <div><strong>Date:</strong> $issue_date</div>
+    <div style="text-align:right;"><strong>Principal</strong></div>
+  </div>
+</div>
+""")
+
+
+class CertificateError(Exception):
+    """pisa could not turn a certificate into a PDF."""
+
+
+@lru_cache(maxsize=8)
+def logo_base64(path):
+    """Base64 of the logo at path, read once per process ("" if unreadable)."""
+    try:
+        with open(path, "rb") as img_file:
+            return base64.b64encode(img_file.read()).decode()
+    except Exception:
+        return ""
+
+
+def _date(value):
+    return value.strftime("%d-%m-%Y") if hasattr(value, "strftime") else str(value or "")
+
+
+def _fields(student):
+    get = student.get
+    current = settings()
+    return {
+        "institution": current.institution, "affiliation": current.affiliation, "address": current.address,
+        "reg_no": get("Register Number", ""), "name": get("Name", ""),
+        "father_name": get("Father's Name", ""), "sex": get("Sex", ""),
+        "dob": get("Date of Birth", ""), "nationality_religion": get("Nationality & Religion", ""),
+        "community": get("Community & Subcaste", ""), "department": get("Department", ""),
+        "umis": get("UMIS Number", ""), "emis": get("EMIS Number", ""),
+    }
+
+
+def certificate_number(kind, year, seq):
+    """TC-/CC-<year>-<sequence> as printed on the certificate."""
+    return f"{kind}-{year}-{seq:06d}"
+
+
+class CertificateNumbers:
+    """Certificate counter per kind and year in an SQLite file (one connection per thread)."""
+
+    def __init__(self, db_path, timeout=30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, kind, count=1, now=None):
+        """Hand out the next count numbers of kind; they never repeat, even across processes."""
+        year = (now or pd.Timestamp.now()).year
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO certificate_sequence (kind, year, last) VALUES (?, ?, 0)",
+                         (kind, year))
+            conn.execute("UPDATE certificate_sequence SET last = last + ? WHERE kind = ? AND year = ?",
+                         (count, kind, year))
+            last = conn.execute("SELECT last FROM certificate_sequence WHERE kind = ? AND year = ?",
+                                (kind, year)).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [certificate_number(kind, year, seq) for seq in range(last - count + 1, last + 1)]
+
+    def next_number(self, kind, now=None):
+        return self.reserve(kind, 1, now)[0]
+
+
+_numbers = {}
+_numbers_lock = threading.Lock()
+
+
+def certificate_numbers(store):
+    """Process-wide CertificateNumbers kept next to the store's ledger."""
+    with _numbers_lock:
+        numbers = _numbers.get(store.data_file)
+        if numbers is None:
+            numbers = _numbers[store.data_file] = CertificateNumbers(store.ledger_path())
+        return numbers
+
+
+def tc_html(student, number, admission_no, date_of_admission, date_of_leaving, issue_date, logo=""):
+    """Transfer certificate HTML for one student (a row or dict)."""
+    values = dict(_fields(student), number=number, admission_no=admission_no,
+                  date_of_admission=_date(date_of_admission), date_of_leaving=_date(date_of_leaving),
+                  issue_date=_date(issue_date))
+    values = {k: html.escape(str(v)) for k, v in values.items()}
+    return TC_TEMPLATE.substitute(values, logo=logo)
+
+
+def cc_html(student, number, title, period_from, period_to, issue_date, logo=""):
+    """Conduct certificate HTML for one student (a row or dict)."""
+    values = dict(_fields(student), number=number, title=title, period_from=_date(period_from),
+                  period_to=_date(period_to), issue_date=_date(issue_date))
+    values = {k: html.escape(str(v)) for k, v in values.items()}
+    return CC_TEMPLATE.substitute(values, logo=logo)
+
+
+def html_to_pdf(source):
+    """Render certificate HTML to PDF bytes (runs inside the worker processes)."""
+    out = BytesIO()
+    status = pisa.CreatePDF(source, dest=out)
+    if status.err:
+        raise CertificateError(f"pisa reported {status.err} error(s)")
+    return out.getvalue()
+
+
+# ---------------------- WORKER POOL / CACHE ----------------------
+_pool = None
+_batch_threads = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cert-batch")
+_pool_lock = threading.Lock()
+_pdf_cache = OrderedDict()  # sha1(kind + html without the number) -> (number, html, pdf bytes)
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawned, not forked: the pool is started from Streamlit/API threads that may hold locks
+            _pool = ProcessPoolExecutor(max_workers=min(MAX_WORKERS, os.cpu_count() or 1),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _cache_key(source):
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def _remember(key, entry):
+    with _pool_lock:
+        _pdf_cache[key] = entry
+        _pdf_cache.move_to_end(key)
+        while len(_pdf_cache) > PDF_CACHE_SIZE:
+            _pdf_cache.popitem(last=False)
+
+
+def issue_certificate(numbers, kind, student, **options):
+    """(number, html, Future of the PDF bytes) of a TC or CC for one student.
+
+    options are the keyword arguments of tc_html/cc_html other than student
+    and number. A certificate already rendered with the same inputs keeps its
+    number and PDF; otherwise the next number is taken from numbers (a
+    CertificateNumbers) and the PDF is rendered in the background.
+    """
+    build = tc_html if kind == TC else cc_html
+    key = _cache_key(kind + build(student, "", **options))
+    with _pool_lock:
+        cached = _pdf_cache.get(key)
+    if cached is not None:
+        number, source, pdf = cached
+        done = Future()
+        done.set_result(pdf)
+        return number, source, done
+    number = numbers.next_number(kind)
+    source = build(student, number, **options)
+    start = time.perf_counter()
+    future = _executor().submit(html_to_pdf, source)
+
+    def finished(f):
+        # submit-to-result time, i.e. what the user waits for, including time queued behind other jobs
+        metrics.observe("pdf_render", (time.perf_counter() - start) * 1000.0, (("kind", "certificate"),))
+        if f.exception() is None:
+            _remember(key, (number, source, f.result()))
+
+    future.add_done_callback(finished)
+    return number, source, future
+
+
+@timed("pdf_render", kind="certificate_batch")
+def render_batch_zip(students, kind, numbers, logo="", **options):
+    """Zip of one certificate PDF per student, rendered in parallel across cores.
+
+    students is a DataFrame of student rows and numbers their certificate
+    numbers (e.g. CertificateNumbers.reserve); options are the keyword
+    arguments of tc_html/cc_html other than student, number and logo.
+    Students whose PDF fails are listed in errors.txt inside the zip.
+    """
+    build = tc_html if kind == TC else cc_html
+    jobs = []
+    for number, (_, student) in zip(numbers, students.iterrows()):
+        name = f"{number}-{student.get('Register Number', '')}"
+        jobs.append((name, build(student, number, logo=logo, **options)))
+    buffer = BytesIO()
+    errors = []
+    pool = _executor()
+    futures = [(name, pool.submit(html_to_pdf, source)) for name, source in jobs]
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, future in futures:
+            try:
+                archive.writestr(f"{name}.pdf", future.result())
+            except Exception as exc:
+                errors.append(f"{name}: {exc}")
+        if errors:
+            archive.writestr("errors.txt", "\n".join(errors))
+    return buffer.getvalue()
+
+
+def submit_batch(students, kind, numbers, logo="", **options):
+    """render_batch_zip in the background; returns a Future of the zip bytes."""
+    return _batch_threads.submit(render_batch_zip, students, kind, numbers, logo, **options)
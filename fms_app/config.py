@@ -0,0 +1,164 @@
+# config.py
+"""Deployment settings: file paths, UPI payee and institution details.
+
+Settings are read from an INI file named by the ``FMS_CONFIG`` environment
+variable (default: ``fms.ini`` next to this module; the built-in defaults
+apply when there is no such file, but a file named explicitly must exist). Any key can be overridden with an environment
+variable ``FMS_<SECTION>_<KEY>``, e.g. ``FMS_PATHS_DATA_FILE=/srv/fees/abi.db``
+or ``FMS_PAYEE_UPI_ID=college@oksbi``, so one codebase can serve several
+colleges or campuses, one process (or container) per deployment.
+
+Relative paths are resolved against the directory of the config file (the
+app directory without one). The file is read once per process, on first
+use; ``reload()`` reads it again.
+
+    [paths]
+    data_file = abi.xlsx
+    credentials_file = credentials.csv
+    logo = clglogo.jpeg
+    icon =
+
+    [payee]
+    upi_id = college@oksbi
+    name = DR.G.U.Pope College
+
+    [institution]
+    name = DR.G.U.Pope College Of Engineering
+    affiliation = (Approved by AICTE, Affiliated to Anna University)
+    address = Pope Nagar, Sawyerpuram Thoothukudi District-628251
+
+Command line:
+
+    python config.py              # effective settings and where they came from
+    python config.py --sample     # a config file with the defaults, e.g. > fms.ini
+"""
+import argparse
+import configparser
+import os
+import sys
+from functools import lru_cache
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FILE = os.path.join(APP_DIR, "fms.ini")
+ENV_FILE = "FMS_CONFIG"
+ENV_PREFIX = "FMS_"
+
+DEFAULTS = {
+    "paths": {
+        "data_file": "abi.xlsx",
+        "credentials_file": "credentials.csv",
+        "logo": "clglogo.jpeg",
+        "icon": "",
+    },
+    "payee": {
+        "upi_id": "devimuthumari388@oksbi",
+        "name": "DR.G.U.Pope College",
+    },
+    "institution": {
+        "name": "DR.G.U.Pope College Of Engineering",
+        "affiliation": "(Approved by AICTE, Affiliated to Anna University)",
+        "address": "Pope Nagar, Sawyerpuram Thoothukudi District-628251",
+    },
+}
+
+
+class Settings:
+    """Effective settings of one deployment (defaults < file < environment)."""
+
+    def __init__(self, values, source=None):
+        self.source = source  # config file that was read, or None
+        self.values = values  # section -> key -> str
+        base = os.path.dirname(source) if source else APP_DIR
+        paths = values["paths"]
+
+        def path(key):
+            value = paths[key].strip()
+            return os.path.normpath(os.path.join(base, os.path.expanduser(value))) if value else None
+
+        self.data_file = path("data_file")
+        self.credentials_file = path("credentials_file")
+        self.logo = path("logo")
+        self.icon = path("icon")
+        self.upi_id = values["payee"]["upi_id"].strip()
+        self.payee = values["payee"]["name"].strip()
+        institution = values["institution"]
+        self.institution = institution["name"].strip()
+        self.affiliation = institution["affiliation"].strip()
+        self.address = institution["address"].strip()
+
+
+def load(path=None, environ=None):
+    """Settings from path (default: $FMS_CONFIG or fms.ini) with environment overrides.
+
+    Only the default fms.ini may be missing; a file named by path or
+    $FMS_CONFIG that does not exist raises FileNotFoundError.
+    """
+    environ = os.environ if environ is None else environ
+    if path:
+        missing = f"config file {path} does not exist"
+    elif environ.get(ENV_FILE):
+        missing = f"{ENV_FILE} names {environ[ENV_FILE]}, which does not exist"
+    else:
+        missing = None
+    path = path or environ.get(ENV_FILE) or DEFAULT_FILE
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read_dict(DEFAULTS)
+    source = None
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as config_file:
+            parser.read_file(config_file)
+        source = os.path.abspath(path)
+    elif missing:
+        raise FileNotFoundError(missing)
+    values = {}
+    for section, keys in DEFAULTS.items():
+        values[section] = {key: environ.get(f"{ENV_PREFIX}{section}_{key}".upper(), parser.get(section, key))
+                           for key in keys}
+    return Settings(values, source)
+
+
+@lru_cache(maxsize=1)
+def settings():
+    """Process-wide Settings, read on first use."""
+    return load()
+
+
+def reload():
+    """Forget the cached settings; the next settings() reads the file again."""
+    settings.cache_clear()
+    return settings()
+
+
+def sample():
+    """Config file text with every key at its default."""
+    lines = []
+    for section, keys in DEFAULTS.items():
+        lines.append(f"[{section}]")
+        lines += [f"{key} = {value}".rstrip() for key, value in keys.items()]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the settings of this deployment of the fees app.")
+    parser.add_argument("--config", help=f"config file (default: ${ENV_FILE} or {DEFAULT_FILE})")
+    parser.add_argument("--sample", action="store_true", help="print a config file with the defaults")
+    args = parser.parse_args(argv)
+
+    if args.sample:
+        print(sample(), end="")
+        return 0
+    try:
+        current = load(args.config)
+    except (FileNotFoundError, configparser.Error) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    print(f"# from {current.source or 'built-in defaults'} and {ENV_PREFIX}* environment variables")
+    for name in ["data_file", "credentials_file", "logo", "icon", "upi_id", "payee",
+                 "institution", "affiliation", "address"]:
+        print(f"{name} = {getattr(current, name) or ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
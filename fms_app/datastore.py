@@ -0,0 +1,231 @@
+# datastore.py
+"""Student data storage: column schema, Excel read/write and a shared load cache."""
+import hashlib
+import os
+import threading
+
+import pandas as pd
+
+# ---------------------- SCHEMA ----------------------
+META_COLUMNS = [
+    "UMIS Number", "EMIS Number", "Register Number", "Batch", "Name", "Sex",
+    "Department", "Date of Birth", "Community & Subcaste", "Nationality & Religion",
+    "Father's Name", "Address", "Mobile Number", "Aadhar Number", "First Graduate"
+]
+YEARS = ["1st", "2nd", "3rd", "4th"]
+FEE_TYPES = [
+    "Bus Fees", "Mess Fees", "Hostel Fees", "Exam Fees",
+    "Tution Fees", "Fine", "Miscellaneous", "Course Fees",
+    "Due Fees", "Paid Fees", "Remaining Fees", "Total Fees"
+]
+# Components that add up to a year's Total Fees
+FEE_COMPONENTS = FEE_TYPES[:9]
+FEE_COLUMNS = [f"{ft} {year} year" for year in YEARS for ft in FEE_TYPES]
+# Identity and per-year summary columns shown by default in list views
+SUMMARY_COLUMNS = ["Register Number", "Name", "Batch", "Department"] + [
+    f"{ft} {year} year" for year in YEARS for ft in ("Total Fees", "Paid Fees", "Remaining Fees")
+]
+# Kinds of fee postings
+CHARGE = "charge"
+PAYMENT = "payment"
+NUMERIC_KEYWORDS = ["Fees", "Paid", "Remaining", "Total", "Due", "Fine"]
+
+
+def is_numeric_column(col):
+    """True for fee/amount columns, which are stored as floats."""
+    return any(keyword in col for keyword in NUMERIC_KEYWORDS)
+
+
+def ensure_columns(df):
+    """Ensure all expected fee and meta columns exist with appropriate dtypes."""
+    # Basic meta columns
+    for c in META_COLUMNS:
+        if c not in df.columns:
+            df[c] = ""
+
+    # Fee structure columns (for 1st-4th year)
+    for year in YEARS:
+        for ft in FEE_TYPES:
+            col = f"{ft} {year} year"
+            if col not in df.columns:
+                df[col] = 0.0
+
+    # Convert numeric columns to numeric type (columns that are already float are left alone)
+    numeric = [c for c in df.columns if is_numeric_column(c) and df[c].dtype != "float64"]
+    if numeric:
+        df[numeric] = df[numeric].apply(pd.to_numeric, errors='coerce').astype("float64")
+    floats = [c for c in df.columns if is_numeric_column(c)]
+    if floats and df[floats].isna().to_numpy().any():
+        df[floats] = df[floats].fillna(0.0)
+    return df
+
+
+
+def fee_matrix(df, fee_types):
+    """df's fee_types columns for every year as a float array of shape (rows, years, fee types)."""
+    cols = [f"{ft} {year} year" for year in YEARS for ft in fee_types]
+    return df[cols].to_numpy(dtype=float).reshape(len(df), len(YEARS), len(fee_types))
+
+
+def expected_totals(df):
+    """(Total, Remaining) per row and year derived from the components, as (rows, years) arrays.
+
+    Remaining is Total - Paid, clamped at zero like payments are; a credit
+    balance shows up as Paid > Total instead.
+    """
+    total = fee_matrix(df, FEE_COMPONENTS).sum(axis=2)
+    paid = fee_matrix(df, ["Paid Fees"])[:, :, 0]
+    return total, (total - paid).clip(min=0.0)
+
+
+def compute_totals(df):
+    """Set Total Fees = sum of the components and Remaining = Total - Paid (never below zero) for every year.
+
+    One array operation over all rows and years.
+    """
+    total, remaining = expected_totals(df)
+    df[[f"Total Fees {year} year" for year in YEARS]] = total
+    df[[f"Remaining Fees {year} year" for year in YEARS]] = remaining
+    return df
+
+
+def post_fees(df, rows, year, fee_type, amount, kind):
+    """Apply the same charge or payment to every row in rows for year (e.g. "1st year"), in place.
+
+    A charge adds amount to the fee_type component and Total, and sets
+    Remaining to Total - Paid (never below zero), so a student in credit is
+    billed only for what the credit does not cover. A payment adds amount to
+    Paid and lowers Remaining (never below zero).
+    """
+    rows = list(rows)
+    paid_col, remaining_col, total_col = (f"{c} {year}" for c in ("Paid Fees", "Remaining Fees", "Total Fees"))
+    if kind == CHARGE:
+        if fee_type not in FEE_COMPONENTS:
+            raise ValueError(f"cannot charge {fee_type!r}; expected one of {FEE_COMPONENTS}")
+        cols = [f"{fee_type} {year}", total_col]
+        df.loc[rows, cols] = df.loc[rows, cols] + amount
+        df.loc[rows, remaining_col] = (df.loc[rows, total_col] - df.loc[rows, paid_col]).clip(lower=0.0)
+    elif kind == PAYMENT:
+        df.loc[rows, paid_col] = df.loc[rows, paid_col] + amount
+        df.loc[rows, remaining_col] = (df.loc[rows, remaining_col] - amount).clip(lower=0.0)
+    else:
+        raise ValueError(f"unknown posting kind {kind!r}")
+    return df
+
+
+# ---------------------- EXCEL I/O ----------------------
+CHECKPOINT_SHEET = "_journal"
+
+
+def read_excel_data(path):
+    """Read the student workbook; if missing, return an empty DataFrame with columns.
+
+    A journal checkpoint stored in the hidden checkpoint sheet is returned in
+    df.attrs["checkpoint"] (None for plain workbooks).
+    """
+    checkpoint = None
+    if os.path.exists(path):
+        try:
+            sheets = pd.read_excel(path, sheet_name=None, engine='openpyxl')
+        except Exception:
+            sheets = pd.read_excel(path, sheet_name=None)  # fallback
+        if CHECKPOINT_SHEET in sheets:
+            marker = sheets.pop(CHECKPOINT_SHEET)
+            if not marker.empty:
+                checkpoint = {k: v for k, v in marker.iloc[0].items()}
+        df = next(iter(sheets.values())) if sheets else pd.DataFrame()
+    else:
+        df = pd.DataFrame()
+    df = ensure_columns(df)
+    df.attrs["checkpoint"] = checkpoint
+    return df
+
+
+def write_excel_data(df, path, checkpoint=None):
+    """Write the student DataFrame to the workbook at path (atomically replaced).
+
+    When checkpoint is given it is stored in a hidden sheet so the journal
+    knows which events are already folded into this workbook.
+    """
+    # ensure directory exists
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    except Exception:
+        pass
+    root, ext = os.path.splitext(path)
+    tmp_path = root + ".tmp" + ext  # keep the extension so pandas picks the engine
+    with pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False)
+        if checkpoint is not None:
+            pd.DataFrame([checkpoint]).to_excel(writer, sheet_name=CHECKPOINT_SHEET, index=False)
+            writer.book[CHECKPOINT_SHEET].sheet_state = "hidden"
+    os.replace(tmp_path, path)
+
+
+# ---------------------- LOAD CACHE ----------------------
+def file_signature(path):
+    """Cheap change marker for a file: (mtime_ns, size), or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def file_digest(path):
+    """SHA-1 of the file contents, or None if it cannot be read."""
+    h = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+class DataCache:
+    """Process-wide cache of parsed data files, shared by every Streamlit session.
+
+    An entry is reused while the file's (mtime, size) signature is unchanged.
+    When the signature moves, the contents are hashed first, so a file that
+    was only touched is not parsed again. Callers always get their own copy,
+    so one session mutating its frame never leaks into another.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+
+    def get(self, path, loader):
+        """Return a copy of the data at path, calling loader(path) only when the file changed."""
+        with self._lock:
+            signature = file_signature(path)
+            entry = self._entries.get(path)
+            if entry is not None and entry["signature"] == signature:
+                return entry["df"].copy()
+            digest = file_digest(path) if signature is not None else None
+            if entry is not None and digest is not None and entry["digest"] == digest:
+                entry["signature"] = signature
+                return entry["df"].copy()
+            df = loader(path)
+            self._entries[path] = {"signature": signature, "digest": digest, "df": df.copy()}
+            return df
+
+    def put(self, path, df):
+        """Record df as the current contents of path right after the app wrote it."""
+        with self._lock:
+            signature = file_signature(path)
+            digest = file_digest(path) if signature is not None else None
+            self._entries[path] = {"signature": signature, "digest": digest, "df": df.copy()}
+
+    def invalidate(self, path=None):
+        """Drop the cached entry for path (or every entry)."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+
+data_cache = DataCache()
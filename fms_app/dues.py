@@ -0,0 +1,134 @@
+# dues.py
+"""Precomputed dues index and the aggregates behind the dues dashboard.
+
+A DuesIndex keeps, per student, the outstanding amount of every year plus
+the outstanding totals and debtor counts per (Batch, Department). It is
+built once per data version and then kept current from the store's change
+notifications: only the rows a payment or charge touched are re-projected,
+and their old contribution to the group totals is swapped for the new one.
+The dashboard therefore renders from these aggregates instead of scanning
+every student on each rerun.
+
+Ageing buckets come from the ledger: payments settle the oldest charges
+first, and each unpaid remainder is aged by its charge date. The ledger
+query only reads the charges of students who still owe something.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from datastore import YEARS
+
+IDENTITY_COLUMNS = ["Register Number", "Name", "Batch", "Department"]
+YEAR_LABELS = [f"{year} year" for year in YEARS]
+DUE_COLUMNS = [f"Remaining Fees {label}" for label in YEAR_LABELS]
+COUNT_COLUMNS = [f"Students {label}" for label in YEAR_LABELS]
+GROUP_COLUMNS = ["Batch", "Department"]
+
+AGEING_BINS = [-np.inf, 30, 90, 180, np.inf]
+AGEING_LABELS = ["0-30 days", "31-90 days", "91-180 days", "180+ days"]
+
+
+class DuesIndex:
+    """Outstanding fees per student and per (Batch, Department, year).
+
+    Queries and updates share a lock, so a reader never sees half an update.
+    """
+
+    def __init__(self, df, version):
+        self.version = version
+        self._lock = threading.RLock()
+        self._rows = self._project(df)
+        self._groups = self._aggregate(self._rows)
+
+    @staticmethod
+    def _project(df):
+        rows = df[IDENTITY_COLUMNS].fillna("").astype(str)
+        dues = df[DUE_COLUMNS].astype(float).clip(lower=0.0)
+        rows = pd.concat([rows, dues], axis=1)
+        rows["Outstanding"] = dues.sum(axis=1)
+        return rows
+
+    @staticmethod
+    def _aggregate(rows):
+        counts = (rows[DUE_COLUMNS] > 0).astype(int)
+        counts.columns = COUNT_COLUMNS
+        frame = pd.concat([rows[GROUP_COLUMNS + DUE_COLUMNS], counts], axis=1)
+        return frame.groupby(GROUP_COLUMNS).sum()
+
+    def update(self, changed):
+        """Fold the current state of the changed rows into the index."""
+        if changed.empty:
+            return
+        new = self._project(changed)
+        with self._lock:
+            existing = new.index.isin(self._rows.index)
+            old = self._rows.loc[new.index[existing]]
+            delta = self._aggregate(new).sub(self._aggregate(old), fill_value=0)
+            self._groups = self._groups.add(delta, fill_value=0)
+            self._rows.loc[new.index[existing]] = new[existing]
+            if not existing.all():
+                self._rows = pd.concat([self._rows, new[~existing]])
+
+    # ---------------------- QUERIES ----------------------
+    def totals(self):
+        """Outstanding amount and number of students with dues, per year."""
+        with self._lock:
+            sums = self._groups[DUE_COLUMNS].sum()
+            counts = self._groups[COUNT_COLUMNS].sum()
+        return pd.DataFrame({
+            "Year": YEAR_LABELS,
+            "Outstanding": sums.to_numpy(),
+            "Students with Dues": counts.to_numpy().astype(int),
+        })
+
+    def by_group(self, year=None):
+        """Outstanding per Batch x Department for year (all years when None), non-zero groups only."""
+        with self._lock:
+            if year is None:
+                amount = self._groups[DUE_COLUMNS].sum(axis=1)
+            else:
+                amount = self._groups[f"Remaining Fees {year}"].copy()
+        table = amount[amount > 0].rename("Outstanding").reset_index()
+        return table.sort_values("Outstanding", ascending=False, kind="stable").reset_index(drop=True)
+
+    def pivot(self, year=None):
+        """by_group() as a Batch x Department matrix."""
+        table = self.by_group(year)
+        if table.empty:
+            return table
+        return table.pivot_table(index="Batch", columns="Department", values="Outstanding",
+                                 aggfunc="sum", fill_value=0.0)
+
+    def top_debtors(self, n=10, year=None):
+        """The n students with the largest outstanding amount (for year, or overall)."""
+        column = "Outstanding" if year is None else f"Remaining Fees {year}"
+        with self._lock:
+            top = self._rows[self._rows[column] > 0].nlargest(n, column)
+        return top[IDENTITY_COLUMNS + [column]]
+
+
+def ageing(unpaid, now=None):
+    """Unpaid charge amounts per age bucket, each charge aged by its charge date.
+
+    unpaid is a Ledger.unpaid_charges frame (payments already settled
+    against the oldest charges).
+    """
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp.now()
+    if unpaid.empty:
+        return pd.DataFrame({"Age": AGEING_LABELS, "Outstanding": 0.0})
+    age = (now - pd.to_datetime(unpaid["ts"])).dt.days
+    bucket = pd.cut(age, AGEING_BINS, labels=AGEING_LABELS)
+    totals = unpaid["unpaid"].astype(float).groupby(bucket, observed=False).sum()
+    return pd.DataFrame({"Age": AGEING_LABELS, "Outstanding": totals.reindex(AGEING_LABELS).fillna(0.0).to_numpy()})
+
+
+def dues_index(store):
+    """The store's DuesIndex for its current data version."""
+    return store.derived("dues", DuesIndex)
+
+
+def dues_ageing(store):
+    """ageing() of the store's unpaid ledger charges, cached per data version."""
+    return store.cached("dues_ageing", lambda: ageing(store.ledger.unpaid_charges()))
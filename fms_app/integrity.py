@@ -0,0 +1,104 @@
+# integrity.py
+"""Consistency check and repair for the derived Total/Remaining fee columns.
+
+Total Fees must equal the sum of the fee components and Remaining Fees
+must equal Total - Paid (clamped at zero). ``verify`` compares the stored
+values with the ones derived in a single array operation and reports every
+mismatch, plus credit balances (Paid above Total) that the clamp would
+otherwise hide. ``repair`` rewrites the derived columns from the
+components. Both run over all students and years at once, so checking
+after a bulk change costs milliseconds per thousand students.
+
+Command line:
+
+    python integrity.py abi.xlsx [--fix]
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from datastore import YEARS, compute_totals, expected_totals, fee_matrix
+from storage import open_store
+
+TOLERANCE = 0.005
+REPORT_COLUMNS = ["row", "Register Number", "Name", "year", "issue", "stored", "expected"]
+
+TOTAL_MISMATCH = "Total Fees differs from its components"
+REMAINING_MISMATCH = "Remaining Fees differs from Total - Paid"
+CREDIT_BALANCE = "credit balance (Paid above Total)"
+
+
+def verify(df, tolerance=TOLERANCE):
+    """One report row per inconsistent (student, year) value and per credit balance."""
+    if df.empty:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    total, remaining = expected_totals(df)
+    stored_total = fee_matrix(df, ["Total Fees"])[:, :, 0]
+    stored_remaining = fee_matrix(df, ["Remaining Fees"])[:, :, 0]
+    paid = fee_matrix(df, ["Paid Fees"])[:, :, 0]
+    checks = [
+        (TOTAL_MISMATCH, np.abs(stored_total - total) > tolerance, stored_total, total),
+        (REMAINING_MISMATCH, np.abs(stored_remaining - remaining) > tolerance, stored_remaining, remaining),
+        (CREDIT_BALANCE, paid - total > tolerance, paid, total),
+    ]
+    parts = []
+    for issue, mask, stored, expected in checks:
+        rows, years = np.nonzero(mask)
+        if not len(rows):
+            continue
+        parts.append(pd.DataFrame({
+            "row": df.index[rows],
+            "Register Number": df["Register Number"].to_numpy()[rows],
+            "Name": df["Name"].to_numpy()[rows],
+            "year": [f"{YEARS[y]} year" for y in years],
+            "issue": issue,
+            "stored": stored[rows, years],
+            "expected": expected[rows, years],
+        }))
+    if not parts:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    return pd.concat(parts, ignore_index=True).sort_values(["row", "year"], kind="stable").reset_index(drop=True)
+
+
+def repair(store):
+    """Rewrite Total/Remaining from the components in one store write; returns the rows changed.
+
+    A journaled store first posts any journal events its ledger missed (see JournaledStore.sync_ledger).
+    """
+    if hasattr(store, "sync_ledger"):
+        store.sync_ledger()
+    df = store.load()
+    before = df.copy()
+    compute_totals(df)
+    changed = int((before.ne(df) & ~(before.isna() & df.isna())).any(axis=1).sum())
+    if changed:
+        store.save_frame(df, expected_version=df.attrs.get("version"))
+    return changed
+
+
+def integrity_report(store):
+    """verify() over the store's data, cached per data version."""
+    return store.cached("integrity", lambda: verify(store.load()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check (and optionally repair) the Total/Remaining fee columns.")
+    parser.add_argument("data_file", help="data file of the app, e.g. abi.xlsx or abi.db")
+    parser.add_argument("--fix", action="store_true", help="recompute Total/Remaining from the components")
+    args = parser.parse_args(argv)
+
+    store = open_store(args.data_file)
+    report = verify(store.load())
+    for row, reg, _, year, issue, stored, expected in report[REPORT_COLUMNS].itertuples(index=False, name=None):
+        print(f"row {row} ({reg}), {year}: {issue}: stored {stored:.2f}, expected {expected:.2f}")
+    print(f"{len(report)} issues in {report['row'].nunique()} students")
+    if args.fix:
+        print(f"Repaired {repair(store)} students")
+        return 0
+    return 1 if len(report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
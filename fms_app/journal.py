@@ -0,0 +1,647 @@
+# journal.py
+"""Append-only transaction journal in front of the student workbook.
+
+Every payment or new student is one JSON line appended to
+``<data file>.journal.jsonl``; the workbook itself is only rewritten when the
+journal is compacted (every ``compact_every`` events) or exported explicitly.
+The first journal line is a header carrying a random generation id. The
+workbook stores the (generation, offset) it was compacted at in a hidden
+sheet, so a crash between rewriting the workbook and rotating the journal
+never replays an event twice.
+
+With pyarrow installed the base is the typed Arrow snapshot next to the
+workbook (see snapshot.py) rather than the workbook itself, so loading and
+compacting skip openpyxl; the workbook is imported once and rewritten on
+export.
+
+Writers hold ``<data file>.journal.lock`` while they sync, append and
+compact, so several app processes sharing one workbook serialize their
+writes instead of compacting over each other's events.
+
+The fee ledger is a separate SQLite file, so a write is not atomic across
+the two: a crash after the journal append but before the ledger post would
+leave the ledger short. Every event therefore carries an id, the ledger
+records the ids it has posted (in the same transaction as the entries),
+and ``sync_ledger`` posts whatever is missing. It runs when the store
+opens its ledger and before each compaction, while the events are still in
+the journal. The audit log (see audit.py) is kept the same way: events
+carry their audit context and ``sync_audit`` logs the ones it missed.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+
+from audit import current_context
+from datastore import (PAYMENT, data_cache, ensure_columns, file_signature, post_fees, read_excel_data,
+                       write_excel_data)
+from ledger import entries_from_frame
+from snapshot import available as snapshot_available, read_snapshot, snapshot_path_for, write_snapshot
+from storage import ConflictError, StudentStore
+
+DEFAULT_COMPACT_EVERY = 500
+
+
+def journal_path_for(data_file):
+    """Journal file that belongs to a data workbook."""
+    return os.path.splitext(data_file)[0] + ".journal.jsonl"
+
+
+class FileLock:
+    """Exclusive inter-process lock on a file; re-entrant within the owning thread lock."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+
+    def __enter__(self):
+        if self._depth == 0:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                else:
+                    while True:
+                        try:
+                            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:  # LK_LOCK gives up after ~10 s; keep waiting
+                            time.sleep(0.05)
+            except BaseException:
+                os.close(fd)
+                raise
+            self._fd = fd
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+
+
+# ---------------------- EVENT APPLICATION ----------------------
+def apply_events(df, events):
+    """Apply journal events to df in order (payments in place); returns the resulting frame."""
+    new_rows = []
+    for event in events:
+        op = event.get("op")
+        if op == "student":
+            new_rows.append(event["data"])
+            continue
+        if op == "students":
+            new_rows.extend(event["rows"])
+            continue
+        if new_rows:
+            df = _append_rows(df, new_rows)
+            new_rows = []
+        if op == "payment":
+            _apply_payment(df, event)
+        elif op == "payments":
+            _apply_payments(df, event["items"])
+        elif op == "batch":
+            rows = [r for r in event["rows"] if r in df.index]
+            post_fees(df, rows, event["year"], event["fee_type"], float(event["amount"]), event["kind"])
+    if new_rows:
+        df = _append_rows(df, new_rows)
+    return df
+
+
+def _append_rows(df, rows):
+    # consecutive inserts are concatenated in one go
+    return ensure_columns(pd.concat([df, pd.DataFrame(rows)], ignore_index=True))
+
+
+def _apply_payment(df, event):
+    idx = event["row"]
+    if idx not in df.index:
+        return
+    paid_col = f"Paid Fees {event['year']}"
+    remaining_col = f"Remaining Fees {event['year']}"
+    amount = float(event["amount"])
+    df.at[idx, paid_col] = float(df.at[idx, paid_col]) + amount
+    df.at[idx, remaining_col] = max(float(df.at[idx, remaining_col]) - amount, 0.0)
+
+
+def _apply_payments(df, items):
+    """Vectorized _apply_payment for many items (non-negative amounts, so clipping once is exact)."""
+    items = pd.DataFrame(items, columns=["row", "year", "amount"])
+    items = items[items["row"].isin(df.index)]
+    for year, group in items.groupby("year", sort=False):
+        sums = group.groupby("row")["amount"].sum().astype(float)
+        paid_col = f"Paid Fees {year}"
+        remaining_col = f"Remaining Fees {year}"
+        df.loc[sums.index, paid_col] = df.loc[sums.index, paid_col].astype(float) + sums
+        df.loc[sums.index, remaining_col] = (df.loc[sums.index, remaining_col].astype(float) - sums).clip(lower=0.0)
+
+
+def event_rows(event, df):
+    """Frame rows a journal event writes when applied to df (new rows for inserts)."""
+    op = event.get("op")
+    if op in ("student", "students"):
+        return list(range(len(df), len(df) + (1 if op == "student" else len(event["rows"]))))
+    if op == "payment":
+        rows = [event["row"]]
+    elif op == "payments":
+        rows = [item["row"] for item in event["items"]]
+    else:
+        rows = event.get("rows", [])
+    return [r for r in dict.fromkeys(rows) if r in df.index]
+
+
+class JournaledStore(StudentStore):
+    """Student data = workbook snapshot + replayed journal tail.
+
+    The materialized frame is kept in memory and only the bytes appended to
+    the journal since the last call are parsed, so a write costs one small
+    append regardless of how many students there are. All methods are safe
+    to call from concurrent Streamlit sessions in one process, and writes
+    are serialized across processes by the journal lock file.
+    """
+
+    def __init__(self, data_file, journal_file=None, compact_every=DEFAULT_COMPACT_EVERY):
+        super().__init__()
+        self.data_file = data_file
+        self.journal_file = journal_file or journal_path_for(data_file)
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(os.path.splitext(self.journal_file)[0] + ".lock")
+        # base file the journal is replayed on: the Arrow snapshot if available, else the workbook
+        self.base_file = snapshot_path_for(data_file) if snapshot_available() else data_file
+        if self.base_file == data_file and os.path.exists(snapshot_path_for(data_file)):
+            # the workbook may be older than the snapshot; reading it would lose writes
+            raise RuntimeError(f"{snapshot_path_for(data_file)} needs pyarrow; install it, or export the "
+                               "data with 'python snapshot.py export' where it is installed")
+        self._df = None
+        self._base_signature = None
+        self._generation = None
+        self._offset = 0
+        self._pending = 0
+
+    # ---------------------- READ PATH ----------------------
+    def load(self):
+        """Return a private copy of the current student data, stamped with its version."""
+        with self._lock:
+            self._sync()
+            df = self._df.copy()
+            df.attrs["version"] = self._version()
+            return df
+
+    def _query(self, fn):
+        with self._lock:
+            self._sync()
+            return fn(self._df)
+
+    def version(self):
+        """(base file signature, journal generation, journal offset) after syncing."""
+        with self._lock:
+            self._sync()
+            return self._version()
+
+    def _version(self):
+        return (self._base_signature, self._generation, self._offset)
+
+    def _sync(self):
+        """Bring the in-memory frame up to date with the workbook and journal.
+
+        Returns the number of journal events applied, or None when the frame
+        was reloaded from the base file or a rotated journal.
+        """
+        applied = 0
+        signature = file_signature(self.base_file)
+        if signature is None and self.base_file != self.data_file and os.path.exists(self.data_file):
+            self._import_workbook()
+            signature = file_signature(self.base_file)
+        if self._df is None or signature != self._base_signature:
+            self._reload_base(signature)
+            applied = None
+        generation, header_end = self._read_header()
+        if generation is None:
+            self._start_journal()
+            return None
+        if generation != self._generation:
+            # The journal was rotated by someone else: start from its beginning.
+            self._generation = generation
+            self._offset = header_end
+            applied = None
+        count = self._replay_tail()
+        return None if applied is None else count
+
+    def _import_workbook(self):
+        """Build the snapshot from the workbook (first run with pyarrow); keeps its journal checkpoint."""
+        df = read_excel_data(self.data_file)
+        write_snapshot(df, self.base_file, checkpoint=df.attrs.get("checkpoint"))
+
+    def _reload_base(self, signature):
+        loader = read_excel_data if self.base_file == self.data_file else read_snapshot
+        base = data_cache.get(self.base_file, loader)
+        checkpoint = base.attrs.get("checkpoint") or {}
+        self._df = base
+        self._base_signature = signature
+        self._generation = checkpoint.get("generation")
+        self._offset = int(checkpoint.get("offset") or 0)
+        self._pending = 0
+
+    def _read_header(self):
+        try:
+            with open(self.journal_file, "rb") as f:
+                line = f.readline()
+        except OSError:
+            return None, 0
+        if not line.endswith(b"\n"):
+            return None, 0
+        try:
+            header = json.loads(line)
+        except ValueError:
+            return None, 0
+        return header.get("generation"), len(line)
+
+    def _replay_tail(self):
+        with open(self.journal_file, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n")
+        if end < 0:
+            return 0
+        events = [json.loads(line) for line in data[:end].split(b"\n") if line.strip()]
+        self._offset += end + 1
+        # bulk inserts and payment runs weigh as much as their rows towards the next compaction
+        self._pending += sum(len(e["rows"]) if e.get("op") == "students"
+                             else len(e["items"]) if e.get("op") == "payments" else 1 for e in events)
+        self._df = apply_events(self._df, events)
+        return len(events)
+
+    # ---------------------- WRITE PATH ----------------------
+    @contextmanager
+    def _exclusive(self):
+        """Store lock plus the inter-process journal lock, held for one whole write."""
+        with self._lock, self._file_lock:
+            yield
+
+    def _start_journal(self):
+        """Create a fresh journal (new generation) containing only the header."""
+        self._generation = uuid.uuid4().hex
+        header = (json.dumps({"op": "header", "generation": self._generation}) + "\n").encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+        except Exception:
+            pass
+        tmp_path = self.journal_file + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_file)
+        self._offset = len(header)
+        self._pending = 0
+
+    def _append(self, event):
+        event.setdefault("ts", pd.Timestamp.now().isoformat())
+        event.setdefault("id", uuid.uuid4().hex)
+        event.setdefault("audit", current_context())
+        line = (json.dumps(event, default=str) + "\n").encode("utf-8")
+        fd = os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _write_event(self, ledger, event, rows):
+        """Append event and apply it, then post it to the ledger and the audit log.
+
+        rows are the frame rows the event writes (see event_rows). Returns
+        them as they are now, or None if the sync also picked up other
+        writers' events.
+        """
+        written = self._df.loc[[r for r in rows if r in self._df.index]].copy()  # none for inserts
+        self._append(event)
+        applied = self._sync()
+        self._post_event(ledger, event)
+        changed = self._df.loc[rows].copy()
+        self._audit_write(changed, written, event=(event["id"], self._generation), context=event["audit"])
+        return changed if applied == 1 else None
+
+    def append_student(self, data):
+        """Journal a new student row (dict of column -> value) and post its fees to the ledger."""
+        ledger = self.ledger  # opened (and seeded) before taking the store lock
+        with self._exclusive():
+            self._sync()
+            before = self._version()
+            event = {"op": "student", "data": data}
+            rows = event_rows(event, self._df)
+            changed = self._write_event(ledger, event, rows)
+            self._maybe_compact()
+            after = self._version()
+        self._notify(before, after, changed)
+
+    def append_students(self, df):
+        """Journal many new student rows as one event (a single append) and post their fees."""
+        df = ensure_columns(df.copy())
+        ledger = self.ledger  # opened (and seeded) before taking the store lock
+        with self._exclusive():
+            self._sync()
+            before = self._version()
+            event = {"op": "students", "rows": df.to_dict(orient="records")}
+            rows = event_rows(event, self._df)
+            changed = self._write_event(ledger, event, rows)
+            self._maybe_compact()
+            after = self._version()
+        self._notify(before, after, changed)
+        return len(df)
+
+    def record_payment(self, row, year, amount, fee_type="", receipt_no=""):
+        """Journal a payment against row (frame index) for year (e.g. "1st year").
+
+        Returns the paid/remaining/total values before and after the payment.
+        """
+        ledger = self.ledger  # opened (and seeded) before taking the store lock
+        with self._exclusive():
+            self._sync()
+            version_before = self._version()
+            paid_col = f"Paid Fees {year}"
+            remaining_col = f"Remaining Fees {year}"
+            before = {
+                "paid": float(self._df.at[row, paid_col]),
+                "remaining": float(self._df.at[row, remaining_col]),
+            }
+            event = {
+                "op": "payment", "row": int(row), "year": year,
+                "amount": float(amount), "fee_type": fee_type, "receipt_no": receipt_no,
+                "register_number": str(self._df.at[row, "Register Number"]),
+            }
+            changed = self._write_event(ledger, event, [row])
+            result = {
+                "previous_paid": before["paid"],
+                "previous_remaining": before["remaining"],
+                "paid": float(self._df.at[row, paid_col]),
+                "remaining": float(self._df.at[row, remaining_col]),
+                "total": float(self._df.at[row, f"Total Fees {year}"]),
+            }
+            self._maybe_compact()
+            version_after = self._version()
+        self._notify(version_before, version_after, changed)
+        return result
+
+    def post_payments(self, payments):
+        """Journal many payments as a single event and post them to the ledger."""
+        ledger = self.ledger  # opened (and seeded) before taking the store lock
+        with self._exclusive():
+            self._sync()
+            before = self._version()
+            rows = [int(r) for r in payments["row"]]
+            missing = [r for r in rows if r not in self._df.index]
+            if missing:
+                raise KeyError(missing[0])
+            now = pd.Timestamp.now().isoformat()
+            ts = payments["ts"].fillna(now) if "ts" in payments.columns else pd.Series(now, index=payments.index)
+            register_numbers = self._df.loc[rows, "Register Number"].astype(str).tolist()
+            items = [
+                {"row": row, "year": year, "amount": float(amount), "fee_type": fee_type,
+                 "receipt_no": receipt_no, "register_number": reg, "ts": str(when)}
+                for row, reg, year, amount, fee_type, receipt_no, when in zip(
+                    rows, register_numbers, payments["year"], payments["amount"], payments["fee_type"],
+                    payments["receipt_no"], ts)
+            ]
+            event = {"op": "payments", "items": items}
+            rows = event_rows(event, self._df)
+            changed = self._write_event(ledger, event, rows)
+            self._maybe_compact()
+            after = self._version()
+        self._notify(before, after, changed)
+        return {"payments": len(items), "amount": float(sum(i["amount"] for i in items))}
+
+    def post_batch(self, rows, year, fee_type, amount, kind, receipt_no=""):
+        """Journal one charge or payment for every row in rows as a single event."""
+        ledger = self.ledger  # opened (and seeded) before taking the store lock
+        with self._exclusive():
+            self._sync()
+            before = self._version()
+            rows = [int(r) for r in rows]
+            # validate (and fail) before anything is written
+            post_fees(self._df.loc[rows].copy(), rows, year, fee_type, float(amount), kind)
+            register_numbers = self._df.loc[rows, "Register Number"].astype(str).tolist()
+            event = {
+                "op": "batch", "rows": rows, "register_numbers": register_numbers, "year": year,
+                "fee_type": fee_type, "amount": float(amount), "kind": kind, "receipt_no": receipt_no,
+            }
+            changed = self._write_event(ledger, event, rows)
+            self._maybe_compact()
+            after = self._version()
+        self._notify(before, after, changed)
+        return {"students": len(rows), "amount": float(amount) * len(rows)}
+
+    # ---------------------- LEDGER ----------------------
+    def _ledger_entries(self, event):
+        """Ledger entries of one journal event."""
+        op, ts = event.get("op"), event.get("ts")
+        if op == "student":
+            return entries_from_frame(pd.DataFrame([event["data"]]), ts=ts)
+        if op == "students":
+            return entries_from_frame(pd.DataFrame(event["rows"]), ts=ts)
+        if op == "batch":
+            # events written before register numbers were journaled name rows only
+            register_numbers = event.get("register_numbers")
+            if register_numbers is None:
+                rows = [r for r in event["rows"] if r in self._df.index]
+                register_numbers = self._df.loc[rows, "Register Number"].astype(str).tolist()
+            return [{"register_number": reg, "year": event["year"], "fee_type": event["fee_type"],
+                     "amount": float(event["amount"]), "kind": event["kind"], "ts": ts,
+                     "receipt_no": event.get("receipt_no", "")} for reg in register_numbers]
+        items = [event] if op == "payment" else event.get("items", []) if op == "payments" else []
+        return [{"register_number": i["register_number"], "year": i["year"], "fee_type": i.get("fee_type", ""),
+                 "amount": float(i["amount"]), "kind": PAYMENT, "ts": i.get("ts", ts),
+                 "receipt_no": i.get("receipt_no", "")} for i in items]
+
+    def _post_event(self, ledger, event, generation=None):
+        return ledger.post(self._ledger_entries(event), event=(event["id"], generation or self._generation))
+
+    def _journal_events(self):
+        """(generation, [(end offset, event)]) for the complete lines of the journal file."""
+        try:
+            with open(self.journal_file, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None, []
+        generation, events, start = None, [], 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                break
+            line, start = data[start:end], end + 1
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("op") == "header":
+                generation = record.get("generation")
+            else:
+                events.append((start, record))
+        return generation, events
+
+    def _ledger_opened(self, ledger, seed):
+        if seed is not None:
+            # the seed frame already holds the events replayed into it
+            _, generation, offset = seed.attrs["version"]
+            journal_generation, events = self._journal_events()
+            if journal_generation == generation:
+                ledger.mark_posted((event["id"], generation) for end, event in events
+                                   if end <= offset and "id" in event)
+        self.sync_ledger(ledger)
+
+    def sync_ledger(self, ledger=None):
+        """Post the ledger entries of journal events that never reached the ledger; returns how many.
+
+        Events are posted at most once (see Ledger.post), so this is safe to
+        run while other processes write.
+        """
+        ledger = ledger or self.ledger
+        with self._lock:
+            self._sync()
+            generation, events = self._journal_events()
+            if generation is None:
+                return 0
+            posted = ledger.posted_events(generation)
+            missing = [event for _, event in events if "id" in event and event["id"] not in posted]
+            for event in missing:
+                self._post_event(ledger, event, generation)
+        return len(missing)
+
+    # ---------------------- AUDIT ----------------------
+    def _audit_opened(self, log, seed):
+        if seed is not None:
+            # the start snapshot already holds the events replayed into it
+            _, generation, offset = seed.attrs["version"]
+            journal_generation, events = self._journal_events()
+            if journal_generation == generation:
+                log.mark_recorded((event["id"], generation) for end, event in events
+                                  if end <= offset and "id" in event)
+        self.sync_audit(log)
+
+    def sync_audit(self, log=None):
+        """Log the journal events that never reached the audit log; returns how many.
+
+        Each one is logged with the audit context it was journaled with and
+        the values it changed, found by replaying the journal on its base.
+        Events journaled without a context predate per-event auditing and
+        were logged when they were written.
+        """
+        log = log or getattr(self, "_audit", None)
+        if log is None:
+            return 0
+        with self._exclusive():
+            self._sync()
+            generation, events = self._journal_events()
+            if generation is None:
+                return 0
+            recorded = log.recorded_events(generation)
+            missing = {event["id"] for _, event in events
+                       if "id" in event and "audit" in event and event["id"] not in recorded}
+            if not missing:
+                return 0
+            base = data_cache.get(self.base_file, read_excel_data if self.base_file == self.data_file
+                                  else read_snapshot)
+            checkpoint = base.attrs.get("checkpoint") or {}
+            skip = int(checkpoint.get("offset") or 0) if checkpoint.get("generation") == generation else 0
+            df = base.copy()
+            for end, event in events:
+                if end <= skip:
+                    continue
+                rows = event_rows(event, df)
+                written = df.loc[[r for r in rows if r in df.index]].copy()
+                df = apply_events(df, [event])
+                if event.get("id") in missing:
+                    log.record(df.loc[rows], before=written, event=(event["id"], generation),
+                               context=event["audit"], ts=event["ts"])
+        return len(missing)
+
+    def _maybe_compact(self):
+        if self.compact_every and self._pending >= self.compact_every:
+            self._write_base(self._df)
+
+    # ---------------------- COMPACTION / EXPORT ----------------------
+    def compact(self):
+        """Fold the journal into the workbook and start a new journal generation."""
+        self.ledger  # opened before taking the store lock, so _write_base can catch it up
+        with self._exclusive():
+            self._sync()
+            before = self._version()
+            self._write_base(self._df)
+            after = self._version()
+        self._notify(before, after, self._df.iloc[0:0])
+
+    def save_frame(self, df, expected_version=None):
+        """Replace the whole dataset with df (one workbook write, journal reset).
+
+        Rows are stored and journaled by position, so df's index is replaced
+        by 0..n-1. Raises ConflictError if expected_version is given and the data has
+        moved past it, so a stale frame never overwrites newer writes.
+        """
+        if os.path.exists(self.data_file):
+            self.ledger  # opened before taking the store lock, so _write_base can catch it up
+        # (a new workbook has no journal to catch up; its ledger is seeded from df on first use)
+        with self._exclusive():
+            self._sync()
+            before = self._version()
+            if expected_version is not None and expected_version != before:
+                raise ConflictError("the student data changed since it was loaded")
+            replaced = self._df
+            self._write_base(ensure_columns(df.reset_index(drop=True)))
+            # no journal event to tag: logged while the lock still keeps other writers out
+            self._audit_write(self._df, replaced)
+            after = self._version()
+        self._notify(before, after, None)
+
+    def _write_base(self, df):
+        ledger = getattr(self, "_ledger", None)  # opened by the writer before taking the store lock
+        audit = getattr(self, "_audit", None)
+        if ledger is not None:
+            self.sync_ledger(ledger)  # last chance: the journal is about to be rotated
+        if audit is not None:
+            self.sync_audit(audit)
+        checkpoint = {"generation": self._generation, "offset": self._offset}
+        if self.base_file == self.data_file:
+            write_excel_data(df, self.data_file, checkpoint=checkpoint)
+        else:
+            write_snapshot(df, self.base_file, checkpoint=checkpoint)
+        df.attrs["checkpoint"] = checkpoint
+        data_cache.put(self.base_file, df)
+        self._df = df
+        self._base_signature = file_signature(self.base_file)
+        self._start_journal()
+        if ledger is not None:
+            ledger.forget_generations(keep=self._generation)
+        if audit is not None:
+            audit.forget_generations(keep=self._generation)
+
+    def export_excel(self, path):
+        """Write the current data to a plain .xlsx file at path.
+
+        Exporting over the store's own workbook records the journal position
+        in it, so re-importing that workbook never replays an event twice.
+        """
+        with self._lock:
+            self._sync()
+            checkpoint = None
+            if os.path.abspath(path) == os.path.abspath(self.data_file):
+                checkpoint = {"generation": self._generation, "offset": self._offset}
+            write_excel_data(self._df, path, checkpoint=checkpoint)
+
@@ -0,0 +1,263 @@
+# ledger.py
+"""Normalized fee ledger: one row per charge or payment.
+
+``ledger_entries`` keeps every posting (student, year, fee type, amount,
+kind = charge/payment, timestamp, receipt no), so per-payment history is
+queryable. ``fee_summary`` is a materialized per-student/year total of
+charges and payments, updated in the same transaction as each posting, so
+balances are read incrementally instead of being summed from the 48 wide
+fee columns.
+
+Students are keyed by Register Number. Year values use the column suffix
+("1st year" .. "4th year").
+"""
+import sqlite3
+import threading
+
+import pandas as pd
+
+from datastore import CHARGE, FEE_COMPONENTS, PAYMENT, YEARS
+
+OPENING_BALANCE = "Opening balance"
+
+ENTRY_COLUMNS = ["register_number", "year", "fee_type", "amount", "kind", "ts", "receipt_no"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_entries (
+    id INTEGER PRIMARY KEY,
+    register_number TEXT NOT NULL,
+    year TEXT NOT NULL,
+    fee_type TEXT NOT NULL,
+    amount REAL NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('charge', 'payment')),
+    ts TEXT NOT NULL,
+    receipt_no TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_student ON ledger_entries (register_number, year);
+CREATE INDEX IF NOT EXISTS idx_ledger_ts ON ledger_entries (ts);
+CREATE INDEX IF NOT EXISTS idx_ledger_receipt ON ledger_entries (receipt_no);
+CREATE TABLE IF NOT EXISTS fee_summary (
+    register_number TEXT NOT NULL,
+    year TEXT NOT NULL,
+    charged REAL NOT NULL DEFAULT 0,
+    paid REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (register_number, year)
+);
+CREATE TABLE IF NOT EXISTS journal_postings (
+    event_id TEXT PRIMARY KEY,
+    generation TEXT NOT NULL
+);
+"""
+
+# wide column -> (fee type, year) for the columns that become ledger rows
+_CHARGE_COLUMNS = {f"{ft} {y} year": (ft, f"{y} year") for y in YEARS for ft in FEE_COMPONENTS}
+_PAID_COLUMNS = {f"Paid Fees {y} year": (OPENING_BALANCE, f"{y} year") for y in YEARS}
+
+
+def entries_from_frame(df, ts=None):
+    """Long-format ledger entries for the non-zero fee cells of a wide student frame.
+
+    Fee components become charges and the Paid Fees columns become one
+    opening-balance payment per year. Returns a DataFrame with ENTRY_COLUMNS.
+    """
+    ts = ts or pd.Timestamp.now().isoformat()
+    parts = []
+    for mapping, kind in ((_CHARGE_COLUMNS, CHARGE), (_PAID_COLUMNS, PAYMENT)):
+        cols = [c for c in mapping if c in df.columns]
+        if not cols or df.empty:
+            continue
+        wide = df[cols].apply(pd.to_numeric, errors="coerce").fillna(0.0)
+        wide.index = df["Register Number"].fillna("").astype(str)
+        long = wide.stack()
+        long = long[long != 0]
+        if long.empty:
+            continue
+        columns = long.index.get_level_values(1)
+        parts.append(pd.DataFrame({
+            "register_number": long.index.get_level_values(0),
+            "year": [mapping[c][1] for c in columns],
+            "fee_type": [mapping[c][0] for c in columns],
+            "amount": long.to_numpy(dtype=float),
+            "kind": kind,
+            "ts": ts,
+            "receipt_no": "",
+        }))
+    if not parts:
+        return pd.DataFrame(columns=ENTRY_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+class Ledger:
+    """Ledger tables inside an SQLite database (one connection per thread)."""
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def is_empty(self):
+        return self._conn().execute("SELECT 1 FROM ledger_entries LIMIT 1").fetchone() is None
+
+    # ---------------------- POSTING ----------------------
+    def post(self, entries, conn=None, event=None):
+        """Append entries (iterable of dicts / DataFrame with ENTRY_COLUMNS).
+
+        Entries and the summary update are written in one transaction. Pass
+        conn to join a transaction the caller already holds on the same file.
+        event = (event id, journal generation) posts the entries of one
+        journal event at most once: if that event is already recorded as
+        posted, nothing is written and 0 is returned.
+        """
+        if isinstance(entries, pd.DataFrame):
+            frame = entries.reindex(columns=ENTRY_COLUMNS)
+        else:
+            frame = pd.DataFrame(list(entries), columns=ENTRY_COLUMNS)
+        if frame.empty and event is None:
+            return 0
+        frame["ts"] = frame["ts"].fillna(pd.Timestamp.now().isoformat())
+        frame["receipt_no"] = frame["receipt_no"].fillna("")
+        frame["register_number"] = frame["register_number"].fillna("").astype(str)
+        frame["amount"] = frame["amount"].astype(float)
+        frame["charged"] = frame["amount"].where(frame["kind"] == CHARGE, 0.0)
+        frame["paid"] = frame["amount"].where(frame["kind"] == PAYMENT, 0.0)
+        totals = frame.groupby(["register_number", "year"], sort=False)[["charged", "paid"]].sum()
+
+        own = conn is None
+        conn = conn or self._conn()
+        if own:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            if event is not None and conn.execute(
+                    "INSERT OR IGNORE INTO journal_postings (event_id, generation) VALUES (?, ?)", event).rowcount == 0:
+                if own:
+                    conn.execute("COMMIT")
+                return 0
+            conn.executemany(
+                "INSERT INTO ledger_entries (register_number, year, fee_type, amount, kind, ts, receipt_no) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                frame[ENTRY_COLUMNS].itertuples(index=False, name=None),
+            )
+            conn.executemany(
+                "INSERT INTO fee_summary (register_number, year, charged, paid) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (register_number, year) DO UPDATE SET "
+                "charged = charged + excluded.charged, paid = paid + excluded.paid",
+                ((reg, year, float(c), float(p)) for (reg, year), c, p
+                 in zip(totals.index, totals["charged"], totals["paid"])),
+            )
+            if own:
+                conn.execute("COMMIT")
+        except Exception:
+            if own:
+                conn.execute("ROLLBACK")
+            raise
+        return len(frame)
+
+    def seed_from_frame(self, df):
+        """Record the fee cells of an existing wide frame as opening entries."""
+        return self.post(entries_from_frame(df))
+
+    def posted_events(self, generation):
+        """Ids of the journal events of generation whose entries are in the ledger."""
+        rows = self._conn().execute("SELECT event_id FROM journal_postings WHERE generation = ?", (generation,))
+        return {row[0] for row in rows}
+
+    def mark_posted(self, events):
+        """Record (event id, generation) pairs as posted without writing entries (already in a seed)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT OR IGNORE INTO journal_postings (event_id, generation) VALUES (?, ?)", events)
+        conn.execute("COMMIT")
+
+    def forget_generations(self, keep):
+        """Drop the posted-event records of every journal generation except keep."""
+        conn = self._conn()
+        conn.execute("DELETE FROM journal_postings WHERE generation != ?", (keep,))
+
+    def clear(self):
+        """Drop every entry and summary row."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM ledger_entries")
+        conn.execute("DELETE FROM fee_summary")
+        conn.execute("DELETE FROM journal_postings")
+        conn.execute("COMMIT")
+
+    # ---------------------- QUERIES ----------------------
+    def history(self, register_number=None, year=None, start=None, end=None):
+        """Entries in posting order, filtered by student, year and [start, end) timestamps."""
+        clauses, params = [], []
+        for clause, value in (("register_number = ?", register_number), ("year = ?", year),
+                              ("ts >= ?", start), ("ts < ?", end)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(str(value))
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        return pd.read_sql_query(
+            f"SELECT {', '.join(ENTRY_COLUMNS)} FROM ledger_entries {where} ORDER BY id",
+            self._conn(), params=params,
+        )
+
+    def payments(self, include_opening=False):
+        """Payment entries in posting order, without the opening balances unless asked for."""
+        where = "" if include_opening else "AND fee_type != ?"
+        return pd.read_sql_query(
+            f"SELECT {', '.join(ENTRY_COLUMNS)} FROM ledger_entries WHERE kind = ? {where} ORDER BY id",
+            self._conn(), params=[PAYMENT] if include_opening else [PAYMENT, OPENING_BALANCE],
+        )
+
+    def unpaid_charges(self, tolerance=0.005):
+        """Unpaid remainder of each charge, settling payments against the oldest charges first.
+
+        Only the (student, year) pairs whose fee_summary still shows a balance
+        are read, through the student index, so the cost follows the number of
+        debtors rather than the size of the ledger. Returns register_number,
+        year, fee_type, ts and unpaid, one row per charge with unpaid > 0.
+        """
+        return pd.read_sql_query(
+            """
+            WITH owing AS (
+                SELECT register_number, year, paid FROM fee_summary WHERE charged - paid > ?
+            ), charges AS (
+                SELECT e.register_number, e.year, e.fee_type, e.ts, e.amount, o.paid,
+                       SUM(e.amount) OVER (PARTITION BY e.register_number, e.year
+                                           ORDER BY e.ts, e.id) AS charged_so_far
+                FROM owing o JOIN ledger_entries e
+                  ON e.register_number = o.register_number AND e.year = o.year AND e.kind = ?
+            )
+            SELECT register_number, year, fee_type, ts, MIN(amount, charged_so_far - paid) AS unpaid
+            FROM charges WHERE charged_so_far - paid > ?
+            ORDER BY ts, register_number, year
+            """,
+            self._conn(), params=[tolerance, CHARGE, tolerance],
+        )
+
+    def posted_receipts(self, receipt_nos):
+        """The subset of receipt_nos that already have ledger entries (index lookups)."""
+        receipt_nos = [str(r) for r in receipt_nos if r]
+        found = set()
+        for start in range(0, len(receipt_nos), 500):
+            chunk = receipt_nos[start:start + 500]
+            found.update(r[0] for r in self._conn().execute(
+                f"SELECT DISTINCT receipt_no FROM ledger_entries WHERE receipt_no IN ({', '.join('?' for _ in chunk)})",
+                chunk))
+        return found
+
+    def summary(self, register_number=None):
+        """Charged / paid / remaining per student and year from the materialized table."""
+        where, params = "", []
+        if register_number is not None:
+            where, params = "WHERE register_number = ?", [str(register_number)]
+        return pd.read_sql_query(
+            "SELECT register_number, year, charged, paid, charged - paid AS remaining "
+            f"FROM fee_summary {where} ORDER BY register_number, year",
+            self._conn(), params=params,
+        )
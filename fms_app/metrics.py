@@ -0,0 +1,169 @@
+# metrics.py
+"""In-process latency metrics for the app's hot paths.
+
+``timed(name, **labels)`` is a context manager and decorator that records
+how long a block took, in milliseconds. Every (name, labels) series keeps
+its count and sum plus the most recent ``WINDOW`` observations for
+percentiles. ``set_gauge`` records point values such as the number of
+students. The registry is process-wide, so it covers every Streamlit
+session served by the process.
+
+``prometheus_text()`` renders the registry in the Prometheus text format
+(summaries with 0.5/0.9/0.99 quantiles), and ``set_sink(path)`` appends
+each observation to a JSONL file as it happens.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import ContextDecorator
+
+import numpy as np
+import pandas as pd
+
+WINDOW = 1000
+QUANTILES = (0.5, 0.9, 0.99)
+PREFIX = "fms_"
+
+
+class Series:
+    """Count, sum and a sliding window of observations for one metric series."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.window = deque(maxlen=WINDOW)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.window.append(value)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}   # (name, labels) -> Series
+        self._gauges = {}   # (name, labels) -> value
+        self._sink = None
+
+    def observe(self, name, value, labels=()):
+        key = (name, tuple(sorted(labels)))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = Series()
+            series.observe(value)
+            sink = self._sink
+            if sink is not None:
+                line = json.dumps({"ts": time.time(), "metric": name, "labels": dict(key[1]), "ms": round(value, 3)})
+                with open(sink, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def set_gauge(self, name, value, labels=()):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels)))] = float(value)
+
+    def set_sink(self, path):
+        """Append every later observation to the JSONL file at path (None stops it)."""
+        with self._lock:
+            self._sink = path
+
+    @property
+    def sink(self):
+        return self._sink
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._gauges.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            series = [(name, labels, s.count, s.total, np.array(s.window)) for (name, labels), s in self._series.items()]
+            gauges = list(self._gauges.items())
+        return series, gauges
+
+    def summary(self):
+        """One row per series: count, mean and percentiles of the recent window (ms)."""
+        series, _ = self._snapshot()
+        rows = []
+        for name, labels, count, total, window in series:
+            p50, p90, p99 = np.quantile(window, QUANTILES) if len(window) else (np.nan,) * 3
+            rows.append({
+                "metric": name, "labels": ", ".join(f"{k}={v}" for k, v in labels), "count": count,
+                "mean_ms": total / count if count else np.nan, "p50_ms": p50, "p90_ms": p90, "p99_ms": p99,
+                "max_ms": window.max() if len(window) else np.nan,
+            })
+        columns = ["metric", "labels", "count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"]
+        return pd.DataFrame(rows, columns=columns).sort_values(["metric", "p90_ms"], ascending=[True, False])
+
+    def gauges(self):
+        _, gauges = self._snapshot()
+        return pd.DataFrame([{"gauge": name, "labels": ", ".join(f"{k}={v}" for k, v in labels), "value": value}
+                             for (name, labels), value in gauges], columns=["gauge", "labels", "value"])
+
+    def prometheus_text(self):
+        """The registry in the Prometheus text exposition format."""
+        series, gauges = self._snapshot()
+        lines = []
+        by_name = {}
+        for entry in series:
+            by_name.setdefault(entry[0], []).append(entry)
+        for name, entries in sorted(by_name.items()):
+            metric = f"{PREFIX}{name}_milliseconds"
+            lines.append(f"# TYPE {metric} summary")
+            for _, labels, count, total, window in entries:
+                for q, value in zip(QUANTILES, np.quantile(window, QUANTILES) if len(window) else [np.nan] * 3):
+                    lines.append(f"{metric}{_labels(labels + (('quantile', q),))} {value:.3f}")
+                lines.append(f"{metric}_sum{_labels(labels)} {total:.3f}")
+                lines.append(f"{metric}_count{_labels(labels)} {count}")
+        names = sorted({name for (name, _), _ in gauges})
+        for name in names:
+            lines.append(f"# TYPE {PREFIX}{name} gauge")
+            for (gauge, labels), value in gauges:
+                if gauge == name:
+                    lines.append(f"{PREFIX}{name}{_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write prometheus_text() to path (atomically replaced), e.g. for node_exporter's textfile collector."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+registry = Registry()
+
+
+class timed(ContextDecorator):
+    """Record the duration of a block or function call as metric name (in ms)."""
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = tuple(labels.items())
+
+    def _recreate_cm(self):
+        # a fresh timer per decorated call, so concurrent calls don't share _start
+        return type(self)(self.name, **dict(self.labels))
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registry.observe(self.name, (time.perf_counter() - self._start) * 1000.0, self.labels)
+        return False
+
+
+def set_gauge(name, value, **labels):
+    registry.set_gauge(name, value, tuple(labels.items()))
@@ -0,0 +1,243 @@
+# receipts.py
+"""Payment receipts: collision-free numbering, PDF rendering and a reprint archive.
+
+Receipt numbers come from a counter row in SQLite that is bumped inside an
+immediate transaction, so concurrent cashiers (threads or processes) always
+get distinct, increasing numbers: RCPT-<year>-<6-digit sequence>.
+
+Rendered PDFs are stored once per content hash under
+``<data file stem>.receipts/`` and indexed by receipt number and register
+number, so a reprint is a lookup plus a file read.
+
+A receipt is reserved as a draft before its payment is posted and the
+draft is dropped when the receipt is issued, so a payment whose receipt
+was never issued (render failure, crash) can be found and issued later.
+Issuing is idempotent per receipt number.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from io import BytesIO
+
+import pandas as pd
+from reportlab.lib.pagesizes import A5, landscape
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from config import settings
+from metrics import timed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipt_sequence (
+    year INTEGER PRIMARY KEY,
+    last INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS receipts (
+    receipt_no TEXT PRIMARY KEY,
+    register_number TEXT NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    amount REAL NOT NULL DEFAULT 0,
+    fee_type TEXT NOT NULL DEFAULT '',
+    academic_year TEXT NOT NULL DEFAULT '',
+    issued_at TEXT NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_receipts_student ON receipts (register_number, issued_at);
+CREATE TABLE IF NOT EXISTS receipt_drafts (
+    receipt_no TEXT PRIMARY KEY,
+    reserved_at TEXT NOT NULL,
+    receipt TEXT NOT NULL
+);
+"""
+
+
+@lru_cache(maxsize=8)
+def _logo(path):
+    try:
+        return ImageReader(path)
+    except Exception:
+        return None
+
+
+@timed("pdf_render", kind="receipt")
+def render_receipt_pdf(receipt, logo_path=None):
+    """Receipt PDF bytes for a receipt dict (see ReceiptBook.issue for the keys)."""
+    buffer = BytesIO()
+    width, height = landscape(A5)
+    pdf = canvas.Canvas(buffer, pagesize=(width, height))
+    pdf.setTitle(f"Receipt {receipt['receipt_no']}")
+    top = height - 15 * mm
+    logo = _logo(logo_path) if logo_path else None
+    if logo is not None:
+        pdf.drawImage(logo, 12 * mm, top - 14 * mm, width=18 * mm, height=18 * mm,
+                      preserveAspectRatio=True, mask="auto")
+    pdf.setFont("Helvetica-Bold", 15)
+    pdf.drawCentredString(width / 2, top - 4 * mm, settings().institution)
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawCentredString(width / 2, top - 11 * mm, "Fee Payment Receipt")
+
+    def rows(x, y, items):
+        for label, value in items:
+            pdf.setFont("Helvetica-Bold", 9.5)
+            pdf.drawString(x, y, f"{label}:")
+            pdf.setFont("Helvetica", 9.5)
+            pdf.drawString(x + 38 * mm, y, str(value))
+            y -= 6 * mm
+        return y
+
+    y = top - 24 * mm
+    rows(12 * mm, y, [("Student Name", receipt["name"]), ("Reg. No", receipt["register_number"]),
+                      ("Department", receipt["department"])])
+    rows(width / 2 + 5 * mm, y, [("Date", receipt["date"]), ("Academic Year", receipt["academic_year"]),
+                                 ("Receipt No", receipt["receipt_no"])])
+    y -= 22 * mm
+    pdf.line(12 * mm, y, width - 12 * mm, y)
+    y -= 8 * mm
+    y = rows(12 * mm, y, [
+        ("Fee Type", receipt["fee_type"]),
+        ("Amount Paid", f"Rs. {receipt['amount']:,.2f}"),
+        (f"Total Fees ({receipt['academic_year']})", f"Rs. {receipt['total']:,.2f}"),
+        ("Previously Paid", f"Rs. {receipt['previous_paid']:,.2f}"),
+        ("Paid (Now Total)", f"Rs. {receipt['paid']:,.2f}"),
+        ("Remaining Fees", f"Rs. {receipt['remaining']:,.2f}"),
+    ])
+    pdf.setFont("Helvetica-Oblique", 8)
+    pdf.drawCentredString(width / 2, 10 * mm,
+                          "This is a computer generated receipt and does not require a physical signature.")
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+class ReceiptBook:
+    """Receipt counter and archive index in an SQLite file plus a content-addressed PDF directory."""
+
+    def __init__(self, db_path, archive_dir, logo_path=None, timeout=30.0):
+        self.db_path = db_path
+        self.archive_dir = archive_dir
+        self.logo_path = logo_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------------------- NUMBERING ----------------------
+    def next_number(self, now=None):
+        """Hand out the next receipt number; never repeats, even across processes."""
+        year = (now or pd.Timestamp.now()).year
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO receipt_sequence (year, last) VALUES (?, 0)", (year,))
+            conn.execute("UPDATE receipt_sequence SET last = last + 1 WHERE year = ?", (year,))
+            seq = conn.execute("SELECT last FROM receipt_sequence WHERE year = ?", (year,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return f"RCPT-{year}-{seq:06d}"
+
+    # ---------------------- ARCHIVE ----------------------
+    def _path_for(self, digest):
+        return os.path.join(self.archive_dir, digest[:2], digest + ".pdf")
+
+    def reserve(self, receipt):
+        """Keep receipt as a draft until it is issued (call before posting its payment)."""
+        self._conn().execute(
+            "INSERT OR REPLACE INTO receipt_drafts (receipt_no, reserved_at, receipt) VALUES (?, ?, ?)",
+            (receipt["receipt_no"], pd.Timestamp.now().isoformat(), json.dumps(receipt, default=str)),
+        )
+
+    def drafts(self, reserved_before=None):
+        """Reserved receipts that were not issued, oldest first (optionally only those reserved before a time)."""
+        rows = self._conn().execute(
+            "SELECT receipt FROM receipt_drafts WHERE reserved_at < ? ORDER BY reserved_at",
+            ((reserved_before or pd.Timestamp.max).isoformat(),),
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def discard(self, receipt_no):
+        """Drop the draft of a receipt whose payment was never posted."""
+        self._conn().execute("DELETE FROM receipt_drafts WHERE receipt_no = ?", (receipt_no,))
+
+    def issue(self, receipt):
+        """Render and archive a receipt; returns the PDF bytes.
+
+        receipt holds receipt_no, date, name, register_number, department,
+        academic_year, fee_type, amount, total, previous_paid, paid and
+        remaining. A receipt_no that is already archived is not rendered
+        again: its archived PDF is returned, so a failed issue can simply be
+        retried.
+        """
+        archived = self.reprint(receipt["receipt_no"])
+        if archived is not None:
+            return archived
+        pdf = render_receipt_pdf(receipt, self.logo_path)
+        digest = hashlib.sha256(pdf).hexdigest()
+        path = self._path_for(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(pdf)
+            os.replace(tmp_path, path)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO receipts (receipt_no, register_number, name, amount, fee_type, "
+                "academic_year, issued_at, digest) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (receipt["receipt_no"], str(receipt["register_number"]), str(receipt["name"]),
+                 float(receipt["amount"]), receipt["fee_type"], receipt["academic_year"],
+                 pd.Timestamp.now().isoformat(), digest),
+            )
+            conn.execute("DELETE FROM receipt_drafts WHERE receipt_no = ?", (receipt["receipt_no"],))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return pdf
+
+    def reprint(self, receipt_no):
+        """Archived PDF bytes for receipt_no, or None if it was never issued."""
+        row = self._conn().execute("SELECT digest FROM receipts WHERE receipt_no = ?", (receipt_no,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._path_for(row[0]), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def for_student(self, register_number):
+        """Receipts issued to a student, newest first."""
+        return pd.read_sql_query(
+            "SELECT receipt_no, issued_at, academic_year, fee_type, amount FROM receipts "
+            "WHERE register_number = ? ORDER BY issued_at DESC",
+            self._conn(), params=[str(register_number)],
+        )
+
+
+_books = {}
+_books_lock = threading.Lock()
+
+
+def receipt_book(store, logo_path=None):
+    """Process-wide ReceiptBook kept next to the store's ledger."""
+    with _books_lock:
+        book = _books.get(store.data_file)
+        if book is None:
+            archive_dir = os.path.splitext(store.data_file)[0] + ".receipts"
+            book = _books[store.data_file] = ReceiptBook(store.ledger_path(), archive_dir, logo_path)
+        return book
@@ -0,0 +1,343 @@
+# reconcile.py
+"""Reconcile a bank / UPI statement export against the students' dues.
+
+The statement CSV is read in chunks, so memory stays bounded however long
+it is. Each credit is matched in vectorized steps: the payment reference
+printed on the student's UPI link (see upi_qr.payment_reference) is pulled
+out of the reference/narration text and looked up in a hash map of
+reference -> (row, year, amount due). Matched payments are posted with one
+store write per chunk; everything else goes to a review queue kept in the
+ledger database, with a suggested student when exactly one student owes
+that amount. Every transaction is posted under receipt number
+``UPI-<transaction id>``, so running the same statement twice posts nothing
+new.
+
+Command line:
+
+    python reconcile.py statement.csv abi.xlsx [--dry-run]
+"""
+import argparse
+import hashlib
+import sqlite3
+import sys
+import threading
+
+import pandas as pd
+
+from audit import audit_context
+from datastore import YEARS
+from storage import open_store
+from upi_qr import payment_reference
+
+DEFAULT_CHUNKSIZE = 50_000
+FEE_TYPE = "UPI Payment"
+RECEIPT_PREFIX = "UPI-"
+REFERENCE_PATTERN = r"(FMS[0-9A-Z]+Y[1-4])"
+
+# statement header names understood for each field (compared case-insensitively)
+COLUMN_CANDIDATES = {
+    "txn_id": ["utr", "utr no", "rrn", "upi ref no", "transaction id", "txn id", "reference no"],
+    "date": ["date", "txn date", "transaction date", "value date"],
+    "amount": ["amount", "credit", "credit amount", "cr amount", "deposit", "deposit amount"],
+    "reference": ["reference", "remarks", "note", "transaction note", "tr"],
+    "narration": ["narration", "description", "particulars", "details"],
+    "direction": ["type", "cr/dr", "dr/cr", "direction"],
+}
+
+# review reasons
+NO_REFERENCE = "no payment reference"
+UNKNOWN_REFERENCE = "unknown payment reference"
+EXCEEDS_DUES = "amount exceeds dues"
+BAD_LINE = "unreadable date or amount"
+
+REVIEW_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reconciliation_review (
+    txn_id TEXT PRIMARY KEY,
+    txn_date TEXT NOT NULL DEFAULT '',
+    amount REAL NOT NULL DEFAULT 0,
+    reference TEXT NOT NULL DEFAULT '',
+    narration TEXT NOT NULL DEFAULT '',
+    reason TEXT NOT NULL,
+    suggested_row INTEGER,
+    suggested_year TEXT,
+    status TEXT NOT NULL DEFAULT 'open',
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_review_status ON reconciliation_review (status);
+CREATE TABLE IF NOT EXISTS reconciliation_claims (
+    txn_id TEXT PRIMARY KEY,
+    claimed_at TEXT NOT NULL
+);
+"""
+REVIEW_COLUMNS = ["txn_id", "txn_date", "amount", "reference", "narration", "reason",
+                  "suggested_row", "suggested_year"]
+OPEN, POSTED, DISMISSED = "open", "posted", "dismissed"
+# seconds after which a claim on a review line (see ReviewQueue.claim) no longer blocks others
+CLAIM_TIMEOUT = 300
+
+
+def statement_columns(header):
+    """Map field -> statement column for the header of a statement (missing fields are left out)."""
+    lowered = {str(c).strip().lower(): c for c in header}
+    found = {}
+    for field, names in COLUMN_CANDIDATES.items():
+        for name in names:
+            if name in lowered:
+                found[field] = lowered[name]
+                break
+    missing = {"date", "amount"} - set(found)
+    if missing:
+        raise ValueError(f"statement has no {' / '.join(sorted(missing))} column")
+    return found
+
+
+def normalize_chunk(chunk, columns):
+    """Statement lines as txn_id, txn_date, amount, reference, narration, payment_ref (credits only)."""
+    def text(field):
+        if field not in columns:
+            return pd.Series("", index=chunk.index)
+        return chunk[columns[field]].fillna("").astype(str).str.strip()
+
+    raw_amount = text("amount").str.replace(",", "", regex=False).str.replace("₹", "", regex=False)
+    lines = pd.DataFrame({
+        "txn_date": pd.to_datetime(text("date"), errors="coerce", dayfirst=True),
+        "amount": pd.to_numeric(raw_amount, errors="coerce"),
+        "reference": text("reference"),
+        "narration": text("narration"),
+    })
+    if "direction" in columns:
+        lines = lines[~text("direction").str.upper().str.startswith("D")]
+    lines = lines[~(lines["amount"] <= 0)]
+    txn_id = text("txn_id").reindex(lines.index)
+    # lines without a bank id get a stable one from their content
+    # (astype(str) leaves NaT/NaN missing on pandas 3, which would blank the whole string)
+    content = (lines["txn_date"].astype(str).fillna("") + "|" + lines["amount"].astype(str).fillna("") + "|"
+               + lines["reference"] + "|" + lines["narration"])
+    hashed = content.map(lambda v: "H" + hashlib.sha1(v.encode("utf-8")).hexdigest()[:16])
+    lines.insert(0, "txn_id", txn_id.where(txn_id != "", hashed))
+    lines["payment_ref"] = ((lines["reference"] + " " + lines["narration"]).str.upper()
+                            .str.extract(REFERENCE_PATTERN, expand=False).fillna(""))
+    return lines.drop_duplicates("txn_id")
+
+
+class DuesLookup:
+    """Hash maps from payment reference and from amount to the (row, year) that owes it."""
+
+    def __init__(self, df):
+        self.by_reference = {}
+        self.by_amount = {}
+        for year in YEARS:
+            year = f"{year} year"
+            due = df[f"Remaining Fees {year}"].astype(float)
+            for row, reg, amount in zip(df.index, df["Register Number"].fillna(""), due):
+                if not str(reg):
+                    continue
+                self.by_reference[payment_reference(reg, year)] = [row, year, float(amount)]
+                if amount > 0:
+                    self.by_amount.setdefault(round(float(amount), 2), []).append((row, year))
+
+    def suggest(self, amount):
+        """(row, year) of the only student-year owing exactly amount, else (None, None)."""
+        hits = self.by_amount.get(round(float(amount), 2), [])
+        return hits[0] if len(hits) == 1 else (None, None)
+
+
+def match_chunk(lines, lookup):
+    """Split normalized lines into (payments to post, review items).
+
+    Payments for the same reference are applied in statement order against
+    its remaining dues; the lookup's dues are reduced by what was matched.
+    """
+    target = lines["payment_ref"].map(lookup.by_reference)
+    known = target.notna()
+    lines = lines.assign(row=target.map(lambda t: t[0] if isinstance(t, list) else None),
+                         year=target.map(lambda t: t[1] if isinstance(t, list) else None),
+                         due=target.map(lambda t: t[2] if isinstance(t, list) else 0.0))
+    valid = lines["txn_date"].notna() & lines["amount"].notna()
+    running = lines["amount"].where(known & valid, 0.0).groupby(lines["payment_ref"]).cumsum()
+    fits = known & valid & (running <= lines["due"] + 0.005)
+
+    matched = lines[fits]
+    for ref, amount in matched.groupby("payment_ref")["amount"].sum().items():
+        lookup.by_reference[ref][2] -= float(amount)
+    payments = pd.DataFrame({
+        "row": matched["row"].astype(int), "year": matched["year"], "amount": matched["amount"].astype(float),
+        "fee_type": FEE_TYPE, "receipt_no": RECEIPT_PREFIX + matched["txn_id"],
+        "ts": matched["txn_date"].map(lambda d: d.isoformat()),
+    })
+
+    review = lines[~fits].copy()
+    review["reason"] = EXCEEDS_DUES
+    review.loc[~review["payment_ref"].isin(lookup.by_reference.keys()), "reason"] = UNKNOWN_REFERENCE
+    review.loc[review["payment_ref"] == "", "reason"] = NO_REFERENCE
+    review.loc[review["txn_date"].isna() | review["amount"].isna(), "reason"] = BAD_LINE
+    suggestions = [lookup.suggest(a) if reason == NO_REFERENCE else (None, None)
+                   for a, reason in zip(review["amount"], review["reason"])]
+    review["suggested_row"] = [s[0] for s in suggestions]
+    review["suggested_year"] = [s[1] for s in suggestions]
+    review["txn_date"] = review["txn_date"].map(lambda d: "" if pd.isna(d) else d.date().isoformat())
+    review["amount"] = review["amount"].fillna(0.0)
+    return payments, review[REVIEW_COLUMNS]
+
+
+class ReviewQueue:
+    """Statement lines waiting for a person, kept in the store's ledger database."""
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._conn().executescript(REVIEW_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, items):
+        """Queue review items (REVIEW_COLUMNS); lines already queued are left as they are."""
+        if items.empty:
+            return 0
+        now = pd.Timestamp.now().isoformat()
+        rows = [
+            tuple(None if pd.isna(v) else v for v in values) + (now,)
+            for values in items[REVIEW_COLUMNS].astype(object).itertuples(index=False, name=None)
+        ]
+        conn = self._conn()
+        before = conn.total_changes
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            f"INSERT OR IGNORE INTO reconciliation_review ({', '.join(REVIEW_COLUMNS)}, created_at) "
+            f"VALUES ({', '.join('?' for _ in REVIEW_COLUMNS)}, ?)", rows)
+        conn.execute("COMMIT")
+        return conn.total_changes - before
+
+    def items(self, status=OPEN):
+        return pd.read_sql_query(
+            f"SELECT {', '.join(REVIEW_COLUMNS)} FROM reconciliation_review WHERE status = ? "
+            "ORDER BY txn_date, txn_id", self._conn(), params=[status])
+
+    def claim(self, txn_id, timeout=CLAIM_TIMEOUT):
+        """Reserve an open line for posting; False if it is closed or someone else is posting it.
+
+        A claim older than timeout seconds was left by a poster that stopped
+        midway and can be taken over.
+        """
+        now = pd.Timestamp.now()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            status = conn.execute("SELECT status FROM reconciliation_review WHERE txn_id = ?", (txn_id,)).fetchone()
+            claimed = conn.execute("SELECT claimed_at FROM reconciliation_claims WHERE txn_id = ?",
+                                   (txn_id,)).fetchone()
+            free = status is not None and status[0] == OPEN and (
+                claimed is None or claimed[0] < (now - pd.Timedelta(seconds=timeout)).isoformat())
+            if free:
+                conn.execute("INSERT OR REPLACE INTO reconciliation_claims (txn_id, claimed_at) VALUES (?, ?)",
+                             (txn_id, now.isoformat()))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return free
+
+    def release(self, txn_id):
+        """Give up a claim and leave the line open."""
+        self._conn().execute("DELETE FROM reconciliation_claims WHERE txn_id = ?", (txn_id,))
+
+    def resolve(self, txn_id, status):
+        """Mark a queued line POSTED or DISMISSED and drop any claim on it."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("UPDATE reconciliation_review SET status = ? WHERE txn_id = ?", (status, txn_id))
+        conn.execute("DELETE FROM reconciliation_claims WHERE txn_id = ?", (txn_id,))
+        conn.execute("COMMIT")
+
+
+def review_queue(store):
+    return ReviewQueue(store.ledger_path())
+
+
+def post_review_item(store, item, row, year):
+    """Post a queued line to a student chosen by staff and close it.
+
+    Returns False and posts nothing if the line is no longer open or another
+    user is posting it. A line whose receipt number is already in the ledger
+    (an earlier attempt got that far) is closed without being posted again.
+    """
+    queue = review_queue(store)
+    txn_id = item["txn_id"]
+    receipt_no = RECEIPT_PREFIX + txn_id
+    if not queue.claim(txn_id):
+        return False
+    try:
+        if not store.ledger.posted_receipts([receipt_no]):
+            with audit_context(action="UPI review", receipt_no=receipt_no):
+                store.post_payments(pd.DataFrame([{
+                    "row": int(row), "year": year, "amount": float(item["amount"]), "fee_type": FEE_TYPE,
+                    "receipt_no": receipt_no, "ts": item["txn_date"] or None,
+                }]))
+    except Exception:
+        queue.release(txn_id)
+        raise
+    queue.resolve(txn_id, POSTED)
+    return True
+
+
+def reconcile(store, source, chunksize=DEFAULT_CHUNKSIZE, dry_run=False):
+    """Match the statement CSV at source (path or file object) against store and post the matches.
+
+    Returns counts: lines, credits, already_posted, matched, matched_amount
+    and review (new review items).
+    """
+    ledger = store.ledger
+    queue = review_queue(store)
+    lookup = DuesLookup(store.load())
+    summary = {"lines": 0, "credits": 0, "already_posted": 0, "matched": 0, "matched_amount": 0.0, "review": 0}
+    columns = None
+    for chunk in pd.read_csv(source, dtype=str, chunksize=chunksize, skipinitialspace=True):
+        summary["lines"] += len(chunk)
+        columns = columns or statement_columns(chunk.columns)
+        lines = normalize_chunk(chunk, columns)
+        summary["credits"] += len(lines)
+        posted = ledger.posted_receipts(RECEIPT_PREFIX + lines["txn_id"])
+        fresh = ~(RECEIPT_PREFIX + lines["txn_id"]).isin(posted)
+        summary["already_posted"] += int((~fresh).sum())
+        payments, review = match_chunk(lines[fresh], lookup)
+        summary["matched"] += len(payments)
+        summary["matched_amount"] += float(payments["amount"].sum())
+        if dry_run:
+            summary["review"] += len(review)
+            continue
+        if not payments.empty:
+            # per-payment receipt numbers (UPI-<txn id>) are in the ledger
+            with audit_context(action="UPI reconciliation"):
+                store.post_payments(payments)
+        summary["review"] += queue.add(review)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Post UPI payments from a bank statement CSV.")
+    parser.add_argument("statement", help="statement export (CSV) with date, amount and reference/narration")
+    parser.add_argument("data_file", help="data file of the app, e.g. abi.xlsx or abi.db")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="statement lines per chunk")
+    parser.add_argument("--dry-run", action="store_true", help="only match and report, post nothing")
+    args = parser.parse_args(argv)
+    try:
+        summary = reconcile(open_store(args.data_file), args.statement, args.chunksize, args.dry_run)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    action = "Would post" if args.dry_run else "Posted"
+    print(f"{summary['lines']} lines, {summary['credits']} credits, {summary['already_posted']} already posted")
+    print(f"{action} {summary['matched']} payments (INR {summary['matched_amount']:,.2f}); "
+          f"{summary['review']} lines for review")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
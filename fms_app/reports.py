@@ -0,0 +1,406 @@
+# reports.py
+"""Batch reports: per-student fee statements and dues letters.
+
+``generate_report`` walks the students matching a filter one page of the
+store at a time and never holds more than a few pages in memory:
+
+* PDF: each page of students is rendered by a worker process (reportlab),
+  and the finished PDFs are streamed into one zip file in order.
+* Excel: the rows are appended to a write-only workbook with three sheets:
+  Summary (one row per student), Breakdown (one row per student, year and
+  fee component, as on the Search Student page) and Dues (outstanding per
+  student and year, with the UPI payment reference).
+
+A fee statement shows the breakdown the Search Student page shows; a dues
+letter asks a student with outstanding fees to pay by a due date. Dues
+letters only go to students with dues.
+
+Command line (also the entry point for cron / Windows Task Scheduler;
+the output path may contain strftime codes):
+
+    python reports.py abi.xlsx --kind statement --batch 2023 --output "statements-2023-%Y%m%d.zip"
+    python reports.py abi.xlsx --kind dues-letter --due-date 2025-07-31 --output dues.zip --workers 8
+    python reports.py abi.xlsx --format xlsx --department CSE --output cse-fees.xlsx
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+import pandas as pd
+from openpyxl import Workbook
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from batch_posting import ALL
+from config import settings
+from datastore import FEE_COMPONENTS, YEARS
+from metrics import timed
+from storage import EQUALS, EQUALS_IGNORE_CASE, GREATER_THAN, open_store
+from upi_qr import payment_reference
+
+STATEMENT = "statement"
+DUES_LETTER = "dues-letter"
+KINDS = [STATEMENT, DUES_LETTER]
+PDF = "pdf"
+XLSX = "xlsx"
+FORMATS = [PDF, XLSX]
+
+CHUNK_SIZE = 200            # students fetched from the store and sent to a worker at a time
+DUE_DAYS = 15               # default time to pay after a dues letter
+YEAR_LABELS = [f"{year} year" for year in YEARS]
+STUDENT_COLUMNS = ["Register Number", "Name", "Batch", "Department", "Mobile Number"]
+
+SUMMARY_HEADER = STUDENT_COLUMNS + [f"{kind} {label}" for label in YEAR_LABELS
+                                    for kind in ("Total Fees", "Paid Fees", "Remaining Fees")] + ["Outstanding"]
+BREAKDOWN_HEADER = ["Register Number", "Name", "Year", "Fee Type", "Amount"]
+DUES_HEADER = ["Register Number", "Name", "Batch", "Department", "Year", "Outstanding", "UPI Reference"]
+
+
+# ---------------------- SELECTION ----------------------
+def report_filters(batch=ALL, department=ALL, year=None):
+    """Store filters for the students of a batch/department (with dues for year, if given)."""
+    filters = []
+    if batch not in (None, ALL):
+        filters.append(("Batch", EQUALS, str(batch)))
+    if department not in (None, ALL):
+        filters.append(("Department", EQUALS_IGNORE_CASE, str(department)))
+    if year:
+        filters.append((f"Remaining Fees {year}", GREATER_THAN, 0))
+    return filters
+
+
+def iter_students(store, filters, dues_only=False, chunk_size=CHUNK_SIZE):
+    """The matching students, one DataFrame of at most chunk_size rows at a time."""
+    total = store.count(filters)
+    for offset in range(0, total, chunk_size):
+        chunk = store.page(filters, offset=offset, limit=chunk_size)
+        if dues_only:
+            chunk = chunk[outstanding(chunk) > 0]
+        if not chunk.empty:
+            yield chunk
+
+
+def outstanding(students):
+    """Remaining fees over all years, per student."""
+    return students[[f"Remaining Fees {label}" for label in YEAR_LABELS]].astype(float).clip(lower=0).sum(axis=1)
+
+
+def _text(value):
+    return "" if pd.isna(value) else str(value)
+
+
+def _money(value):
+    return f"Rs. {float(value or 0):,.2f}"
+
+
+# ---------------------- PDF ----------------------
+@lru_cache(maxsize=8)
+def _logo_bytes(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except Exception:
+        return None
+
+
+def _header(story, styles, title, logo_path, issue_date):
+    logo = _logo_bytes(logo_path) if logo_path else None
+    heading = [Paragraph(f"<b>{escape(settings().institution)}</b>", styles["Title"]),
+               Paragraph(title, styles["Heading2"])]
+    if logo is not None:
+        story.append(Table([[Image(BytesIO(logo), 20 * mm, 20 * mm), heading]], colWidths=[25 * mm, None]))
+    else:
+        story.extend(heading)
+    story.append(Paragraph(f"Date: {issue_date}", styles["Normal"]))
+    story.append(Spacer(1, 4 * mm))
+
+
+def _grid(rows, col_widths=None, bold_rows=()):
+    table = Table(rows, colWidths=col_widths, repeatRows=1)
+    style = [
+        ("GRID", (0, 0), (-1, -1), 0.4, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e8f5e9")),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), 8.5),
+        ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
+    ]
+    style += [("FONTNAME", (0, r), (-1, r), "Helvetica-Bold") for r in bold_rows]
+    table.setStyle(TableStyle(style))
+    return table
+
+
+def _student_block(student):
+    rows = [("Student Name", student.get("Name")), ("Reg. No", student.get("Register Number")),
+            ("Batch", student.get("Batch")), ("Department", student.get("Department"))]
+    table = Table([[f"{label}:", _text(value)] for label, value in rows], colWidths=[35 * mm, None])
+    table.setStyle(TableStyle([("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"), ("FONTSIZE", (0, 0), (-1, -1), 9.5)]))
+    return table
+
+
+def _status(total, paid, remaining):
+    if total <= 0:
+        return "No Fees"
+    return "Paid" if remaining <= 0 else "Partial" if paid > 0 else "Pending"
+
+
+def render_statement_pdf(student, logo_path=None, issue_date=""):
+    """Fee statement PDF for one student (dict/row): components per year, totals and status."""
+    styles = getSampleStyleSheet()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=15 * mm, rightMargin=15 * mm,
+                            topMargin=12 * mm, bottomMargin=12 * mm, title=f"Fee statement {student.get('Register Number')}")
+    story = []
+    _header(story, styles, "Fee Statement", logo_path, issue_date)
+    story.append(_student_block(student))
+    story.append(Spacer(1, 5 * mm))
+
+    def amount(column):
+        return float(student.get(column) or 0)
+
+    rows = [["Fee Type"] + [f"{year.upper()} YEAR" for year in YEARS]]
+    for fee_type in FEE_COMPONENTS:
+        values = [amount(f"{fee_type} {label}") for label in YEAR_LABELS]
+        if any(values):
+            rows.append([fee_type] + [f"{v:,.2f}" for v in values])
+    totals = [(amount(f"Total Fees {label}"), amount(f"Paid Fees {label}"), amount(f"Remaining Fees {label}"))
+              for label in YEAR_LABELS]
+    first_total = len(rows)
+    rows.append(["Total Fees"] + [f"{t:,.2f}" for t, _, _ in totals])
+    rows.append(["Paid"] + [f"{p:,.2f}" for _, p, _ in totals])
+    rows.append(["Balance"] + [f"{r:,.2f}" for _, _, r in totals])
+    rows.append(["Status"] + [_status(*values) for values in totals])
+    story.append(_grid(rows, [45 * mm] + [33 * mm] * len(YEARS), bold_rows=range(first_total, len(rows))))
+    story.append(Spacer(1, 5 * mm))
+    story.append(Paragraph(f"<b>Total outstanding: {_money(sum(r for _, _, r in totals if r > 0))}</b>",
+                           styles["Normal"]))
+    story.append(Spacer(1, 8 * mm))
+    story.append(Paragraph("<i>This is a computer generated statement and does not require a signature.</i>",
+                           styles["Normal"]))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def render_dues_letter_pdf(student, logo_path=None, issue_date="", due_date=""):
+    """Dues letter PDF for one student (dict/row): outstanding per year and how to pay."""
+    styles = getSampleStyleSheet()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=20 * mm, rightMargin=20 * mm,
+                            topMargin=12 * mm, bottomMargin=12 * mm, title=f"Dues letter {student.get('Register Number')}")
+    story = []
+    _header(story, styles, "Fee Dues Intimation", logo_path, issue_date)
+    story.append(_student_block(student))
+    story.append(Spacer(1, 6 * mm))
+    reg = _text(student.get("Register Number"))
+    rows = [["Academic Year", "Total Fees", "Paid", "Outstanding", "UPI Reference"]]
+    due_total = 0.0
+    for label in YEAR_LABELS:
+        remaining = float(student.get(f"Remaining Fees {label}") or 0)
+        if remaining > 0:
+            due_total += remaining
+            rows.append([label.title(), f"{float(student.get(f'Total Fees {label}') or 0):,.2f}",
+                         f"{float(student.get(f'Paid Fees {label}') or 0):,.2f}", f"{remaining:,.2f}",
+                         payment_reference(reg, label)])
+    rows.append(["Total", "", "", f"{due_total:,.2f}", ""])
+    story.append(Paragraph(f"Dear {_text(student.get('Name'))},", styles["Normal"]))
+    story.append(Spacer(1, 3 * mm))
+    story.append(Paragraph(
+        f"Our records show the following fees outstanding against your account. Please pay "
+        f"{_money(due_total)} on or before <b>{due_date}</b> at the college office or by UPI, quoting the "
+        f"reference of each year so the payment is credited automatically.", styles["Normal"]))
+    story.append(Spacer(1, 5 * mm))
+    story.append(_grid(rows, bold_rows=[len(rows) - 1]))
+    story.append(Spacer(1, 6 * mm))
+    story.append(Paragraph("Please ignore this letter if you have paid in the last few days.", styles["Normal"]))
+    story.append(Spacer(1, 15 * mm))
+    story.append(Paragraph("<b>Principal</b>", styles["Normal"]))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _file_name(kind, student):
+    reg = re.sub(r"[^A-Za-z0-9_-]+", "_", _text(student.get("Register Number"))) or "unknown"
+    return f"{kind}-{reg}.pdf"
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def render_chunk(records, kind, logo_path=None, issue_date="", due_date=""):
+    """(file name, PDF bytes) for each student record (runs inside the worker processes)."""
+    out = []
+    for student in records:
+        if kind == DUES_LETTER:
+            pdf = render_dues_letter_pdf(student, logo_path, issue_date, due_date)
+        else:
+            pdf = render_statement_pdf(student, logo_path, issue_date)
+        out.append((_file_name(kind, student), pdf))
+    return out
+
+
+def write_pdf_zip(chunks, output, kind, workers=None, logo_path=None, issue_date="", due_date=""):
+    """Render the student chunks across a process pool into one zip at output; returns the number of PDFs."""
+    count = 0
+    workers = workers or os.cpu_count() or 1
+    tmp_path = output + ".tmp"
+    try:
+        # spawned, not forked: reports usually run on the background report thread
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool, \
+                zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            pending = deque()
+
+            def collect():
+                nonlocal count
+                for name, pdf in pending.popleft().result():
+                    archive.writestr(name, pdf)
+                    count += 1
+
+            for chunk in chunks:
+                records = chunk.to_dict("records")
+                pending.append(pool.submit(render_chunk, records, kind, logo_path, issue_date, due_date))
+                if len(pending) >= 2 * workers:  # bound the students in memory
+                    collect()
+            while pending:
+                collect()
+        os.replace(tmp_path, output)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    return count
+
+
+# ---------------------- EXCEL ----------------------
+def _summary_rows(chunk):
+    table = chunk.reindex(columns=SUMMARY_HEADER[:-1]).assign(Outstanding=outstanding(chunk))
+    return table.astype(object).where(table.notna(), None).itertuples(index=False, name=None)
+
+
+def _breakdown_rows(chunk):
+    for student in chunk.to_dict("records"):
+        for label in YEAR_LABELS:
+            for fee_type in FEE_COMPONENTS:
+                value = float(student.get(f"{fee_type} {label}") or 0)
+                if value:
+                    yield student.get("Register Number"), student.get("Name"), label, fee_type, value
+
+
+def _dues_rows(chunk):
+    for student in chunk.to_dict("records"):
+        reg = _text(student.get("Register Number"))
+        for label in YEAR_LABELS:
+            remaining = float(student.get(f"Remaining Fees {label}") or 0)
+            if remaining > 0:
+                yield (reg, student.get("Name"), student.get("Batch"), student.get("Department"), label, remaining,
+                       payment_reference(reg, label))
+
+
+def write_workbook(chunks, output):
+    """Stream the student chunks into a Summary/Breakdown/Dues workbook; returns the number of students."""
+    book = Workbook(write_only=True)
+    sheets = [(book.create_sheet(name), header, rows) for name, header, rows in [
+        ("Summary", SUMMARY_HEADER, _summary_rows),
+        ("Breakdown", BREAKDOWN_HEADER, _breakdown_rows),
+        ("Dues", DUES_HEADER, _dues_rows),
+    ]]
+    for sheet, header, _ in sheets:
+        sheet.append(header)
+    count = 0
+    for chunk in chunks:
+        for sheet, _, rows in sheets:
+            for row in rows(chunk):
+                sheet.append(list(row))
+        count += len(chunk)
+    tmp_path = output + ".tmp"
+    try:
+        book.save(tmp_path)
+        os.replace(tmp_path, output)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    return count
+
+
+# ---------------------- PIPELINE ----------------------
+def generate_report(store, output, kind=STATEMENT, fmt=PDF, batch=ALL, department=ALL, year=None,
+                    dues_only=False, workers=None, logo_path=None, issue_date=None, due_date=None):
+    """Write the report for the matching students to output; returns {"students", "output"}.
+
+    Dues letters (and dues_only) skip students without outstanding fees.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    issue = pd.Timestamp(issue_date) if issue_date else pd.Timestamp.now().normalize()
+    due = pd.Timestamp(due_date) if due_date else issue + pd.Timedelta(days=DUE_DAYS)
+    chunks = iter_students(store, report_filters(batch, department, year), dues_only or kind == DUES_LETTER)
+    with timed("report", kind=kind, format=fmt):
+        if fmt == XLSX:
+            count = write_workbook(chunks, output)
+        else:
+            count = write_pdf_zip(chunks, output, kind, workers, logo_path, issue.strftime("%d-%m-%Y"),
+                                  due.strftime("%d-%m-%Y"))
+    return {"students": count, "output": output}
+
+
+_report_threads = None
+_report_threads_lock = threading.Lock()
+
+
+def _report_executor():
+    global _report_threads
+    with _report_threads_lock:
+        if _report_threads is None:
+            _report_threads = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reports")
+        return _report_threads
+
+
+def submit_report(store, output, **options):
+    """generate_report in the background (one report at a time); returns a Future of its result."""
+    return _report_executor().submit(generate_report, store, output, **options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write fee statements or dues letters for a batch/department.")
+    parser.add_argument("data_file", nargs="?", help="data file of the app, e.g. abi.xlsx or abi.db "
+                                                     "(default: the configured one, see config.py)")
+    parser.add_argument("--kind", choices=KINDS, default=STATEMENT)
+    parser.add_argument("--format", choices=FORMATS, default=PDF, help="zip of PDFs, or one workbook")
+    parser.add_argument("--batch", default=ALL)
+    parser.add_argument("--department", default=ALL)
+    parser.add_argument("--year", choices=YEAR_LABELS, help="only students with dues for this year")
+    parser.add_argument("--dues-only", action="store_true", help="only students with outstanding fees")
+    parser.add_argument("--due-date", help=f"pay-by date on dues letters (default: {DUE_DAYS} days from today)")
+    parser.add_argument("--logo", help="logo image for the PDFs (default: the configured one)")
+    parser.add_argument("--workers", type=int, help="rendering processes (default: one per core)")
+    parser.add_argument("--output", required=True, help="output file; strftime codes such as %%Y%%m%%d are expanded")
+    args = parser.parse_args(argv)
+    current = settings()
+    args.data_file = args.data_file or current.data_file
+    args.logo = args.logo or current.logo
+
+    output = pd.Timestamp.now().strftime(args.output)
+    result = generate_report(open_store(args.data_file), output, args.kind, args.format, args.batch,
+                             args.department, args.year, args.dues_only, args.workers, args.logo,
+                             due_date=args.due_date)
+    print(f"Wrote {result['students']} students to {result['output']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# search_index.py
+"""In-memory type-ahead search over Name, Register Number, UMIS and EMIS numbers.
+
+A SearchIndex is built once per data version. It holds a sorted key list
+for prefix lookups (full name, every word of the name and the three
+identifier numbers) and a trigram index over the same text for fuzzy
+matches when the prefix hits run out. Results are bounded and carry the
+row id plus register number, batch and department, so students who share
+a name can be told apart. Writes re-index only the rows they touched.
+"""
+import bisect
+import re
+import threading
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+RESULT_COLUMNS = ["Name", "Register Number", "Batch", "Department"]
+INDEXED_FIELDS = RESULT_COLUMNS + ["UMIS Number", "EMIS Number"]
+DEFAULT_LIMIT = 20
+# share of the query's trigrams a fuzzy hit must contain
+MIN_FUZZY_SCORE = 0.5
+
+# match kinds, best first
+EXACT, PREFIX, WORD_PREFIX, FUZZY = 0, 1, 2, 3
+
+
+def normalize(value):
+    """Lower-cased, single-spaced text; numbers lose a trailing ".0" from Excel."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    text = re.sub(r"\s+", " ", str(value)).strip().lower()
+    return text[:-2] if text.endswith(".0") and text[:-2].isdigit() else text
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Prefix and trigram index over one version of the student data."""
+
+    def __init__(self, df, version):
+        self.version = version
+        self._lock = threading.RLock()
+        self._keys = []                    # sorted (key, kind, row)
+        self._info = {}                    # row -> result fields
+        self._row_keys = {}                # row -> [(key, kind)]
+        self._grams = defaultdict(set)     # trigram -> rows
+        self._row_grams = {}               # row -> trigram set
+        entries = []
+        for row, fields in zip(df.index, df[INDEXED_FIELDS]
+                               .itertuples(index=False, name=None)):
+            entries.extend(self._add_row(row, fields))
+        self._keys = sorted(entries)
+
+    def _index_keys(self, fields):
+        name = normalize(fields[0])
+        keys = [(name, PREFIX)] if name else []
+        keys += [(word, WORD_PREFIX) for word in name.split(" ")[1:] if word]
+        for value in (fields[1], fields[4], fields[5]):  # register, UMIS, EMIS
+            value = normalize(value)
+            if value:
+                keys.append((value, PREFIX))
+        return keys
+
+    def _add_row(self, row, fields):
+        """Register row in every structure except the sorted key list; returns its key entries."""
+        keys = self._index_keys(fields)
+        self._info[row] = {c: ("" if pd.isna(v) else v) for c, v in zip(RESULT_COLUMNS, fields[:4])}
+        self._row_keys[row] = keys
+        grams = set()
+        for key, _ in keys:
+            grams |= trigrams(key)
+        self._row_grams[row] = grams
+        for gram in grams:
+            self._grams[gram].add(row)
+        return [(key, kind, row) for key, kind in keys]
+
+    def _remove_row(self, row):
+        for key, kind in self._row_keys.pop(row, []):
+            i = bisect.bisect_left(self._keys, (key, kind, row))
+            if i < len(self._keys) and self._keys[i] == (key, kind, row):
+                del self._keys[i]
+        for gram in self._row_grams.pop(row, ()):
+            self._grams[gram].discard(row)
+        self._info.pop(row, None)
+
+    def update(self, changed):
+        """Re-index the changed rows whose searchable fields moved (payments are skipped)."""
+        frame = changed[INDEXED_FIELDS]
+        with self._lock:
+            for row, fields in zip(frame.index, frame.itertuples(index=False, name=None)):
+                if self._row_keys.get(row) == self._index_keys(fields):
+                    continue
+                self._remove_row(row)
+                for entry in self._add_row(row, fields):
+                    bisect.insort(self._keys, entry)
+
+    # ---------------------- QUERIES ----------------------
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Best matches for query as a DataFrame (index = row id), at most limit rows."""
+        q = normalize(query)
+        if not q:
+            return self._results({})
+        best = {}  # row -> (kind, score)
+        with self._lock:
+            i = bisect.bisect_left(self._keys, (q,))
+            # walk the prefix range; stop once enough exact/prefix hits are in hand
+            while i < len(self._keys) and self._keys[i][0].startswith(q):
+                key, kind, row = self._keys[i]
+                rank = EXACT if key == q else kind
+                if row not in best or rank < best[row][0]:
+                    best[row] = (rank, 1.0)
+                i += 1
+                if len(best) >= limit * 5:
+                    break
+            # identifiers are matched by prefix only; near-miss numbers are noise
+            if len(best) < limit and len(q) >= 3 and not q.isdigit():
+                self._fuzzy(q, best, limit)
+            return self._results(best, limit)
+
+    def _fuzzy(self, q, best, limit):
+        query_grams = trigrams(q)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self._grams.get(gram, ()))
+        scored = []
+        for row, common in shared.items():
+            if row in best:
+                continue
+            score = common / len(query_grams)
+            if score >= MIN_FUZZY_SCORE:
+                scored.append((score, row))
+        for score, row in sorted(scored, reverse=True)[:limit - len(best)]:
+            best[row] = (FUZZY, score)
+
+    def _results(self, best, limit=DEFAULT_LIMIT):
+        ranked = sorted(best.items(), key=lambda item: (item[1][0], -item[1][1],
+                                                        normalize(self._info[item[0]]["Name"])))[:limit]
+        rows = [row for row, _ in ranked]
+        table = pd.DataFrame([self._info[row] for row in rows], index=rows, columns=RESULT_COLUMNS)
+        table["Match"] = [("exact", "prefix", "word", "fuzzy")[kind] for _, (kind, _) in ranked]
+        return table
+
+
+def label(result):
+    """One-line description of a search hit that tells same-name students apart."""
+    return (f"{result['Name']} — Reg. {result['Register Number'] or '?'}"
+            f" ({result['Department'] or 'no dept'}, batch {result['Batch'] or '?'})")
+
+
+def search_index(store):
+    """The store's SearchIndex for its current data version."""
+    return store.derived("search", SearchIndex)
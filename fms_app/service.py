@@ -0,0 +1,285 @@
+# service.py
+"""Fee system operations without any user interface.
+
+A FeeService wraps the store of one data file and exposes what the pages
+do as plain method calls: find and add students, take a payment and issue
+its receipt, post a batch charge or payment, read the dues aggregates and
+produce certificates. Streamlit pages, the HTTP API (api.py) and scripts
+all call the same methods, so every client validates input and updates the
+data the same way.
+
+Bad input raises ValueError, an unknown student raises NotFoundError, and
+ConflictError (storage.py) passes through.
+"""
+import threading
+
+import pandas as pd
+
+from analytics import analytics
+from audit import audit_context
+from batch_posting import ALL, preview, select_students
+from bulk_import import validate
+from certificates import CC, TC, certificate_numbers, issue_certificate, logo_base64, submit_batch
+from datastore import CHARGE, FEE_COLUMNS, FEE_COMPONENTS, META_COLUMNS, PAYMENT, YEARS
+from dues import dues_ageing, dues_index
+from receipts import receipt_book
+from search_index import search_index
+from storage import EQUALS, EQUALS_IGNORE_CASE, GREATER_THAN, open_store
+
+YEAR_CHOICES = [f"{year} year" for year in YEARS]
+# how the pages and receipts print an academic year
+YEAR_LABELS = dict(zip(YEAR_CHOICES, ["I Year", "II Year", "III Year", "IV Year"]))
+# a payment can also be booked without a fee component
+GENERAL_PAYMENT = "General Payment"
+PAYMENT_TYPES = FEE_COMPONENTS + [GENERAL_PAYMENT]
+# what add_student accepts; anything else would add a column to the data
+STUDENT_COLUMNS = META_COLUMNS + FEE_COLUMNS
+
+
+class NotFoundError(KeyError):
+    """No student (or receipt) with the given key."""
+
+
+def _year(year):
+    if year not in YEAR_CHOICES:
+        raise ValueError(f"unknown academic year {year!r}; expected one of {', '.join(YEAR_CHOICES)}")
+    return year
+
+
+def _amount(amount):
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError(f"amount must be a number, got {amount!r}") from None
+    if not amount > 0:
+        raise ValueError("amount must be greater than zero")
+    return amount
+
+
+def _amounts_after(ledger, receipt):
+    """total / previous_paid / paid / remaining of a student's year right after the receipt's payment."""
+    year = {label: year for year, label in YEAR_LABELS.items()}[receipt["academic_year"]]
+    history = ledger.history(receipt["register_number"], year)
+    upto = history.loc[:history.index[history["receipt_no"] == receipt["receipt_no"]][0]]  # in posting order
+    total = float(upto.loc[upto["kind"] == CHARGE, "amount"].sum())
+    paid = float(upto.loc[upto["kind"] == PAYMENT, "amount"].sum())
+    return {"total": total, "previous_paid": paid - float(receipt["amount"]), "paid": paid,
+            "remaining": max(total - paid, 0.0)}
+
+
+class FeeService:
+    def __init__(self, data_file, logo_path=None):
+        self.data_file = data_file
+        self.logo_path = logo_path
+
+    @property
+    def store(self):
+        return open_store(self.data_file)
+
+    @property
+    def receipts(self):
+        return receipt_book(self.store, self.logo_path)
+
+    @property
+    def logo(self):
+        """Base64 logo for certificate HTML ("" without a logo)."""
+        return logo_base64(self.logo_path) if self.logo_path else ""
+
+    # ---------------------- STUDENTS ----------------------
+    def student_row(self, register_number):
+        """Store row id of the student with register_number; NotFoundError if there is none."""
+        hits = self.store.find("Register Number", str(register_number).strip())
+        if hits.empty:
+            raise NotFoundError(f"no student with register number {register_number!r}")
+        return hits.index[0]
+
+    def student(self, row):
+        """The student at row id as a Series; NotFoundError if there is none."""
+        found = self.store.rows([row])
+        if found.empty:
+            raise NotFoundError(f"no student at row {row!r}")
+        return found.iloc[0]
+
+    def search(self, query, limit=20):
+        """Best matches for a name or register/UMIS/EMIS number (index = row id)."""
+        return search_index(self.store).search(query, limit)
+
+    def students(self, batch=ALL, department=ALL, offset=0, limit=50, columns=None):
+        """(number of matches, one page of them) for a batch and/or department."""
+        filters = []
+        if batch not in (None, ALL):
+            filters.append(("Batch", EQUALS, str(batch)))
+        if department not in (None, ALL):
+            filters.append(("Department", EQUALS_IGNORE_CASE, str(department)))
+        store = self.store
+        return store.count(filters), store.page(filters, offset=offset, limit=limit, columns=columns)
+
+    def add_student(self, data):
+        """Validate and store one student (dict of column -> value); returns the stored record.
+
+        Total/Remaining Fees are derived from the components. Raises
+        ValueError listing every problem (unknown columns, missing name,
+        known register number, bad amounts).
+        """
+        unknown = [str(column) for column in data if column not in STUDENT_COLUMNS]
+        if unknown:
+            raise ValueError(f"unknown column(s): {', '.join(unknown)}")
+        store = self.store
+        valid, report = validate(pd.DataFrame([data]), store.distinct("Register Number"))
+        if not report.empty:
+            raise ValueError("; ".join(f"{e.column}: {e.error}" for e in report.itertuples(index=False)))
+        record = valid.iloc[0].to_dict()
+        with audit_context(action="add student"):
+            store.append_student(record)
+        return record
+
+    # ---------------------- PAYMENTS ----------------------
+    def pay(self, row, year, amount, fee_type=GENERAL_PAYMENT):
+        """Record a payment for the student at row and issue its receipt.
+
+        Returns (receipt, pdf): the receipt fields (number, student, amounts
+        before/after) and the archived receipt PDF bytes.
+        """
+        year, amount = _year(year), _amount(amount)
+        if fee_type not in PAYMENT_TYPES:
+            raise ValueError(f"unknown fee type {fee_type!r}")
+        student = self.student(row)
+        book = self.receipts
+        receipt_no = book.next_number()
+        receipt = {
+            "receipt_no": receipt_no, "date": str(pd.Timestamp.now().date()),
+            "name": student.get("Name", ""), "register_number": student.get("Register Number", ""),
+            "department": student.get("Department", ""), "academic_year": YEAR_LABELS[year],
+            "fee_type": fee_type, "amount": amount,
+        }
+        book.reserve(receipt)  # a payment posted without its receipt is found by issue_pending_receipts
+        with audit_context(action="payment", receipt_no=receipt_no):
+            result = self.store.record_payment(row, year, amount, fee_type, receipt_no=receipt_no)
+        receipt.update(total=result["total"], previous_paid=result["previous_paid"], paid=result["paid"],
+                       remaining=result["remaining"])
+        return receipt, book.issue(receipt)
+
+    def issue_pending_receipts(self, min_age=60.0):
+        """Issue the receipts of posted payments that never got one; returns their numbers.
+
+        A draft older than min_age seconds whose receipt number is in the
+        ledger is issued, with the before/after amounts rebuilt from the
+        ledger. A draft whose payment was never posted is dropped. Younger drafts may belong to a payment still in
+        progress and are left alone.
+        """
+        book, store = self.receipts, self.store
+        drafts = book.drafts(reserved_before=pd.Timestamp.now() - pd.Timedelta(seconds=min_age))
+        if not drafts:
+            return []
+        if hasattr(store, "sync_ledger"):
+            store.sync_ledger()  # journaled payments the ledger missed
+        posted = store.ledger.posted_receipts([draft["receipt_no"] for draft in drafts])
+        issued = []
+        for receipt in drafts:
+            if receipt["receipt_no"] not in posted:
+                book.discard(receipt["receipt_no"])
+                continue
+            receipt.update(_amounts_after(store.ledger, receipt))
+            book.issue(receipt)
+            issued.append(receipt["receipt_no"])
+        return issued
+
+    def batch_preview(self, batch, department, year, fee_type, amount, kind):
+        """(selected students, before/after table, totals) for a batch posting, without writing."""
+        year = _year(year)
+        if fee_type not in FEE_COMPONENTS:
+            raise ValueError(f"unknown fee type {fee_type!r}")
+        if kind not in (CHARGE, PAYMENT):
+            raise ValueError(f"kind must be {CHARGE!r} or {PAYMENT!r}")
+        selected = select_students(self.store.load(), batch, department)
+        table, totals = preview(selected, year, fee_type, float(amount), kind)
+        return selected, table, totals
+
+    def post_batch(self, batch, department, year, fee_type, amount, kind):
+        """Post amount of fee_type to every student in batch/department as one write."""
+        amount = _amount(amount)
+        selected, _, _ = self.batch_preview(batch, department, year, fee_type, amount, kind)
+        if selected.empty:
+            raise ValueError("no students match the selected batch and department")
+        with audit_context(action=f"batch {kind}"):
+            return self.store.post_batch(selected.index, year, fee_type, amount, kind)
+
+    # ---------------------- DUES ----------------------
+    def dues_totals(self):
+        """Outstanding amount and number of students with dues, per year."""
+        return dues_index(self.store).totals()
+
+    def dues_by_group(self, year=None):
+        """Outstanding per Batch x Department (all years when year is None)."""
+        return dues_index(self.store).pivot(year and _year(year))
+
+    def top_debtors(self, n=10, year=None):
+        return dues_index(self.store).top_debtors(n, year and _year(year))
+
+    def dues_ageing(self):
+        """Unpaid charges per age bucket."""
+        return dues_ageing(self.store)
+
+    def students_with_dues(self, year, offset=0, limit=50, columns=None):
+        """(number of students, one page of them) with remaining fees for year."""
+        filters = [(f"Remaining Fees {_year(year)}", GREATER_THAN, 0)]
+        store = self.store
+        return store.count(filters), store.page(filters, offset=offset, limit=limit, columns=columns)
+
+    # ---------------------- ANALYTICS ----------------------
+    def collection_overview(self):
+        """Students billed, total, paid, remaining and collection rate over all students and years."""
+        return analytics(self.store).overview()
+
+    def collection_rates(self, by=("Department",)):
+        """Collection rate per group of by (Department, Batch and/or Year)."""
+        return analytics(self.store).collection_rates(by)
+
+    def fee_mix(self, year=None):
+        """Charged and collected amount per fee type (for year, or all years)."""
+        return analytics(self.store).fee_mix(year and _year(year))
+
+    def monthly_collections(self, by=None):
+        """Collections per month (overall, or per Department/Batch/Year/Fee Type)."""
+        if by not in (None, "Department", "Batch", "Year", "Fee Type"):
+            raise ValueError(f"cannot split collections by {by!r}")
+        return analytics(self.store).monthly_collections(by)
+
+    # ---------------------- CERTIFICATES ----------------------
+    def transfer_certificate(self, student, admission_no, date_of_admission, date_of_leaving, issue_date=None):
+        """(number, html, Future of the PDF bytes) of a transfer certificate for a student row."""
+        return issue_certificate(certificate_numbers(self.store), TC, student, admission_no=admission_no,
+                                 date_of_admission=date_of_admission, date_of_leaving=date_of_leaving,
+                                 issue_date=issue_date or pd.Timestamp.now().date(), logo=self.logo)
+
+    def conduct_certificate(self, student, title, period_from, period_to, issue_date=None):
+        """(number, html, Future of the PDF bytes) of a conduct certificate for a student row."""
+        return issue_certificate(certificate_numbers(self.store), CC, student, title=title,
+                                 period_from=period_from, period_to=period_to,
+                                 issue_date=issue_date or pd.Timestamp.now().date(), logo=self.logo)
+
+    def batch_certificates(self, batch, kind, **options):
+        """(number of students, Future of a zip with one certificate per student of batch)."""
+        if kind not in (TC, CC):
+            raise ValueError(f"kind must be {TC!r} or {CC!r}")
+        students = self.store.find("Batch", batch)
+        if students.empty:
+            raise ValueError(f"no students in batch {batch!r}")
+        options.setdefault("issue_date", pd.Timestamp.now().date())
+        numbers = certificate_numbers(self.store).reserve(kind, len(students))
+        return len(students), submit_batch(students, kind, numbers, logo=self.logo, **options)
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def fee_service(data_file, logo_path=None):
+    """Process-wide FeeService for data_file."""
+    with _services_lock:
+        service = _services.get(data_file)
+        if service is not None:
+            return service
+        service = _services[data_file] = FeeService(data_file, logo_path)
+    service.issue_pending_receipts()  # left over from a process that stopped between a payment and its receipt
+    return service
@@ -0,0 +1,110 @@
+# snapshot.py
+"""Typed columnar snapshot of the student data (Arrow IPC file).
+
+With pyarrow installed, the journaled store keeps its base data in
+``<data file stem>.snapshot.arrow`` instead of re-parsing the workbook:
+the file is memory-mapped and its column types are stored in the schema,
+so a cold load is a map plus one conversion to pandas. The journal
+checkpoint lives in the schema metadata. The workbook becomes an
+import/export format: it is imported once when no snapshot exists yet and
+rewritten on export.
+
+Without pyarrow everything falls back to the workbook, as before.
+
+Command line:
+
+    python snapshot.py import abi.xlsx     # (re)build the snapshot from the workbook
+    python snapshot.py export abi.xlsx     # write the current data back to the workbook
+"""
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+from datastore import ensure_columns, is_numeric_column
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional dependency
+    pa = None
+
+CHECKPOINT_KEY = b"fms_checkpoint"
+
+
+def available():
+    """True when pyarrow is installed and snapshots can be used."""
+    return pa is not None
+
+
+def snapshot_path_for(data_file):
+    """Snapshot file that belongs to a data workbook."""
+    return os.path.splitext(data_file)[0] + ".snapshot.arrow"
+
+
+def _column(values):
+    """Arrow array for one column; text columns holding mixed Excel types are stored as strings."""
+    try:
+        return pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(values.where(values.isna(), values.astype(str)), type=pa.string(), from_pandas=True)
+
+
+def write_snapshot(df, path, checkpoint=None):
+    """Write df to the snapshot at path (atomically replaced), with the journal checkpoint."""
+    df = ensure_columns(df.copy())
+    names = [str(c) for c in df.columns]
+    arrays = [pa.array(df[c].to_numpy(dtype="float64")) if is_numeric_column(c) else _column(df[c])
+              for c in df.columns]
+    table = pa.Table.from_arrays(arrays, names=names)
+    if checkpoint:
+        # values read back from a workbook's checkpoint sheet are numpy scalars
+        checkpoint = {"generation": checkpoint.get("generation"), "offset": int(checkpoint.get("offset") or 0)}
+    table = table.replace_schema_metadata({CHECKPOINT_KEY: json.dumps(checkpoint).encode("utf-8")})
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path):
+    """Read the snapshot at path (memory-mapped); the checkpoint goes to df.attrs["checkpoint"].
+
+    A missing snapshot reads as an empty frame with all columns, like a missing workbook.
+    """
+    if not os.path.exists(path):
+        df = ensure_columns(pd.DataFrame())
+        df.attrs["checkpoint"] = None
+        return df
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        df = table.to_pandas()
+    metadata = table.schema.metadata or {}
+    df.attrs["checkpoint"] = json.loads(metadata.get(CHECKPOINT_KEY, b"null"))
+    return df
+
+
+def main(argv=None):
+    from datastore import read_excel_data
+    from journal import JournaledStore
+
+    parser = argparse.ArgumentParser(description="Import the workbook into the snapshot, or export it back.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("data_file", help="data workbook, e.g. abi.xlsx")
+    args = parser.parse_args(argv)
+    if not available():
+        print("pyarrow is not installed; the workbook is used directly", file=sys.stderr)
+        return 1
+    if args.action == "import":
+        df = read_excel_data(args.data_file)
+        write_snapshot(df, snapshot_path_for(args.data_file), checkpoint=df.attrs.get("checkpoint"))
+        print(f"Imported {len(df)} students into {snapshot_path_for(args.data_file)}")
+    else:
+        JournaledStore(args.data_file, compact_every=0).export_excel(args.data_file)
+        print(f"Exported the current data to {args.data_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,470 @@
+# sqlite_store.py
+"""SQLite storage backend with indexes on the student lookup keys.
+
+One row per student in the ``students`` table (same columns as the
+workbook). Register Number, Name, Batch and Department are indexed, so the
+page lookups are index seeks instead of pandas scans. A ``meta`` row holds a
+version counter bumped by every write; ``load()`` only re-reads the table
+when it moved. The fee ledger lives in the same database and is posted to
+inside the same transaction as the student row it belongs to.
+
+Migrate an existing workbook (including any un-compacted journal events):
+
+    python sqlite_store.py abi.xlsx abi.db
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+
+import pandas as pd
+
+from datastore import (CHARGE, FEE_COLUMNS, FEE_COMPONENTS, META_COLUMNS, PAYMENT, ensure_columns,
+                       is_numeric_column, write_excel_data)
+from ledger import Ledger, entries_from_frame
+from storage import EQUALS, EQUALS_IGNORE_CASE, GREATER_THAN, INDEXED_COLUMNS, ConflictError, StudentStore
+
+
+def quote(name):
+    """Quote a column name for SQL (names contain spaces and apostrophes)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+_OPERATORS = {EQUALS: "= ?", EQUALS_IGNORE_CASE: "= ? COLLATE NOCASE", GREATER_THAN: "> ?"}
+
+
+def where_clause(filters):
+    """SQL WHERE clause and parameters for (column, op, value) filters."""
+    clauses, params = [], []
+    for column, op, value in filters:
+        if op not in _OPERATORS:
+            raise ValueError(f"unknown filter operator {op!r}")
+        clauses.append(f"{quote(column)} {_OPERATORS[op]}")
+        params.append(_sql_value(value))
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _sql_value(value):
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(value, "item"):  # numpy scalar
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+class SQLiteStore(StudentStore):
+    """Student data in an SQLite database (WAL mode, one connection per thread)."""
+
+    def __init__(self, data_file, timeout=30.0):
+        super().__init__()
+        self.data_file = data_file
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._df = None
+        self._version = None
+        self._columns = None
+        self._init_schema()
+
+    # ---------------------- CONNECTION / SCHEMA ----------------------
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.data_file, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        try:
+            os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
+        except Exception:
+            pass
+        conn = self._conn()
+        columns = ", ".join(
+            f"{quote(c)} {'REAL NOT NULL DEFAULT 0' if is_numeric_column(c) else 'TEXT'}"
+            for c in META_COLUMNS + FEE_COLUMNS
+        )
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS students (id INTEGER PRIMARY KEY, {columns})")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+            for col in INDEXED_COLUMNS:
+                collate = " COLLATE NOCASE" if col == "Department" else ""
+                index_name = "idx_students_" + col.lower().replace(" ", "_")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON students ({quote(col)}{collate})")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _table_columns(self, conn):
+        if self._columns is None:
+            rows = conn.execute("PRAGMA table_info(students)").fetchall()
+            self._columns = [r[1] for r in rows if r[1] != "id"]
+        return self._columns
+
+    def _add_missing_columns(self, conn, names):
+        """Extra workbook columns become new table columns (inside the caller's transaction)."""
+        known = set(self._table_columns(conn))
+        for name in names:
+            if name not in known and name != "id":
+                kind = "REAL NOT NULL DEFAULT 0" if is_numeric_column(name) else "TEXT"
+                conn.execute(f"ALTER TABLE students ADD COLUMN {quote(name)} {kind}")
+                self._columns.append(name)
+                known.add(name)
+
+    def _bump_version(self, conn):
+        """Advance the write counter; returns the (before, after) versions."""
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        after = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        return after - 1, after
+
+    def version(self):
+        """Write counter of the database; changes whenever any process writes."""
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def _read_frame(self, where="", params=()):
+        df = pd.read_sql_query(f"SELECT * FROM students {where} ORDER BY id", self._conn(),
+                               params=params, index_col="id")
+        df.index.name = None
+        return ensure_columns(df)
+
+    # ---------------------- READ PATH ----------------------
+    def load(self):
+        """Return a private copy of the current student data (index = row id), stamped with its version."""
+        with self._lock:
+            version = self.version()
+            if self._df is None or version != self._version:
+                self._df = self._read_frame()
+                self._version = version
+            df = self._df.copy()
+            df.attrs["version"] = version
+            return df
+
+    def find(self, column, value, ignore_case=False):
+        """Rows where column equals value, answered from the index."""
+        where, params = where_clause([(column, EQUALS_IGNORE_CASE if ignore_case else EQUALS, value)])
+        return self._read_frame(where, params)
+
+    def rows(self, ids):
+        """Rows with the given ids, read by primary key."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return self._read_frame("WHERE 0")
+        df = self._read_frame(f"WHERE id IN ({', '.join('?' for _ in ids)})", ids)
+        return df.loc[[i for i in ids if i in df.index]]
+
+    def count(self, filters=()):
+        """Number of rows matching filters, counted in SQL."""
+        where, params = where_clause(filters)
+        return self._conn().execute(f"SELECT COUNT(*) FROM students {where}", params).fetchone()[0]
+
+    def page(self, filters=(), offset=0, limit=50, columns=None):
+        """One page of matching rows; only the requested columns are read."""
+        where, params = where_clause(filters)
+        known = self._table_columns(self._conn())
+        cols = [c for c in columns if c in known] if columns else known
+        df = pd.read_sql_query(
+            f"SELECT id, {', '.join(quote(c) for c in cols)} FROM students {where} "
+            "ORDER BY id LIMIT ? OFFSET ?",
+            self._conn(), params=params + [int(limit), int(offset)], index_col="id",
+        )
+        df.index.name = None
+        return df
+
+    def distinct(self, column):
+        """Unique values of column in storage order (blank for missing)."""
+        rows = self._conn().execute(
+            f"SELECT COALESCE({quote(column)}, '') FROM students GROUP BY 1 ORDER BY MIN(id)"
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    # ---------------------- WRITE PATH ----------------------
+    def ledger_path(self):
+        return self.data_file
+
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def _last_id(self, conn):
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM students").fetchone()[0]
+
+    def _insert_rows(self, conn, columns, rows, with_ids=False):
+        names = (["id"] if with_ids else []) + list(columns)
+        sql = (f"INSERT INTO students ({', '.join(quote(c) for c in names)}) "
+               f"VALUES ({', '.join('?' for _ in names)})")
+        conn.executemany(sql, rows)
+
+    def append_student(self, data):
+        """Insert a new student row (dict of column -> value) and post its fees to the ledger."""
+        frame = ensure_columns(pd.DataFrame([data]))
+        data = frame.iloc[0].to_dict()
+        ledger = self.ledger  # opened (and seeded) before taking the store lock
+        with self._lock:
+            conn = self._transaction()
+            try:
+                self._add_missing_columns(conn, data)
+                last_id = self._last_id(conn)
+                self._insert_rows(conn, data, [[_sql_value(v) for v in data.values()]])
+                ledger.post(entries_from_frame(frame), conn=conn)
+                changed = self._read_frame("WHERE id > ?", (last_id,))
+                self._audit_write(changed, changed.iloc[0:0], conn=conn)
+                before, after = self._bump_version(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self._notify(before, after, changed)
+
+    def append_students(self, df):
+        """Insert every row of df and post their fees in one transaction."""
+        df = ensure_columns(df.copy())
+        rows = [[_sql_value(v) for v in values] for values in df.itertuples(index=False, name=None)]
+        ledger = self.ledger  # opened (and seeded) before taking the store lock
+        with self._lock:
+            conn = self._transaction()
+            try:
+                self._add_missing_columns(conn, df.columns)
+                last_id = self._last_id(conn)
+                self._insert_rows(conn, df.columns, rows)
+                ledger.post(entries_from_frame(df), conn=conn)
+                changed = self._read_frame("WHERE id > ?", (last_id,))
+                self._audit_write(changed, changed.iloc[0:0], conn=conn)
+                before, after = self._bump_version(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self._notify(before, after, changed)
+        return len(df)
+
+    def record_payment(self, row, year, amount, fee_type="", receipt_no=""):
+        """Post a payment against row (student id) for year (e.g. "1st year").
+
+        Returns the paid/remaining/total values before and after the payment.
+        """
+        paid_col = quote(f"Paid Fees {year}")
+        remaining_col = quote(f"Remaining Fees {year}")
+        total_col = quote(f"Total Fees {year}")
+        amount = float(amount)
+        ledger = self.ledger  # opened (and seeded) before taking the store lock
+        with self._lock:
+            conn = self._transaction()
+            try:
+                found = conn.execute(
+                    f"SELECT {paid_col}, {remaining_col}, {total_col}, \"Register Number\" "
+                    "FROM students WHERE id = ?",
+                    (int(row),),
+                ).fetchone()
+                if found is None:
+                    raise KeyError(row)
+                paid, remaining, total, register_number = found
+                new_paid = float(paid or 0.0) + amount
+                new_remaining = max(float(remaining or 0.0) - amount, 0.0)
+                conn.execute(
+                    f"UPDATE students SET {paid_col} = ?, {remaining_col} = ? WHERE id = ?",
+                    (new_paid, new_remaining, int(row)),
+                )
+                ledger.post([{
+                    "register_number": register_number or "", "year": year, "fee_type": fee_type,
+                    "amount": amount, "kind": PAYMENT, "ts": pd.Timestamp.now().isoformat(),
+                    "receipt_no": receipt_no,
+                }], conn=conn)
+                changed = self._read_frame("WHERE id = ?", (int(row),))
+                written = changed.assign(**{f"Paid Fees {year}": paid, f"Remaining Fees {year}": remaining})
+                self._audit_write(changed, written, conn=conn)
+                version_before, version_after = self._bump_version(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self._notify(version_before, version_after, changed)
+        return {
+            "previous_paid": float(paid or 0.0),
+            "previous_remaining": float(remaining or 0.0),
+            "paid": new_paid,
+            "remaining": new_remaining,
+            "total": float(total or 0.0),
+        }
+
+    def post_payments(self, payments):
+        """Apply many payments with one UPDATE statement per year, in one transaction."""
+        now = pd.Timestamp.now().isoformat()
+        ts = payments["ts"].fillna(now) if "ts" in payments.columns else pd.Series(now, index=payments.index)
+        items = list(zip((int(r) for r in payments["row"]), payments["year"],
+                         (float(a) for a in payments["amount"]), payments["fee_type"],
+                         payments["receipt_no"], (str(t) for t in ts)))
+        ledger = self.ledger  # opened (and seeded) before taking the store lock
+        with self._lock:
+            conn = self._transaction()
+            try:
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_rows (id INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM batch_rows")
+                conn.executemany("INSERT OR IGNORE INTO batch_rows (id) VALUES (?)", ((i[0],) for i in items))
+                register_numbers = dict(conn.execute(
+                    'SELECT id, COALESCE("Register Number", \'\') FROM students '
+                    "WHERE id IN (SELECT id FROM batch_rows)").fetchall())
+                missing = [i[0] for i in items if i[0] not in register_numbers]
+                if missing:
+                    raise KeyError(missing[0])
+                written = self._read_frame("WHERE id IN (SELECT id FROM batch_rows)")
+                for year in dict.fromkeys(i[1] for i in items):
+                    paid_col = quote(f"Paid Fees {year}")
+                    remaining_col = quote(f"Remaining Fees {year}")
+                    conn.executemany(
+                        f"UPDATE students SET {paid_col} = {paid_col} + :amount, "
+                        f"{remaining_col} = MAX({remaining_col} - :amount, 0) WHERE id = :id",
+                        ({"amount": i[2], "id": i[0]} for i in items if i[1] == year),
+                    )
+                ledger.post([
+                    {"register_number": register_numbers[row], "year": year, "fee_type": fee_type,
+                     "amount": amount, "kind": PAYMENT, "ts": when, "receipt_no": receipt_no}
+                    for row, year, amount, fee_type, receipt_no, when in items
+                ], conn=conn)
+                changed = self._read_frame("WHERE id IN (SELECT id FROM batch_rows)")
+                self._audit_write(changed, written, conn=conn)
+                before, after = self._bump_version(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self._notify(before, after, changed)
+        return {"payments": len(items), "amount": float(sum(i[2] for i in items))}
+
+    def post_batch(self, rows, year, fee_type, amount, kind, receipt_no=""):
+        """Apply one charge or payment to every row id in rows with set-based UPDATEs in one transaction."""
+        paid_col = quote(f"Paid Fees {year}")
+        remaining_col = quote(f"Remaining Fees {year}")
+        total_col = quote(f"Total Fees {year}")
+        if kind == CHARGE:
+            if fee_type not in FEE_COMPONENTS:
+                raise ValueError(f"cannot charge {fee_type!r}; expected one of {FEE_COMPONENTS}")
+            fee_col = quote(f"{fee_type} {year}")
+            # a student in credit (Paid > Total) only owes what the credit does not cover
+            assignment = (f"{fee_col} = {fee_col} + :amount, {total_col} = {total_col} + :amount, "
+                          f"{remaining_col} = MAX({total_col} + :amount - {paid_col}, 0)")
+        elif kind == PAYMENT:
+            assignment = (f"{paid_col} = {paid_col} + :amount, "
+                          f"{remaining_col} = MAX({remaining_col} - :amount, 0)")
+        else:
+            raise ValueError(f"unknown posting kind {kind!r}")
+        amount = float(amount)
+        rows = [int(r) for r in rows]
+        ts = pd.Timestamp.now().isoformat()
+        ledger = self.ledger  # opened (and seeded) before taking the store lock
+        with self._lock:
+            conn = self._transaction()
+            try:
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_rows (id INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM batch_rows")
+                conn.executemany("INSERT OR IGNORE INTO batch_rows (id) VALUES (?)", ((r,) for r in rows))
+                written = self._read_frame("WHERE id IN (SELECT id FROM batch_rows)")
+                conn.execute(f"UPDATE students SET {assignment} WHERE id IN (SELECT id FROM batch_rows)",
+                             {"amount": amount})
+                register_numbers = [r[0] or "" for r in conn.execute(
+                    'SELECT "Register Number" FROM students WHERE id IN (SELECT id FROM batch_rows)')]
+                ledger.post([
+                    {"register_number": reg, "year": year, "fee_type": fee_type, "amount": amount,
+                     "kind": kind, "ts": ts, "receipt_no": receipt_no}
+                    for reg in register_numbers
+                ], conn=conn)
+                changed = self._read_frame("WHERE id IN (SELECT id FROM batch_rows)")
+                self._audit_write(changed, written, conn=conn)
+                before, after = self._bump_version(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self._notify(before, after, changed)
+        return {"students": len(register_numbers), "amount": amount * len(register_numbers)}
+
+    def save_frame(self, df, expected_version=None):
+        """Replace the whole dataset with df in one transaction.
+
+        Integer, unique frame indexes (as returned by load()) are kept as row ids.
+        The ledger is left as is; it keeps the history of the replaced data.
+        Raises ConflictError if expected_version is given and another write
+        got in first.
+        """
+        df = ensure_columns(df.copy())
+        keep_ids = df.index.is_unique and pd.api.types.is_integer_dtype(df.index)
+        rows = [
+            ([int(i)] if keep_ids else []) + [_sql_value(v) for v in values]
+            for i, values in zip(df.index, df.itertuples(index=False, name=None))
+        ]
+        with self._lock:
+            conn = self._transaction()
+            try:
+                current = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+                if expected_version is not None and expected_version != current:
+                    raise ConflictError("the student data changed since it was loaded")
+                self._add_missing_columns(conn, df.columns)
+                replaced = self._read_frame()
+                conn.execute("DELETE FROM students")
+                self._insert_rows(conn, df.columns, rows, with_ids=keep_ids)
+                self._audit_write(df, replaced, conn=conn)
+                before, after = self._bump_version(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self._notify(before, after, None)
+
+    def compact(self):
+        """Checkpoint the WAL into the main database file."""
+        self._conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def export_excel(self, path):
+        """Write the current data to a plain .xlsx file at path."""
+        write_excel_data(self.load(), path)
+
+
+# ---------------------- MIGRATION ----------------------
+def migrate(source, target, replace=False):
+    """Import the workbook at source (plus its journal and ledger) into the database at target."""
+    from journal import JournaledStore
+
+    if os.path.exists(target) and not replace:
+        raise FileExistsError(f"{target} already exists (use --replace to overwrite its data)")
+    source_store = JournaledStore(source, compact_every=0)
+    df = source_store.load()
+    SQLiteStore(target).save_frame(df.reset_index(drop=True))
+    ledger = Ledger(target)
+    ledger.clear()
+    if os.path.exists(source_store.ledger_path()):
+        ledger.post(Ledger(source_store.ledger_path()).history())
+    if ledger.is_empty():
+        ledger.seed_from_frame(df)
+    return len(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import the student workbook into an SQLite database.")
+    parser.add_argument("source", help="existing workbook, e.g. abi.xlsx")
+    parser.add_argument("target", help="database to create, e.g. abi.db")
+    parser.add_argument("--replace", action="store_true", help="overwrite the data in an existing database")
+    args = parser.parse_args(argv)
+    try:
+        count = migrate(args.source, args.target, replace=args.replace)
+    except FileExistsError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    print(f"Imported {count} students into {args.target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+# storage.py
+"""Pluggable storage backends for the student data.
+
+``open_store(path)`` returns the process-wide store for a data file. The
+backend is picked from the file extension: ``.db``/``.sqlite``/``.sqlite3``
+files use the indexed SQLite store, anything else (``abi.xlsx``) the
+journaled Excel store.
+"""
+import os
+import threading
+
+import pandas as pd
+
+from ledger import Ledger
+
+# Columns the pages look students up by; the SQLite backend indexes them.
+INDEXED_COLUMNS = ["Register Number", "Name", "Batch", "Department"]
+
+# Filter operators for count()/page(): (column, op, value) tuples
+EQUALS = "=="
+EQUALS_IGNORE_CASE = "ieq"
+GREATER_THAN = ">"
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+class ConflictError(Exception):
+    """The data changed after the frame being saved was loaded; reload and retry."""
+
+
+class StudentStore:
+    """Interface shared by the storage backends.
+
+    Backends implement load/save_frame/append_student(s)/record_payment/
+    post_payments/post_batch/compact/export_excel. The lookup helpers below work on any
+    backend by filtering the loaded frame; indexed backends override them.
+    Every store also owns a fee ledger (see ledger.py) that its writes post to.
+
+    Payments and charges are applied as deltas to the current row under the
+    store's write lock, so concurrent cashiers never lose each other's
+    updates. Whole-frame replacement is optimistic: load() stamps the frame
+    with the version it was read at (``df.attrs["version"]``) and
+    save_frame(df, expected_version=...) refuses with ConflictError if the
+    data has moved on since.
+    """
+
+    def __init__(self):
+        self._listeners = []
+        self._derived = {}
+        self._derived_lock = threading.RLock()
+
+    def load(self):
+        """Return a private copy of the current student data, stamped with its version."""
+        raise NotImplementedError
+
+    def save_frame(self, df, expected_version=None):
+        """Replace the whole dataset with df.
+
+        With expected_version set, raises ConflictError unless the stored data
+        is still at that version.
+        """
+        raise NotImplementedError
+
+    def append_student(self, data):
+        """Add one student row (dict of column -> value)."""
+        raise NotImplementedError
+
+    def append_students(self, df):
+        """Add every row of df in a single write; returns the number of rows added."""
+        raise NotImplementedError
+
+    def record_payment(self, row, year, amount, fee_type="", receipt_no=""):
+        """Post a payment against row for year; returns before/after fee values."""
+        raise NotImplementedError
+
+    def post_payments(self, payments):
+        """Apply many payments (possibly different students, years and amounts) as one write.
+
+        payments is a DataFrame with columns row, year, amount, fee_type,
+        receipt_no and optionally ts (payment time for the ledger). Unknown
+        rows raise KeyError before anything is written. Returns
+        {"payments": number posted, "amount": total posted}.
+        """
+        raise NotImplementedError
+
+    def post_batch(self, rows, year, fee_type, amount, kind, receipt_no=""):
+        """Apply one charge or payment to every row in rows as a single transaction.
+
+        Returns {"students": number of rows posted, "amount": total posted}.
+        """
+        raise NotImplementedError
+
+    def compact(self):
+        """Fold pending changes into the primary storage file."""
+
+    def export_excel(self, path):
+        """Write the current data to a plain .xlsx file at path."""
+        raise NotImplementedError
+
+    # ---------------------- CHANGE NOTIFICATION ----------------------
+    def version(self):
+        """Opaque token that changes whenever the stored data changes."""
+        raise NotImplementedError
+
+    def subscribe(self, listener):
+        """Call listener(before, after, changed) after every write made through this store.
+
+        before/after are the versions around the write and changed holds the
+        written rows as they are now (None when the whole dataset may have
+        changed). Listeners run outside the store's lock.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, before, after, changed):
+        for listener in list(self._listeners):
+            listener(before, after, changed)
+
+    # ---------------------- DERIVED DATA ----------------------
+    def derived(self, name, build):
+        """Process-wide structure derived from the data, such as the dues or search index.
+
+        build(df, version) creates it; the result must have a ``version``
+        attribute and an ``update(changed)`` method. It is kept current from
+        this store's change notifications and rebuilt when the data changed
+        some other way (another process, a full replace).
+        """
+        with self._derived_lock:
+            if name not in self._derived:
+                self._derived[name] = None
+
+                def on_write(before, after, changed):
+                    with self._derived_lock:
+                        current = self._derived.get(name)
+                        if current is None or current.version != before:
+                            return  # already stale; rebuilt on next use
+                        if changed is None:
+                            self._derived[name] = None
+                        else:
+                            current.update(changed)
+                            current.version = after
+
+                self.subscribe(on_write)
+            version = self.version()
+            current = self._derived[name]
+            if current is None or current.version != version:
+                current = self._derived[name] = build(self.load(), version)
+            return current
+
+    def cached(self, name, compute):
+        """compute() evaluated at most once per data version."""
+        with self._derived_lock:
+            version = self.version()
+            entry = self._derived.get(("cached", name))
+            if entry is None or entry[0] != version:
+                entry = self._derived[("cached", name)] = (version, compute())
+            return entry[1]
+
+    # ---------------------- LEDGER ----------------------
+    def ledger_path(self):
+        """SQLite file holding this store's fee ledger."""
+        return os.path.splitext(self.data_file)[0] + ".ledger.db"
+
+    @property
+    def ledger(self):
+        """Fee ledger, seeded from the current data the first time it is opened empty."""
+        with _ledger_lock:
+            if getattr(self, "_ledger", None) is None:
+                ledger = Ledger(self.ledger_path())
+                seed = None
+                if ledger.is_empty():
+                    seed = self.load()
+                    if not seed.empty:
+                        ledger.seed_from_frame(seed)
+                self._ledger = ledger
+                self._ledger_opened(ledger, seed)
+            return self._ledger
+
+    def _ledger_opened(self, ledger, seed):
+        """Called once when the ledger is opened; seed is the frame it was seeded from (or None)."""
+
+    # ---------------------- AUDIT ----------------------
+    def _audit_write(self, after, before, conn=None, event=None, context=None):
+        """Log the fee values a write changed in the attached audit log (see AuditLog.record)."""
+        log = getattr(self, "_audit", None)
+        if log is not None:
+            log.record(after, before=before, conn=conn, event=event, context=context)
+
+    def _audit_opened(self, log, seed):
+        """Called once when the audit log is attached; seed is the frame it started from (or None)."""
+
+    # ---------------------- LOOKUPS ----------------------
+    def _query(self, fn):
+        """Run fn on the current frame and return its result (must not mutate it)."""
+        return fn(self.load())
+
+    def find(self, column, value, ignore_case=False):
+        """Rows where column equals value (case-insensitively if asked)."""
+        def match(df):
+            values = df[column].fillna("")
+            if ignore_case:
+                mask = values.astype(str).str.lower() == str(value).lower()
+            else:
+                mask = values == value
+            return df[mask].copy()
+        return self._query(match)
+
+    def distinct(self, column):
+        """Unique values of column in storage order (blank for missing)."""
+        return self._query(lambda df: df[column].fillna("").unique().tolist())
+
+    def rows(self, ids):
+        """Rows with the given row ids (unknown ids are skipped), in the order given."""
+        return self._query(lambda df: df.loc[[i for i in ids if i in df.index]].copy())
+
+    def count(self, filters=()):
+        """Number of rows matching filters (list of (column, op, value))."""
+        return self._query(lambda df: int(filter_mask(df, filters).sum()))
+
+    def page(self, filters=(), offset=0, limit=50, columns=None):
+        """One page of the rows matching filters, projected onto columns (all if None)."""
+        def fetch(df):
+            rows = df[filter_mask(df, filters)]
+            cols = [c for c in columns if c in df.columns] if columns else list(df.columns)
+            return rows.iloc[offset:offset + limit][cols].copy()
+        return self._query(fetch)
+
+
+def filter_mask(df, filters):
+    """Boolean mask of the rows of df matching every (column, op, value) filter."""
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        values = df[column]
+        if op == EQUALS:
+            mask &= values.fillna("") == value
+        elif op == EQUALS_IGNORE_CASE:
+            mask &= values.fillna("").astype(str).str.lower() == str(value).lower()
+        elif op == GREATER_THAN:
+            mask &= values > value
+        else:
+            raise ValueError(f"unknown filter operator {op!r}")
+    return mask
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+_ledger_lock = threading.RLock()
+
+
+def backend_for(data_file):
+    """Store class that handles data_file."""
+    if os.path.splitext(data_file)[1].lower() in SQLITE_EXTENSIONS:
+        from sqlite_store import SQLiteStore
+        return SQLiteStore
+    from journal import JournaledStore
+    return JournaledStore
+
+
+def open_store(data_file, **options):
+    """Process-wide store for data_file (one per path); its writes are audited (see audit.py)."""
+    from audit import attach
+    with _stores_lock:
+        store = _stores.get(data_file)
+        if store is None:
+            store = backend_for(data_file)(data_file, **options)
+            attach(store)
+            _stores[data_file] = store
+        return store
@@ -1,103 +1,120 @@
 # CCCC_fixed.py
 import streamlit as st
 import pandas as pd
+import html
 import os
-import segno
-import tempfile
-from io import BytesIO
-import pisa
-import base64
+
+from storage import EQUALS, EQUALS_IGNORE_CASE, GREATER_THAN, open_store
+from bulk_import import read_table, validate
+from batch_posting import ALL
+from datastore import CHARGE, FEE_COMPONENTS, PAYMENT, SUMMARY_COLUMNS, YEARS
+from search_index import label, search_index
+from integrity import integrity_report, repair
+from reconcile import DISMISSED, post_review_item, reconcile, review_queue
+from upi_qr import qr_png, qr_sheet_pdf, student_payments, upi_link
+from metrics import registry as metrics, set_gauge, timed
+from certificates import CC, TC, logo_base64
+from config import settings
+from service import PAYMENT_TYPES, YEAR_LABELS, fee_service
+from reports import DUE_DAYS, DUES_LETTER, PDF, STATEMENT, XLSX, submit_report
+from audit import audit_context, audit_log
+from auth import ADMIN, CASHIER, ROLES, VIEWER, allows, credential_store
 
 # ---------------------- CONFIG / PATHS ----------------------
-LOGO_PATH = r"C:\Users\muthu\OneDrive\Desktop\collegeapp\clglogo.jpeg"
-ICON_PATH = r"C:\Users\muthu\Desktop\FeesApp\Screenshot 2025-04-24 153118.ico"
-CREDENTIALS_FILE = r"C:\Users\muthu\OneDrive\Desktop\collegeapp\credentials.csv"
-DATA_FILE = r"C:\Users\muthu\OneDrive\Desktop\collegeapp\abi.xlsx"
+# per deployment: fms.ini / FMS_* environment variables (see config.py)
+CONFIG = settings()
+LOGO_PATH = CONFIG.logo
+CREDENTIALS_FILE = CONFIG.credentials_file
+DATA_FILE = CONFIG.data_file
+METRICS_PROM_FILE = os.path.splitext(DATA_FILE)[0] + ".metrics.prom"
+METRICS_JSONL_FILE = os.path.splitext(DATA_FILE)[0] + ".metrics.jsonl"
+REPORTS_DIR = os.path.splitext(DATA_FILE)[0] + ".reports"
 
-st.set_page_config(page_title="Fees Management System", page_icon=ICON_PATH, layout="wide")
+st.set_page_config(page_title="Fees Management System", page_icon=CONFIG.icon, layout="wide")
 
 # ---------------------- SESSION INIT ----------------------
 if 'page' not in st.session_state:
     st.session_state.page = "home"
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
+if 'role' not in st.session_state:
+    st.session_state.role = None
 
 # ---------------------- UTILITIES ----------------------
-def image_to_base64(image_path):
-    """Convert image to base64 string (safe if file exists)"""
-    try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except Exception:
-        return ""
-
-logo_base64 = image_to_base64(LOGO_PATH)
+def college_logo():
+    """Base64 of the configured logo, read on first use ("" without one)."""
+    return logo_base64(LOGO_PATH) if LOGO_PATH else ""
 
 def display_logo():
     """Display college logo (if available)"""
     try:
         st.image(LOGO_PATH, width=100)
     except Exception:
-        if logo_base64:
-            st.markdown(f'<img src="data:image/jpeg;base64,{logo_base64}" width="100"/>', unsafe_allow_html=True)
+        if college_logo():
+            st.markdown(f'<img src="data:image/jpeg;base64,{college_logo()}" width="100"/>', unsafe_allow_html=True)
     st.markdown("<hr>", unsafe_allow_html=True)
 
-def ensure_columns(df):
-    """Ensure all expected fee and meta columns exist with appropriate dtypes."""
-    # Basic meta columns
-    meta_cols = [
-        "UMIS Number", "EMIS Number", "Register Number", "Batch", "Name", "Sex",
-        "Department", "Date of Birth", "Community & Subcaste", "Nationality & Religion",
-        "Father's Name", "Address", "Mobile Number", "Aadhar Number", "First Graduate"
-    ]
-    for c in meta_cols:
-        if c not in df.columns:
-            df[c] = ""
-
-    # Fee structure columns (for 1st-4th year)
-    years = ["1st", "2nd", "3rd", "4th"]
-    fee_types = [
-        "Bus Fees", "Mess Fees", "Hostel Fees", "Exam Fees",
-        "Tution Fees", "Fine", "Miscellaneous", "Course Fees",
-        "Due Fees", "Paid Fees", "Remaining Fees", "Total Fees"
-    ]
-    for year in years:
-        for ft in fee_types:
-            col = f"{ft} {year} year"
-            if col not in df.columns:
-                df[col] = 0.0
-
-    # Convert numeric columns to numeric type
-    for col in df.columns:
-        if any(keyword in col for keyword in ["Fees", "Paid", "Remaining", "Total", "Due", "Fine"]):
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
-    return df
-
-def load_data():
-    """Load student data from Excel; if missing, create empty DataFrame with columns."""
-    if os.path.exists(DATA_FILE):
-        try:
-            df = pd.read_excel(DATA_FILE, engine='openpyxl')
-        except Exception:
-            df = pd.read_excel(DATA_FILE)  # fallback
+def service():
+    """The fee service behind the pages (see service.py)."""
+    return fee_service(DATA_FILE, LOGO_PATH)
+
+def student_count():
+    """Number of students (a store query, no frame is loaded)."""
+    count = open_store(DATA_FILE).count()
+    set_gauge("dataset_students", count)
+    return count
+
+def student_columns():
+    """Column names of the student data, without reading any rows."""
+    return list(open_store(DATA_FILE).page(limit=0).columns)
+
+def show_paged(store, filters, key, all_columns):
+    """Render the rows matching filters one page at a time, fetching only that page and the chosen columns."""
+    total = store.count(filters)
+    if total == 0:
+        return 0
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        columns = st.multiselect("Columns", all_columns,
+                                 default=[c for c in SUMMARY_COLUMNS if c in all_columns], key=f"{key}_cols")
+    with col2:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 200], index=1, key=f"{key}_size")
+    pages = (total - 1) // page_size + 1
+    with col3:
+        page_no = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    offset = (int(page_no) - 1) * page_size
+    st.dataframe(store.page(filters, offset=offset, limit=page_size, columns=columns or None))
+    st.caption(f"Showing {offset + 1}–{min(offset + page_size, total)} of {total} students (page {page_no} of {pages})")
+    return total
+
+def pick_student(store, key):
+    """Type-ahead student picker; returns the chosen student's row as a one-row DataFrame, or None."""
+    query = st.text_input("Type a name, register, UMIS or EMIS number", key=f"{key}_query")
+    if not query:
+        st.caption("Start typing to find a student.")
+        return None
+    hits = search_index(store).search(query)
+    if hits.empty:
+        st.warning(f"No student matches '{query}'.")
+        return None
+    row = st.selectbox(f"Select Student ({len(hits)} shown)", hits.index.tolist(),
+                       format_func=lambda r: label(hits.loc[r]), key=f"{key}_pick")
+    return store.rows([row])
+
+def show_pdf_job(future, label, file_name, error_message, key):
+    """Download button for a background PDF job, or a notice while it is still rendering."""
+    if not future.done():
+        st.info("⏳ PDF is being generated in the background…")
+        st.button("Refresh", key=f"{key}_refresh")
+    elif future.exception() is not None:
+        st.error(error_message)
     else:
-        df = pd.DataFrame()
-    df = ensure_columns(df)
-    return df
-
-def save_data(df):
-    """Save DataFrame to Excel"""
-    # ensure directory exists
-    try:
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-    except Exception:
-        pass
-    df.to_excel(DATA_FILE, index=False)
+        st.download_button(label, data=future.result(), file_name=file_name, mime="application/pdf")
 
 # ---------------------- PAGE FUNCTIONS ----------------------
 def home_page():
     display_logo()
-    st.title("🎓 Dr.G.U.Pope College Of Engineering")
+    st.title(f"🎓 {CONFIG.institution}")
     st.subheader("Welcome to the Fees Management System")
     st.markdown("Please click below to login and access student records.")
     if st.button("Login"):
@@ -107,57 +124,60 @@ def home_page():
 def login_page():
     display_logo()
     st.title("WELCOME")
-    st.title("Dr.G.U.Pope College Of Engineering")
+    st.title(CONFIG.institution)
 
-    if os.path.exists(CREDENTIALS_FILE):
-        try:
-            creds_df = pd.read_csv(CREDENTIALS_FILE)
-            valid_users = dict(zip(creds_df['username'], creds_df['password']))
-        except Exception:
-            st.error("⚠️ credentials.csv found but couldn't be read. Check file format.")
-            return
-    else:
-        st.error("⚠️ credentials.csv file not found!")
+    users = credential_store(CREDENTIALS_FILE)
+    if not users.exists():
+        st.error("⚠️ credentials.csv file not found! Create the first user with: "
+                 "python auth.py add credentials.csv <username> --role admin")
         return
 
     username = st.text_input("Username")
     password = st.text_input("Password", type="password")
 
     if st.button("Login"):
-        if username in valid_users and valid_users[username] == password:
+        try:
+            role = users.authenticate(username, password)
+        except Exception:
+            st.error("⚠️ credentials.csv found but couldn't be read. Check file format.")
+            return
+        if role is not None:
             st.session_state.logged_in = True
+            st.session_state.user = username.strip()
+            st.session_state.role = role
             st.session_state.page = "main"
             st.success("✅ Login successful!")
             st.rerun()
         else:
             st.error("❌ Invalid username or password")
 
-def view_students_page(df):
+def view_students_page():
     st.subheader("View Students by Batch")
     batch_column = 'Batch'
-    if batch_column not in df.columns:
+    columns = student_columns()
+    if batch_column not in columns:
         st.error(f"Column '{batch_column}' not found in data")
         return
-    batches = df[batch_column].fillna("Unknown").unique().tolist()
+    store = open_store(DATA_FILE)
+    batches = store.distinct(batch_column)
     selected_batch = st.selectbox("Select Batch", batches)
-    filtered_df = df[df[batch_column] == selected_batch]
-    st.dataframe(filtered_df)
-
-def search_student_page(df):
+    show_paged(store, [(batch_column, EQUALS, selected_batch)], "view", columns)
+    # rewrites the data workbook itself, so only for admins
+    if allows(st.session_state.role, ADMIN) and st.button("📤 Export to Excel"):
+        # the app reads from its snapshot; the workbook is refreshed on demand
+        store.export_excel(DATA_FILE)
+        st.success(f"✅ Exported the current data to {DATA_FILE}")
+
+def search_student_page():
     st.subheader("🔍 Search Student Details")
-    if df.empty or df['Name'].replace('', pd.NA).dropna().empty:
+    if student_count() == 0:
         st.warning("No students available in the system.")
         return
 
-    search_option = st.radio("Search by:", ["Name", "Registration Number"])
-    if search_option == "Name":
-        student_names = df["Name"].fillna("").unique().tolist()
-        selected_name = st.selectbox("Select Student", student_names)
-        student = df[df["Name"] == selected_name]
-    else:
-        reg_nos = df["Register Number"].fillna("").unique().tolist()
-        selected_reg = st.selectbox("Select Registration Number", reg_nos)
-        student = df[df["Register Number"] == selected_reg]
+    store = open_store(DATA_FILE)
+    student = pick_student(store, "search")
+    if student is None:
+        return
 
     if not student.empty:
         student_info = student.iloc[0]
@@ -250,10 +270,31 @@ def search_student_page(df):
             })
         status_df = pd.DataFrame(status_data)
         st.dataframe(status_df, use_container_width=True)
+        st.markdown("---")
+        st.subheader("🧾 Payment History")
+        history = store.ledger.history(register_number=student_info.get('Register Number', ''))
+        if history.empty:
+            st.caption("No ledger entries recorded for this student.")
+        else:
+            st.dataframe(history.drop(columns=["register_number"]), use_container_width=True)
+        st.subheader("🖨️ Reprint Receipt")
+        book = service().receipts
+        issued = book.for_student(student_info.get('Register Number', ''))
+        if issued.empty:
+            st.caption("No receipts issued to this student yet.")
+        else:
+            st.dataframe(issued, use_container_width=True, hide_index=True)
+            receipt_no = st.selectbox("Receipt", issued["receipt_no"], key="reprint_receipt")
+            pdf = book.reprint(receipt_no)
+            if pdf is None:
+                st.error("The archived PDF for this receipt is missing.")
+            else:
+                st.download_button("📥 Download Receipt PDF", pdf, file_name=f"{receipt_no}.pdf",
+                                   mime="application/pdf", key="reprint_download")
     else:
         st.warning("No student found with the selected criteria.")
 
-def add_student_page(df):
+def add_student_page():
     st.subheader("Add New Student")
     with st.form("add_form"):
         col1, col2 = st.columns(2)
@@ -289,15 +330,6 @@ def add_student_page(df):
                     key = f"{fee_name} {year} year"
                     fees_data[key] = st.number_input(f"{fee_name} {year} year", step=100, key=f"{fee_name}_{year}")
         if st.form_submit_button("Add Student"):
-            # compute totals / remaining
-            for year in years:
-                total = 0.0
-                for fee_name in ["Bus Fees", "Mess Fees", "Hostel Fees", "Exam Fees",
-                                "Tution Fees", "Fine", "Miscellaneous", "Course Fees", "Due Fees"]:
-                    total += float(fees_data.get(f"{fee_name} {year} year", 0.0) or 0.0)
-                fees_data[f"Total Fees {year} year"] = total
-                paid = float(fees_data.get(f"Paid Fees {year} year", 0.0) or 0.0)
-                fees_data[f"Remaining Fees {year} year"] = total - paid
             new_data = {
                 "UMIS Number": umis_no,
                 "EMIS Number": emis_no,
@@ -316,281 +348,586 @@ def add_student_page(df):
                 "First Graduate": first_graduate,
                 **fees_data
             }
-            df = pd.concat([df, pd.DataFrame([new_data])], ignore_index=True)
-            df = ensure_columns(df)
-            save_data(df)
-            st.success(f"✅ Student {name} added successfully!")
-
-def search_by_department_page(df):
+            try:
+                service().add_student(new_data)
+            except ValueError as exc:
+                st.error(f"❌ Student not added: {exc}")
+            else:
+                st.success(f"✅ Student {name} added successfully!")
+
+def bulk_import_page():
+    st.subheader("📥 Bulk Import Students")
+    st.markdown("Upload a CSV or Excel file with one student per row, using the same column names as the data file. "
+                "Total and Remaining Fees are calculated automatically.")
+    upload = st.file_uploader("Students file", type=["csv", "xlsx", "xls"])
+    if upload is None:
+        return
+    store = open_store(DATA_FILE)
+    try:
+        table = read_table(upload, filename=upload.name)
+    except Exception as exc:
+        st.error(f"❌ Could not read {upload.name}: {exc}")
+        return
+    valid, report = validate(table, store.distinct("Register Number"))
+    st.write(f"{len(table)} rows read, {len(valid)} ready to import, {report['row'].nunique()} with errors.")
+    if not report.empty:
+        st.warning("Rows with errors will be skipped:")
+        st.dataframe(report, use_container_width=True)
+    if not valid.empty:
+        st.dataframe(valid.head(50))
+        if st.button(f"Import {len(valid)} Students"):
+            store.append_students(valid)
+            st.success(f"✅ {len(valid)} students imported successfully!")
+            show_integrity_warning(store)
+
+def batch_posting_page():
+    st.subheader("🧮 Batch Fee Posting")
+    store = open_store(DATA_FILE)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        batch = st.selectbox("Batch", [ALL] + store.distinct("Batch"))
+    with col2:
+        department = st.selectbox("Department", [ALL] + store.distinct("Department"))
+    with col3:
+        year = st.selectbox("Academic Year", list(YEAR_LABELS), format_func=YEAR_LABELS.get)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        kind = st.radio("Posting", ["Charge", "Payment"])
+    with col2:
+        fee_type = st.selectbox("Fee Type", FEE_COMPONENTS)
+    with col3:
+        amount = st.number_input("Amount per Student (INR)", min_value=0.0, step=100.0)
+    kind = CHARGE if kind == "Charge" else PAYMENT
+
+    selected, table, totals = service().batch_preview(batch, department, year, fee_type, amount, kind)
+    if selected.empty:
+        st.warning("No students match the selected batch and department.")
+        return
+    st.markdown("**Preview**")
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Students", totals["students"])
+    c2.metric("Total Posted", f"₹{totals['amount']}")
+    c3.metric("Outstanding Before", f"₹{totals['outstanding_before']}")
+    c4.metric("Outstanding After", f"₹{totals['outstanding_after']}")
+    st.dataframe(table, use_container_width=True)
+    if amount > 0 and st.button(f"Post ₹{amount} {fee_type} to {totals['students']} Students"):
+        result = service().post_batch(batch, department, year, fee_type, amount, kind)
+        st.success(f"✅ Posted ₹{result['amount']} across {result['students']} students in {YEAR_LABELS[year]}!")
+        show_integrity_warning(store)
+
+def search_by_department_page():
     st.subheader("Search Students by Department")
     dept = st.text_input("Enter Department Name")
     if dept:
-        filtered = df[df["Department"].fillna("").str.lower() == dept.lower()]
-        if not filtered.empty:
-            st.dataframe(filtered)
-        else:
+        store = open_store(DATA_FILE)
+        if not show_paged(store, [("Department", EQUALS_IGNORE_CASE, dept)], "dept", student_columns()):
             st.warning(f"No students found in department: {dept}")
 
-def students_with_dues_page(df):
-    st.subheader("Students with Remaining Fees 1st year")
-    dues = df[df["Remaining Fees 1st year"] > 0]
-    st.dataframe(dues)
-    st.subheader("Students with Remaining Fees 2nd year")
-    dues = df[df["Remaining Fees 2nd year"] > 0]
-    st.dataframe(dues)
-    st.subheader("Students with Remaining Fees 3rd year")
-    dues = df[df["Remaining Fees 3rd year"] > 0]
-    st.dataframe(dues)
-    st.subheader("Students with Remaining Fees 4th year")
-    dues = df[df["Remaining Fees 4th year"] > 0]
-    st.dataframe(dues)
-
-def pay_fees_page(df):
+def students_with_dues_page():
+    store = open_store(DATA_FILE)
+    fees = service()
+    st.subheader("📊 Outstanding Fees Dashboard")
+    totals = fees.dues_totals()
+    cols = st.columns(len(totals))
+    for col, (_, row) in zip(cols, totals.iterrows()):
+        col.metric(row["Year"].upper(), f"₹{row['Outstanding']:,.0f}",
+                   f"{int(row['Students with Dues'])} students", delta_color="off")
+    scope = st.selectbox("Outstanding for", ["All years", "1st year", "2nd year", "3rd year", "4th year"])
+    scope_year = None if scope == "All years" else scope
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Batch × Department**")
+        st.dataframe(fees.dues_by_group(scope_year), use_container_width=True)
+    with col2:
+        st.markdown("**Top Debtors**")
+        st.dataframe(fees.top_debtors(10, scope_year), use_container_width=True)
+    st.markdown("**Ageing of Unpaid Charges**")
+    st.dataframe(fees.dues_ageing(), use_container_width=True)
+
+    st.markdown("---")
+    year = st.selectbox("Year", ["1st year", "2nd year", "3rd year", "4th year"])
+    st.subheader(f"Students with Remaining Fees {year}")
+    if not show_paged(store, [(f"Remaining Fees {year}", GREATER_THAN, 0)], "dues", student_columns()):
+        st.info(f"No students have remaining fees for {year}.")
+
+def analytics_page():
+    fees = service()
+    st.subheader("📈 Collection Analytics")
+    overview = fees.collection_overview()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Total Fees", f"₹{overview['Total']:,.0f}")
+    c2.metric("Collected", f"₹{overview['Paid']:,.0f}")
+    c3.metric("Outstanding", f"₹{overview['Remaining']:,.0f}")
+    c4.metric("Collection Rate", f"{overview['Collection Rate (%)']:.1f}%", f"{overview['Students']} students",
+              delta_color="off")
+
+    st.markdown("**Collection Rate**")
+    group = st.selectbox("Group by", ["Department", "Batch", "Year", "Department × Year", "Batch × Department"])
+    by = [column.strip() for column in group.split("×")]
+    rates = fees.collection_rates(by)
+    if len(by) == 1:
+        st.bar_chart(rates.set_index(by[0])["Collection Rate (%)"])
+        st.dataframe(rates, use_container_width=True)
+    else:
+        st.dataframe(rates.pivot_table(index=by[0], columns=by[1], values="Collection Rate (%)"),
+                     use_container_width=True)
+        with st.expander("Amounts"):
+            st.dataframe(rates, use_container_width=True)
+
+    st.markdown("**Fee-Type Mix**")
+    scope = st.selectbox("Fees of", ["All years"] + [f"{y} year" for y in YEARS], key="mix_year")
+    mix = fees.fee_mix(None if scope == "All years" else scope)
+    st.bar_chart(mix.set_index("Fee Type")[["Charged", "Collected"]])
+    st.dataframe(mix, use_container_width=True)
+
+    st.markdown("**Monthly Collections**")
+    split = st.selectbox("Split by", ["None", "Department", "Batch", "Year", "Fee Type"], key="monthly_by")
+    monthly = fees.monthly_collections(None if split == "None" else split)
+    if monthly.empty:
+        st.info("No dated payments yet; amounts carried over from the spreadsheet have no payment date.")
+    else:
+        st.line_chart(monthly.set_index("Month")["Collected"] if split == "None" else monthly)
+        st.dataframe(monthly, use_container_width=True)
+
+def show_receipt(receipt, receipt_pdf):
+    """On-screen receipt for a payment plus the download button for its archived PDF."""
+    st.subheader("🧾 Payment Receipt")
+    receipt_html = f"""
+      <div style="border:2px dashed #4CAF50; padding:25px; font-family:Arial; background:#f9f9f9;">
+        <div style="display:flex; align-items:center; margin-bottom:15px;">
+          <img src="data:image/jpeg;base64,{college_logo()}" width="80" style="margin-right: 20px;"/>
+          <h2 style="color:#4CAF50;">{html.escape(CONFIG.institution)}</h2>
+        </div>
+        <h3 style="text-align:center;">Fee Payment Receipt</h3>
+        <div style="display:flex; justify-content:space-between;">
+          <div>
+            <p><strong>Student Name:</strong> {receipt['name']}</p>
+            <p><strong>Reg. No:</strong> {receipt['register_number']}</p>
+            <p><strong>Department:</strong> {receipt['department']}</p>
+          </div>
+          <div>
+            <p><strong>Date:</strong> {receipt['date']}</p>
+            <p><strong>Academic Year:</strong> {receipt['academic_year']}</p>
+            <p><strong>Receipt No:</strong> {receipt['receipt_no']}</p>
+          </div>
+        </div>
+        <hr>
+        <div style="background:#e8f5e9; padding:10px; border-radius:5px; margin-bottom:15px;">
+          <h4 style="margin:0; color:#2e7d32;">Payment Details</h4>
+          <p><strong>Fee Type:</strong> {receipt['fee_type']}</p>
+          <p><strong>Amount Paid:</strong> ₹{receipt['amount']}</p>
+        </div>
+        <h4 style="color:#2e7d32;">Fee Summary</h4>
+        <p><strong>Total Fees ({receipt['academic_year']}):</strong> ₹{receipt['total']}</p>
+        <p><strong>Previously Paid ({receipt['academic_year']}):</strong> ₹{receipt['previous_paid']}</p>
+        <p><strong>Amount Paid Now:</strong> ₹{receipt['amount']}</p>
+        <p><strong>Paid (Now Total):</strong> ₹{receipt['paid']}</p>
+        <p><strong>Remaining Fees ({receipt['academic_year']}):</strong> ₹{receipt['remaining']}</p>
+        <div style="text-align:right; margin-top:20px;">
+          <p><strong>Signature</strong></p>
+          <div style="border-top:1px solid black; width:200px; display:inline-block;"></div>
+        </div>
+        <div style="text-align:center; margin-top:20px; font-style:italic; color:#666;">
+          <p>This is a computer generated receipt and does not require a physical signature.</p>
+        </div>
+      </div>
+    """
+    st.markdown(receipt_html, unsafe_allow_html=True)
+    st.download_button("📥 Download Receipt PDF", receipt_pdf, file_name=f"{receipt['receipt_no']}.pdf",
+                       mime="application/pdf")
+
+def pay_fees_page():
     st.subheader("Pay Student Fees")
-    if df.empty or df['Name'].replace('', pd.NA).dropna().empty:
+    if student_count() == 0:
         st.warning("No students available to pay fees for.")
         return
 
     # Select student
-    student_name = st.selectbox("Select Student", df["Name"].fillna("").unique().tolist())
-    student = df[df["Name"] == student_name]
+    store = open_store(DATA_FILE)
+    student = pick_student(store, "pay")
+    if student is None:
+        return
 
     if not student.empty:
         student_info = student.iloc[0]
+        student_name = student_info.get('Name', '')
         st.write("Student Info:")
         st.write(student[["Name", "Department"]])
 
-        # Year mapping
-        year_options = ["I Year", "II Year", "III Year", "IV Year"]
-        year_map = {
-            "I Year": "1st year",
-            "II Year": "2nd year",
-            "III Year": "3rd year",
-            "IV Year": "4th year"
-        }
-        selected_fee_year = st.selectbox("Select Academic Year to Pay Fees For", year_options)
-        selected_year = year_map[selected_fee_year]  # e.g. "1st year"
-        display_year_label = selected_fee_year  # keep UI label
+        selected_year = st.selectbox("Select Academic Year to Pay Fees For", list(YEAR_LABELS),
+                                     format_func=YEAR_LABELS.get)  # e.g. "1st year"
+        display_year_label = YEAR_LABELS[selected_year]  # keep UI label
 
         st.subheader("💳 Payment")
         pay_amount = st.number_input("Enter Payment Amount (INR)", min_value=0.0, step=100.0)
 
-        fee_type = st.selectbox("Select Fee Type", [
-            "Bus Fees", "Mess Fees", "Hostel Fees", "Exam Fees",
-            "Tution Fees", "Fine", "Miscellaneous", "Course Fees", "Due Fees", "General Payment"
-        ])
+        fee_type = st.selectbox("Select Fee Type", PAYMENT_TYPES)
 
         if st.button("Submit Payment"):
-            idx = student.index[0]
-
-            # ensure numeric columns exist
-            paid_col = f"Paid Fees {selected_year}"
-            remaining_col = f"Remaining Fees {selected_year}"
-            total_col = f"Total Fees {selected_year}"
-
-            # initialize if missing
-            for c in [paid_col, remaining_col, total_col]:
-                if c not in df.columns:
-                    df[c] = 0.0
-            df[paid_col] = pd.to_numeric(df[paid_col], errors='coerce').fillna(0.0)
-            df[remaining_col] = pd.to_numeric(df[remaining_col], errors='coerce').fillna(0.0)
-            df[total_col] = pd.to_numeric(df[total_col], errors='coerce').fillna(0.0)
-
-            # previous paid before update
-            previous_paid = float(df.at[idx, paid_col])
-            previous_remaining = float(df.at[idx, remaining_col])
-
-            # Update paid and remaining
-            df.at[idx, paid_col] = previous_paid + float(pay_amount)
-            df.at[idx, remaining_col] = max(previous_remaining - float(pay_amount), 0.0)
-
-            save_data(df)
-            st.success(f"💰 ₹{pay_amount} paid successfully for {student_name} in {display_year_label}!")
-
-            # ---------------------- RECEIPT ----------------------
-            st.subheader("🧾 Payment Receipt")
-            receipt_no = f"RCPT-{pd.Timestamp.now().strftime('%Y%m%d%H%M%S')}"
-            # Fee summary values
-            total_fees_now = df.at[idx, total_col]
-            paid_after = df.at[idx, paid_col]
-            remaining_after = df.at[idx, remaining_col]
-            previous_paid_display = previous_paid
-
-            receipt_html = f"""
-              <div style="border:2px dashed #4CAF50; padding:25px; font-family:Arial; background:#f9f9f9;">
-                <div style="display:flex; align-items:center; margin-bottom:15px;">
-                  <img src="data:image/jpeg;base64,{logo_base64}" width="80" style="margin-right: 20px;"/>
-                  <h2 style="color:#4CAF50;">DR.G.U.Pope College Of Engineering</h2>
-                </div>
-                <h3 style="text-align:center;">Fee Payment Receipt</h3>
-                <div style="display:flex; justify-content:space-between;">
-                  <div>
-                    <p><strong>Student Name:</strong> {student_info.get('Name','')}</p>
-                    <p><strong>Reg. No:</strong> {student_info.get('Register Number','')}</p>
-                    <p><strong>Department:</strong> {student_info.get('Department','')}</p>
-                  </div>
-                  <div>
-                    <p><strong>Date:</strong> {pd.Timestamp.now().date()}</p>
-                    <p><strong>Academic Year:</strong> {display_year_label}</p>
-                    <p><strong>Receipt No:</strong> {receipt_no}</p>
-                  </div>
-                </div>
-                <hr>
-                <div style="background:#e8f5e9; padding:10px; border-radius:5px; margin-bottom:15px;">
-                  <h4 style="margin:0; color:#2e7d32;">Payment Details</h4>
-                  <p><strong>Fee Type:</strong> {fee_type}</p>
-                  <p><strong>Amount Paid:</strong> ₹{pay_amount}</p>
-                </div>
-                <h4 style="color:#2e7d32;">Fee Summary</h4>
-                <p><strong>Total Fees ({display_year_label}):</strong> ₹{total_fees_now}</p>
-                <p><strong>Previously Paid ({display_year_label}):</strong> ₹{previous_paid_display}</p>
-                <p><strong>Amount Paid Now:</strong> ₹{pay_amount}</p>
-                <p><strong>Paid (Now Total):</strong> ₹{paid_after}</p>
-                <p><strong>Remaining Fees ({display_year_label}):</strong> ₹{remaining_after}</p>
-                <div style="text-align:right; margin-top:20px;">
-                  <p><strong>Signature</strong></p>
-                  <div style="border-top:1px solid black; width:200px; display:inline-block;"></div>
-                </div>
-                <div style="text-align:center; margin-top:20px; font-style:italic; color:#666;">
-                  <p>This is a computer generated receipt and does not require a physical signature.</p>
-                </div>
-              </div>
-            """
-            st.markdown(receipt_html, unsafe_allow_html=True)
+            try:
+                receipt, receipt_pdf = service().pay(student.index[0], selected_year, pay_amount, fee_type)
+            except ValueError as exc:
+                st.error(f"❌ Payment not recorded: {exc}")
+            else:
+                st.success(f"💰 ₹{pay_amount} paid successfully for {student_name} in {display_year_label}!")
+                show_receipt(receipt, receipt_pdf)
 
            
-         # ---------------------- TRANSFER CERTIFICATE ----------------------
+        # ---------------------- TRANSFER CERTIFICATE ----------------------
         st.subheader("📄 Transfer Certificate")
         admission_no = st.text_input("Admission No", key="tc_adm_no")
         date_of_admission = st.date_input("Date of Admission", key="tc_doa")
         date_of_leaving = st.date_input("Date of Leaving", key="tc_dol")
         reg_no = student_info.get('Register Number', '')
+        tc_key = (reg_no, admission_no, date_of_admission, date_of_leaving)
         if st.button("Generate Transfer Certificate"):
-                tc_no = f"TC-{reg_no}-{pd.Timestamp.now().strftime('%Y%m%d%H%M%S')}"
-                issue_date = pd.Timestamp.now().date().strftime("%d-%m-%Y")
-                tc_html = f"""
-                <div style="font-family:'Segoe UI', sans-serif; font-size:14px; max-width:800px;
-                        margin:auto; color:#000; line-height:1.8; border:2px solid #000; padding:30px;">
-                  <div style="display: flex; align-items: center; margin-bottom: 20px;">
-                    <img src="data:image/jpeg;base64,{logo_base64}" width="80" style="margin-right: 20px;"/>
-                    <div style="text-align: center; flex-grow: 1;">
-                      <h2 style="margin: 0;">DR.G.U.Pope College Of Engineering</h2>
-                      <h3 style="margin: 0;">(Approved by AICTE, Affiliated to Anna University)</h3>
-                      <h4 style="margin: 0;">Pope Nagar, Sawyerpuram Thoothukudi District-628251</h4>
-                      <h5 style="margin: 5px 0;">TRANSFER CERTIFICATE</h5>
-                    </div>
-                  </div>
-                  <div style="display:flex; justify-content:space-between;">
-                    <div><p><strong>TC No:</strong> {tc_no}</p><p><strong>Date:</strong> {issue_date}</p></div>
-                    <div><p><strong>Admission No:</strong> {admission_no} </p><p><strong>Roll No:</strong> {reg_no}</p></div>
-                  </div>
-                  <p><strong>1.</strong> Name: {student_info.get('Name','')}</p>
-                  <p><strong>2.</strong> Father’s Name: {student_info.get("Father's Name",'')}</p>
-                  <p><strong>3.</strong> Sex: {student_info.get('Sex','')}</p>
-                  <p><strong>4.</strong> DOB: {student_info.get('Date of Birth','')}</p>
-                  <p><strong>5.</strong> Nationality & Religion: {student_info.get('Nationality & Religion','')}</p>
-                  <p><strong>6.</strong> Community & Subcaste: {student_info.get('Community & Subcaste','')}</p>
-                  <p><strong>7.</strong> Date of Admission: {date_of_admission.strftime('%d-%m-%Y')}</p>
-                  <p><strong>8.</strong> Class and course in which the student was Admitted: {student_info.get('Department','')}</p>
-                  <p><strong>9.</strong> Class and course studied at the time of leaving : {student_info.get('Department','')}</p>
-                  <p><strong>10.</strong> Whether Qualified for Promotion to higher studies: REFER MARKSHEET</p>
-                  <p><strong>11.</strong> Date of Leaving: {date_of_leaving.strftime('%d-%m-%Y')}</p>
-                  <p><strong>12.</strong> Issue Date: {issue_date}</p>
-                  <p><strong>13.</strong> UMIS No: {student_info.get('UMIS Number','')}</p>
-                  <p><strong>14.</strong> EMIS No: {student_info.get('EMIS Number','')}</p>
-                  <p>This is to certify that <strong>{student_info.get('Name','')}</strong> has been a student of this institution and the above details are correct.</p>
-                  <div style="text-align:right; margin-top:50px;"><strong>Principal</strong></div>
-                </div>
-                """
-                st.markdown(tc_html, unsafe_allow_html=True)
-                tc_pdf = BytesIO()
-                pisa_status = pisa.CreatePDF(tc_html, dest=tc_pdf)
-                if not pisa_status.err:
-                    st.download_button("📥 Download TC as PDF", data=tc_pdf.getvalue(), file_name=f"{tc_no}.pdf", mime="application/pdf")
-                else:
-                    st.error("❌ Failed to generate TC PDF")
+            job = st.session_state.get("tc_job")
+            if job is None or job["key"] != tc_key:
+                tc_no, tc_doc, tc_pdf = service().transfer_certificate(student_info, admission_no,
+                                                                       date_of_admission, date_of_leaving)
+                st.session_state.tc_job = {"key": tc_key, "no": tc_no, "html": tc_doc, "pdf": tc_pdf}
+        job = st.session_state.get("tc_job")
+        if job is not None and job["key"] == tc_key:
+            st.markdown(job["html"], unsafe_allow_html=True)
+            show_pdf_job(job["pdf"], "📥 Download TC as PDF", f"{job['no']}.pdf", "❌ Failed to generate TC PDF", "tc")
 
         # ---------------------- CONDUCT CERTIFICATE ----------------------
         st.subheader("📜 Conduct Certificate")
         title = st.radio("Student Title:", ["Selvan", "Selvi"])
         period_from = st.date_input("Conduct Period: From", key="cc_from")
         period_to = st.date_input("Conduct Period: To", key="cc_to")
+        cc_key = (reg_no, title, period_from, period_to)
         if st.button("Generate Conduct Certificate"):
-                cc_no = f"CC-{reg_no}-{pd.Timestamp.now().strftime('%Y%m%d%H%M%S')}"
-                issue_date = pd.Timestamp.now().date().strftime("%d-%m-%Y")
-                from_str = period_from.strftime("%d-%m-%Y")
-                to_str = period_to.strftime("%d-%m-%Y")
-                conduct_html = f"""
-                <div style="font-family:Arial, sans-serif; font-size:18px; max-width:800px;
-                        margin:auto; color:#000; line-height:1.8; border:2px solid #000; padding:30px;">
-                  <div style="display: flex; align-items: center; margin-bottom: 20px;">
-                    <img src="data:image/jpeg;base64,{logo_base64}" width="80" style="margin-right: 20px;"/>
-                    <div style="text-align: center; flex-grow: 1; font-size:10px;">
-                      <h2 style="margin: 0;">DR.G.U.Pope College Of Engineering</h2>
-                      <h4 style="margin: 0;">Pope Nagar, Sawyerpuram-628251, Thoothukudi District</h4>
-                      <h5 style="margin: 5px 0;">CONDUCT CERTIFICATE</h5>
-                    </div>
-                  </div>
-                  <div style="display:flex; justify-content:space-between;">
-                    <div><strong>Roll No:</strong> {reg_no}</div>
-                    <div><strong>C.C. No:</strong> {cc_no}</div>
-                  </div>
-                  <p>This is to certify that {title} <strong>{student_info.get('Name','')}</strong> was a student of this college in the <strong>{student_info.get('Department','')}</strong> branch during <strong>{from_str} to {to_str}</strong>.</p>
-                  <p>His/Her conduct and character were found to be <strong>Good</strong>.</p>
-                  <div style="display:flex; justify-content:space-between; margin-top:50px;">
-                    <div><strong>Date:</strong> {issue_date}</div>
-                    <div style="text-align:right;"><strong>Principal</strong></div>
-                  </div>
-                </div>
-                """
-                st.markdown(conduct_html, unsafe_allow_html=True)
-                cc_pdf = BytesIO()
-                pisa_status = pisa.CreatePDF(conduct_html, dest=cc_pdf)
-                if not pisa_status.err:
-                    st.download_button("📥 Download CC as PDF", data=cc_pdf.getvalue(), file_name=f"{cc_no}.pdf", mime="application/pdf")
-                else:
-                    st.error("❌ Failed to generate CC PDF")
+            job = st.session_state.get("cc_job")
+            if job is None or job["key"] != cc_key:
+                cc_no, cc_doc, cc_pdf = service().conduct_certificate(student_info, title, period_from, period_to)
+                st.session_state.cc_job = {"key": cc_key, "no": cc_no, "html": cc_doc, "pdf": cc_pdf}
+        job = st.session_state.get("cc_job")
+        if job is not None and job["key"] == cc_key:
+            st.markdown(job["html"], unsafe_allow_html=True)
+            show_pdf_job(job["pdf"], "📥 Download CC as PDF", f"{job['no']}.pdf", "❌ Failed to generate CC PDF", "cc")
+
+def certificates_page():
+    st.subheader("🎓 Batch Certificates")
+    store = open_store(DATA_FILE)
+    batch = st.selectbox("Batch", store.distinct("Batch"))
+    kind = st.radio("Certificate", ["Transfer Certificate", "Conduct Certificate"])
+    if kind == "Transfer Certificate":
+        date_of_admission = st.date_input("Date of Admission", key="batch_doa")
+        date_of_leaving = st.date_input("Date of Leaving", key="batch_dol")
+        options = {"admission_no": "", "date_of_admission": date_of_admission, "date_of_leaving": date_of_leaving}
+    else:
+        title = st.radio("Student Title:", ["Selvan", "Selvi"], key="batch_title")
+        period_from = st.date_input("Conduct Period: From", key="batch_from")
+        period_to = st.date_input("Conduct Period: To", key="batch_to")
+        options = {"title": title, "period_from": period_from, "period_to": period_to}
+    count = store.count([("Batch", EQUALS, batch)])
+    st.write(f"{count} students in batch {batch}.")
+    kind_code = TC if kind == "Transfer Certificate" else CC
+    if count and st.button(f"Generate {count} {kind}s"):
+        _, job = service().batch_certificates(batch, kind_code, **options)
+        st.session_state.batch_cert_job = {"name": f"{kind_code}-{batch}.zip", "zip": job}
+    job = st.session_state.get("batch_cert_job")
+    if job is not None:
+        future = job["zip"]
+        if not future.done():
+            st.info("⏳ Certificates are being generated in the background…")
+            st.button("Refresh", key="batch_cert_refresh")
+        elif future.exception() is not None:
+            st.error(f"❌ Failed to generate certificates: {future.exception()}")
+        else:
+            st.download_button("📥 Download ZIP", data=future.result(), file_name=job["name"],
+                               mime="application/zip")
+
+def reports_page():
+    st.subheader("🗂️ Fee Statements & Dues Letters")
+    store = open_store(DATA_FILE)
+    col1, col2 = st.columns(2)
+    with col1:
+        batch = st.selectbox("Batch", [ALL] + store.distinct("Batch"), key="report_batch")
+        kind = st.radio("Report", ["Fee Statements", "Dues Letters"])
+    with col2:
+        department = st.selectbox("Department", [ALL] + store.distinct("Department"), key="report_dept")
+        fmt = st.radio("Format", ["PDF (zip)", "Excel workbook"])
+    kind = STATEMENT if kind == "Fee Statements" else DUES_LETTER
+    fmt = PDF if fmt == "PDF (zip)" else XLSX
+    due_date = st.date_input("Pay by", value=pd.Timestamp.now().date() + pd.Timedelta(days=DUE_DAYS),
+                             disabled=kind != DUES_LETTER)
+    st.caption("Dues letters only go to students with outstanding fees. For scheduled runs use "
+               "`python reports.py <data file> --help`.")
+    if st.button("Generate Report"):
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        name = f"{kind}-{batch}-{department}-{pd.Timestamp.now():%Y%m%d-%H%M%S}.{'zip' if fmt == PDF else 'xlsx'}"
+        output = os.path.join(REPORTS_DIR, name.replace("/", "_"))
+        st.session_state.report_job = {"name": os.path.basename(output), "future": submit_report(
+            store, output, kind=kind, fmt=fmt, batch=batch, department=department, logo_path=LOGO_PATH,
+            due_date=due_date)}
+    job = st.session_state.get("report_job")
+    if job is not None:
+        future = job["future"]
+        if not future.done():
+            st.info("⏳ The report is being generated in the background…")
+            st.button("Refresh", key="report_refresh")
+        elif future.exception() is not None:
+            st.error(f"❌ Failed to generate the report: {future.exception()}")
+        else:
+            result = future.result()
+            st.success(f"✅ {result['students']} students in {job['name']}")
+            with open(result["output"], "rb") as f:
+                st.download_button("📥 Download Report", f.read(), file_name=job["name"])
+
+def audit_page():
+    st.subheader("🕵️ Audit Log")
+    store = open_store(DATA_FILE)
+    log = audit_log(store)
+    col1, col2 = st.columns(2)
+    with col1:
+        since = st.date_input("From", value=pd.Timestamp.now().date() - pd.Timedelta(days=7), key="audit_from")
+    with col2:
+        until = st.date_input("To", value=pd.Timestamp.now().date(), key="audit_to")
+    st.markdown("**Student (optional)**")
+    student = pick_student(store, "audit")
+    reg = student.iloc[0]["Register Number"] if student is not None and not student.empty else None
+    history = log.history(reg, pd.Timestamp(since), pd.Timestamp(until) + pd.Timedelta(days=1), limit=2000)
+    if history.empty:
+        st.caption("No changes logged in this period.")
+    else:
+        st.caption(f"Latest {len(history)} changes")
+        st.dataframe(history, use_container_width=True, hide_index=True)
+
+    if reg is not None:
+        st.markdown("---")
+        st.subheader("⏪ Balance on a Past Date")
+        col1, col2 = st.columns(2)
+        with col1:
+            day = st.date_input("Date", key="audit_day")
+        with col2:
+            at = st.time_input("Time", value=pd.Timestamp("23:59").time(), key="audit_time")
+        try:
+            st.dataframe(log.balance_at(reg, pd.Timestamp.combine(day, at)), use_container_width=True,
+                         hide_index=True)
+        except (KeyError, ValueError) as exc:
+            st.info(exc.args[0])
+
+def data_check_page():
+    st.subheader("🩺 Fee Data Check")
+    store = open_store(DATA_FILE)
+    report = integrity_report(store)
+    if report.empty:
+        st.success("✅ Every Total and Remaining Fees value matches its fee components.")
+        return
+    st.warning(f"{len(report)} issues in {report['row'].nunique()} students.")
+    st.dataframe(report, use_container_width=True, hide_index=True)
+    st.caption("Repair recomputes Total and Remaining Fees from the components. Credit balances are "
+               "reported only; they need a refund or a charge.")
+    if st.button("Repair Totals"):
+        changed = repair(store)
+        st.success(f"✅ Recomputed totals for {changed} students.")
+        st.rerun()
+
+def show_integrity_warning(store):
+    """Point to the Fee Data Check page if the last write left inconsistent totals."""
+    report = integrity_report(store)
+    if not report.empty:
+        st.warning(f"⚠️ {len(report)} fee total issues found; see Fee Data Check.")
+
+def reconcile_page():
+    st.subheader("🏦 UPI Reconciliation")
+    st.markdown("Upload a bank / UPI statement (CSV). Credits carrying a student's payment reference are "
+                "posted automatically; everything else is queued for review below.")
+    store = open_store(DATA_FILE)
+    upload = st.file_uploader("Statement file", type=["csv"])
+    if upload is not None and st.button("Reconcile Statement"):
+        try:
+            summary = reconcile(store, upload)
+        except ValueError as exc:
+            st.error(f"❌ Could not read {upload.name}: {exc}")
+        else:
+            st.success(f"✅ Posted {summary['matched']} payments (₹{summary['matched_amount']:,.2f}) from "
+                       f"{summary['credits']} credits; {summary['already_posted']} were already posted and "
+                       f"{summary['review']} were queued for review.")
+
+    st.markdown("---")
+    st.subheader("📝 Review Queue")
+    queue = review_queue(store)
+    items = queue.items()
+    if items.empty:
+        st.caption("Nothing to review.")
+        return
+    st.dataframe(items, use_container_width=True, hide_index=True)
+    txn_id = st.selectbox("Statement line", items["txn_id"], key="review_txn")
+    item = items[items["txn_id"] == txn_id].iloc[0]
+    st.write(f"₹{item['amount']:,.2f} on {item['txn_date']} — {item['reason']}")
+    student = pick_student(store, "review")
+    year = st.selectbox("Academic Year", [f"{y} year" for y in YEARS], key="review_year",
+                        index=YEARS.index(item["suggested_year"].split()[0]) if item["suggested_year"] else 0)
+    col1, col2 = st.columns(2)
+    with col1:
+        if student is not None and not student.empty and st.button("Post to Student"):
+            if post_review_item(store, item, student.index[0], year):
+                st.success(f"✅ Posted ₹{item['amount']:,.2f} to {student.iloc[0]['Name']} for {year}.")
+                st.rerun()
+            else:
+                st.warning("This line was already posted or is being posted by someone else.")
+    with col2:
+        if st.button("Dismiss Line"):
+            queue.resolve(txn_id, DISMISSED)
+            st.rerun()
 
 def online_payment_page():
     st.subheader("📲 Online UPI Payment")
-    upi_id = "devimuthumari388@oksbi"  # change if needed
-    name = "DR.G.U.Pope College"
+    upi_id, name = CONFIG.upi_id, CONFIG.payee
+    if not upi_id:
+        st.warning("No UPI id is configured for this deployment (payee.upi_id in fms.ini, or FMS_PAYEE_UPI_ID).")
+        return
     amount = st.number_input("Enter Amount to Pay (INR)", min_value=1, step=1)
     if amount:
-        upi_link = f"upi://pay?pa={upi_id}&pn={name}&am={amount}&cu=INR"
-        qr = segno.make(upi_link)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp:
-            buffer = BytesIO()
-            qr.save(buffer, kind="png")
-            buffer.seek(0)
-            st.image(tmp.name, caption="Scan to Pay via UPI App", use_column_width=False)
-        st.markdown(f"Or click to pay: [Pay ₹{amount}]({upi_link})")
+        st.image(qr_png(upi_id, name, amount), caption="Scan to Pay via UPI App", use_column_width=False)
+        st.markdown(f"Or click to pay: [Pay ₹{amount}]({upi_link(upi_id, name, amount)})")
+
+    store = open_store(DATA_FILE)
+    st.markdown("---")
+    st.subheader("👤 Student Payment Link")
+    year = st.selectbox("Academic Year", [f"{y} year" for y in YEARS], key="upi_year")
+    student = pick_student(store, "upi")
+    if student is not None and not student.empty:
+        payment = student_payments(student, year)
+        if payment.empty:
+            st.info(f"No dues for {year}.")
+        else:
+            due, reference = payment["Amount"].iloc[0], payment["Reference"].iloc[0]
+            st.image(qr_png(upi_id, name, due, reference),
+                     caption=f"₹{due:,.2f} due for {year} — reference {reference}", use_column_width=False)
+            st.markdown(f"[Pay ₹{due:,.2f}]({upi_link(upi_id, name, due, reference)})")
+
+    st.markdown("---")
+    st.subheader("🗂️ Batch QR Sheet")
+    batch = st.selectbox("Batch", store.distinct("Batch"), key="upi_batch")
+    payments = student_payments(store.find("Batch", batch), year)
+    st.write(f"{len(payments)} students in batch {batch} have dues for {year}.")
+    if not payments.empty and st.button("Generate QR Sheet"):
+        sheet = qr_sheet_pdf(payments, upi_id, name, title=f"{name} — Batch {batch}, {year} fees")
+        st.download_button("📥 Download QR Sheet", data=sheet, file_name=f"UPI-{batch}-{year}.pdf",
+                           mime="application/pdf")
+
+def metrics_page():
+    st.subheader("⏱️ Metrics")
+    st.caption("Latencies in milliseconds over the last 1000 measurements of each metric, for every session "
+               "served by this process since it started.")
+    summary = metrics.summary()
+    if summary.empty:
+        st.info("Nothing measured yet.")
+    else:
+        pages = summary[summary["metric"] == "page_render"]
+        if not pages.empty:
+            st.markdown("**Page render time (p90)**")
+            st.bar_chart(pages.assign(page=pages["labels"].str.removeprefix("page=")).set_index("page")["p90_ms"])
+        st.dataframe(summary.round(1), use_container_width=True, hide_index=True)
+    gauges = metrics.gauges()
+    if not gauges.empty:
+        st.dataframe(gauges, use_container_width=True, hide_index=True)
+
+    st.markdown("---")
+    st.subheader("📤 Export")
+    st.download_button("📥 Download (Prometheus text)", data=metrics.prometheus_text(),
+                       file_name="fms.metrics.prom", mime="text/plain")
+    if st.button("Write Prometheus File"):
+        metrics.write_prometheus(METRICS_PROM_FILE)
+        st.success(f"✅ Wrote {METRICS_PROM_FILE}")
+    log = st.checkbox("Log every measurement to a JSONL file", value=metrics.sink is not None)
+    metrics.set_sink(METRICS_JSONL_FILE if log else None)
+    if log:
+        st.caption(f"Appending to {METRICS_JSONL_FILE}")
+    if st.button("Reset Metrics"):
+        metrics.reset()
+        st.rerun()
+
+def users_page():
+    st.subheader("👥 Users")
+    users = credential_store(CREDENTIALS_FILE)
+    st.dataframe(users.users(), use_container_width=True, hide_index=True)
+    st.caption("Viewers can look up students and dues, cashiers can also take payments and issue "
+               "certificates, admins can use every page.")
+
+    st.markdown("---")
+    st.subheader("➕ Add or Update User")
+    with st.form("user_form", clear_on_submit=True):
+        username = st.text_input("Username")
+        role = st.selectbox("Role", ROLES)
+        password = st.text_input("Password (leave empty to keep the current one)", type="password")
+        if st.form_submit_button("Save User"):
+            try:
+                users.set_user(username, password or None, role)
+            except ValueError as exc:
+                st.error(f"❌ {exc}")
+            else:
+                st.success(f"✅ Saved {username}.")
+                st.rerun()
+
+    st.subheader("➖ Remove User")
+    others = [u for u in users.users()["username"] if u != st.session_state.get("user")]
+    if others:
+        username = st.selectbox("User", others, key="remove_user")
+        if st.button("Remove User"):
+            users.remove_user(username)
+            st.rerun()
 
 # ---------------------- MAIN APP ----------------------
+# Menu entries with the lowest role allowed to open them
+MENU = [
+    ("View Students", VIEWER), ("Search Student", VIEWER), ("Add Student", CASHIER), ("Bulk Import", ADMIN),
+    ("Search by Department", VIEWER), ("Students with Dues", VIEWER), ("Analytics", VIEWER), ("Pay Fees", CASHIER),
+    ("Batch Fee Posting", ADMIN), ("Certificates", CASHIER), ("Online Payment", CASHIER),
+    ("UPI Reconciliation", ADMIN), ("Fee Data Check", ADMIN), ("Reports", ADMIN), ("Audit Log", ADMIN), ("Metrics", ADMIN), ("Users", ADMIN),
+]
 def main_app():
     display_logo()
-    df = load_data()
     st.title("FEES MANAGEMENT SYSTEM")
     st.title("STUDENTS DETAILS")
-    menu = [
-        "View Students", "Search Student", "Add Student", "Search by Department",
-        "Students with Dues", "Pay Fees", "Online Payment"
-    ]
+    role = st.session_state.role
+    menu = [entry for entry, required in MENU if allows(role, required)]
+    st.sidebar.caption(f"Signed in as {st.session_state.get('user', '')} ({role})")
+    if st.sidebar.button("Logout"):
+        st.session_state.logged_in = False
+        st.session_state.role = None
+        st.session_state.page = "home"
+        st.rerun()
     choice = st.sidebar.selectbox("Menu", menu)
-    if choice == "View Students":
-        view_students_page(df)
-    elif choice == "Search Student":
-        search_student_page(df)
-    elif choice == "Add Student":
-        add_student_page(df)
-    elif choice == "Search by Department":
-        search_by_department_page(df)
-    elif choice == "Students with Dues":
-        students_with_dues_page(df)
-    elif choice == "Pay Fees":
-        pay_fees_page(df)
-    elif choice == "Online Payment":
-        online_payment_page()
+    with timed("page_render", page=choice), audit_context(user=st.session_state.get("user"), action=choice):
+        if choice == "View Students":
+            view_students_page()
+        elif choice == "Search Student":
+            search_student_page()
+        elif choice == "Add Student":
+            add_student_page()
+        elif choice == "Bulk Import":
+            bulk_import_page()
+        elif choice == "Search by Department":
+            search_by_department_page()
+        elif choice == "Students with Dues":
+            students_with_dues_page()
+        elif choice == "Analytics":
+            analytics_page()
+        elif choice == "Pay Fees":
+            pay_fees_page()
+        elif choice == "Batch Fee Posting":
+            batch_posting_page()
+        elif choice == "Certificates":
+            certificates_page()
+        elif choice == "Online Payment":
+            online_payment_page()
+        elif choice == "UPI Reconciliation":
+            reconcile_page()
+        elif choice == "Fee Data Check":
+            data_check_page()
+        elif choice == "Audit Log":
+            audit_page()
+        elif choice == "Reports":
+            reports_page()
+        elif choice == "Metrics":
+            metrics_page()
+        elif choice == "Users":
+            users_page()
 
 # ---------------------- ROUTING ----------------------
 if st.session_state.page == "home":
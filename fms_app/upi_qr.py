@@ -0,0 +1,112 @@
+# upi_qr.py
+"""UPI payment links and QR codes, rendered in memory and cached.
+
+``qr_png`` encodes a UPI link straight to PNG bytes (no temporary files)
+and keeps the most recent codes in an LRU cache keyed by (UPI id, payee,
+amount, reference), so reruns of the payment page are lookups. Per-student
+links carry a reference id built from the register number and year, which
+lets collection desks print a QR sheet for a whole batch with
+``qr_sheet_pdf``.
+"""
+import re
+from functools import lru_cache
+from io import BytesIO
+from urllib.parse import quote
+
+import pandas as pd
+import segno
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from datastore import YEARS
+from metrics import timed
+
+QR_CACHE_SIZE = 512
+QR_SCALE = 5
+
+# QR sheet layout (A4 portrait)
+SHEET_COLUMNS = 3
+SHEET_ROWS = 4
+QR_SIZE = 45 * mm
+
+
+def _amount(amount):
+    return f"{float(amount):.2f}"
+
+
+def payment_reference(register_number, year):
+    """Reference id embedded in a student's payment link, e.g. FMS2021CS001Y2 for 2nd year."""
+    reg = re.sub(r"[^0-9A-Za-z]", "", str(register_number)).upper()
+    return f"FMS{reg}Y{YEARS.index(year.split()[0]) + 1}"
+
+
+def upi_link(upi_id, payee, amount, reference="", note=""):
+    """upi://pay link for amount (INR) to upi_id; reference/note are optional."""
+    params = [("pa", upi_id), ("pn", payee), ("am", _amount(amount)), ("cu", "INR")]
+    if reference:
+        params.append(("tr", reference))
+    if note:
+        params.append(("tn", note))
+    return "upi://pay?" + "&".join(f"{k}={quote(str(v), safe='@.')}" for k, v in params)
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+@timed("qr_render")
+def _qr_png(upi_id, payee, amount, reference, note, scale):
+    buffer = BytesIO()
+    segno.make(upi_link(upi_id, payee, amount, reference, note), error="m").save(
+        buffer, kind="png", scale=scale, border=2)
+    return buffer.getvalue()
+
+
+def qr_png(upi_id, payee, amount, reference="", note="", scale=QR_SCALE):
+    """PNG bytes of the QR code for upi_link(...), cached by its arguments."""
+    return _qr_png(upi_id, payee, _amount(amount), reference, note, scale)
+
+
+def student_payments(students, year):
+    """One row per student with dues for year: Name, Register Number, Amount, Reference."""
+    due = students[f"Remaining Fees {year}"].astype(float)
+    students = students[due > 0]
+    return pd.DataFrame({
+        "Name": students["Name"].fillna("").astype(str),
+        "Register Number": students["Register Number"].fillna("").astype(str),
+        "Amount": due[due > 0],
+        "Reference": [payment_reference(reg, year) for reg in students["Register Number"].fillna("")],
+    })
+
+
+@timed("pdf_render", kind="qr_sheet")
+def qr_sheet_pdf(payments, upi_id, payee, title=""):
+    """A4 PDF with one labelled QR code per row of payments (see student_payments)."""
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    cell_w = (width - 20 * mm) / SHEET_COLUMNS
+    cell_h = (height - 30 * mm) / SHEET_ROWS
+    per_page = SHEET_COLUMNS * SHEET_ROWS
+    rows = payments[["Name", "Register Number", "Amount", "Reference"]].itertuples(index=False, name=None)
+    for i, (name, reg, amount, reference) in enumerate(rows):
+        slot = i % per_page
+        if slot == 0:
+            if i:
+                pdf.showPage()
+            pdf.setFont("Helvetica-Bold", 12)
+            pdf.drawCentredString(width / 2, height - 12 * mm, title or payee)
+        x = 10 * mm + (slot % SHEET_COLUMNS) * cell_w
+        y = height - 20 * mm - (slot // SHEET_COLUMNS + 1) * cell_h
+        png = qr_png(upi_id, payee, amount, reference)
+        pdf.drawImage(ImageReader(BytesIO(png)), x + (cell_w - QR_SIZE) / 2, y + 18 * mm,
+                      width=QR_SIZE, height=QR_SIZE)
+        pdf.setFont("Helvetica-Bold", 9)
+        pdf.drawCentredString(x + cell_w / 2, y + 13 * mm, name[:32])
+        pdf.setFont("Helvetica", 8.5)
+        pdf.drawCentredString(x + cell_w / 2, y + 8.5 * mm, f"Reg. {reg}   Rs. {amount:,.2f}")
+        pdf.drawCentredString(x + cell_w / 2, y + 4 * mm, f"Ref {reference}")
+    if payments.empty:
+        pdf.drawString(20 * mm, height - 20 * mm, "No students with dues.")
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
@@ -0,0 +1,26 @@
+# conftest.py
+"""Shared fixtures. The app modules import each other as top-level modules
+(``streamlit run fms_app/tttt.py``), so fms_app goes on sys.path."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fms_app"))
+
+from benchmark import synthetic_students  # noqa: E402
+from storage import open_store  # noqa: E402
+
+
+@pytest.fixture
+def students():
+    """A small synthetic student frame (see benchmark.synthetic_students)."""
+    return synthetic_students(30, seed=7)
+
+
+@pytest.fixture(params=["abi.xlsx", "abi.db"], ids=["journal", "sqlite"])
+def store(request, tmp_path, students):
+    """The process-wide store of a fresh data file holding students, on both backends."""
+    store = open_store(str(tmp_path / request.param))
+    store.save_frame(students)
+    return store
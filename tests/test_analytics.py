@@ -0,0 +1,73 @@
+# test_analytics.py
+import pandas as pd
+import pytest
+
+from analytics import (analytics, collection_rates, collections, fee_charges, fee_mix, monthly_collections,
+                       year_totals)
+from ledger import OPENING_BALANCE
+from storage import open_store
+
+
+def test_collection_rates_by_department(students):
+    rates = collection_rates(year_totals(students)).set_index("Department")
+    for department, group in students.groupby("Department"):
+        total = sum(group[f"Total Fees {y} year"].sum() for y in ("1st", "2nd", "3rd", "4th"))
+        paid = sum(group[f"Paid Fees {y} year"].sum() for y in ("1st", "2nd", "3rd", "4th"))
+        assert rates.at[department, "Total"] == pytest.approx(total)
+        assert rates.at[department, "Collection Rate (%)"] == pytest.approx(round(paid / total * 100, 1))
+    with pytest.raises(ValueError):
+        collection_rates(year_totals(students), by=["Name"])
+
+
+def test_fee_charges_sum_to_the_totals(students):
+    charges = fee_charges(students)
+    assert charges["1st year"].sum() == pytest.approx(students["Total Fees 1st year"].sum())
+
+
+def _payments(rows):
+    return pd.DataFrame(rows, columns=["register_number", "year", "fee_type", "amount", "kind", "ts", "receipt_no"])
+
+
+def test_collections_and_monthly_figures(students):
+    reg = students.at[0, "Register Number"]
+    payments = _payments([
+        (reg, "1st year", OPENING_BALANCE, 999.0, "payment", "2026-01-01T00:00:00", ""),
+        (reg, "1st year", "Exam Fees", 100.0, "payment", "2026-01-10T00:00:00", "R-1"),
+        (reg, "1st year", "Tution Fees", 300.0, "payment", "2026-03-05T00:00:00", "R-2"),
+        ("UNKNOWN", "2nd year", "Exam Fees", 50.0, "payment", "2026-03-09T00:00:00", "R-3"),
+    ])
+    collected = collections(payments, students)
+    assert list(collected["Amount"]) == [100.0, 300.0, 50.0]  # no opening balance
+    assert collected["Department"].iloc[0] == students.at[0, "Department"]
+    assert collected["Department"].iloc[2] == ""
+
+    monthly = monthly_collections(collected)
+    assert list(monthly["Month"]) == ["2026-01", "2026-02", "2026-03"]
+    assert list(monthly["Collected"]) == [100.0, 0.0, 350.0]
+    assert monthly["Change (%)"].iloc[1] == -100.0
+    by_year = monthly_collections(collected, by="Year")
+    assert by_year.loc["2026-03", "2nd year"] == 50.0
+
+    mix = fee_mix(fee_charges(students), collected, "1st year").set_index("Fee Type")
+    assert mix.at["Exam Fees", "Collected"] == 100.0
+    assert mix["Charged (%)"].sum() == pytest.approx(100.0, abs=0.5)
+
+
+def test_dashboard_is_cached_per_data_version(store):
+    dashboard = analytics(store)
+    first = dashboard.collection_rates(["Batch", "Year"])
+    assert dashboard.collection_rates(["Batch", "Year"]) is first
+    before = dashboard.overview()
+    store.record_payment(0, "1st year", 100.0, fee_type="Exam Fees", receipt_no="R-1")
+    after = analytics(store).overview()
+    assert after["Paid"] - before["Paid"] == pytest.approx(100.0)
+    assert analytics(store).monthly_collections()["Collected"].sum() == pytest.approx(100.0)
+
+
+@pytest.mark.parametrize("name", ["abi.xlsx", "abi.db"])
+def test_empty_store_has_zero_rates(tmp_path, name):
+    dashboard = analytics(open_store(str(tmp_path / name)))
+    assert dashboard.overview() == {"Students": 0, "Total": 0.0, "Paid": 0.0, "Remaining": 0.0,
+                                    "Collection Rate (%)": 0.0}
+    assert dashboard.collection_rates().empty
+    assert dashboard.fee_mix().empty and dashboard.monthly_collections().empty
@@ -0,0 +1,137 @@
+# test_api.py
+import json
+import threading
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+
+import pytest
+
+from api import MAX_LIMIT, make_server
+
+
+@contextmanager
+def _serve(data_file):
+    """Base URL of an API server over data_file (port picked by the OS)."""
+    server = make_server(data_file, port=0)
+    server.RequestHandlerClass.log_message = lambda *args: None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def api(store):
+    """Base URL of an API server over the store's data file."""
+    with _serve(store.data_file) as url:
+        yield url
+
+
+def _request(url, body=None):
+    data = None if body is None else json.dumps(body).encode("utf-8")
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.read()
+
+
+def _json(url, body=None):
+    status, payload = _request(url, body)
+    return status, json.loads(payload)
+
+
+def test_student_lookup(api, store):
+    reg = store.rows([0]).iloc[0]["Register Number"]
+    status, student = _json(f"{api}/students/{reg}")
+    assert status == 200 and student["Register Number"] == reg
+    status, error = _json(f"{api}/students/NOPE")
+    assert status == 404 and "NOPE" in error["error"]
+
+
+def test_add_student_rejects_unknown_columns(api, store):
+    columns = list(store.page(limit=0).columns)
+    status, error = _json(f"{api}/students", {"Register Number": "NEW1", "Name": "New", "Shoe Size": 9})
+    assert status == 400 and "Shoe Size" in error["error"]
+    assert list(store.page(limit=0).columns) == columns
+    assert store.find("Register Number", "NEW1").empty
+
+
+def test_add_student(api, store):
+    status, record = _json(f"{api}/students", {"Register Number": "NEW2", "Name": "New",
+                                               "Tution Fees 1st year": 1000})
+    assert status == 201 and record["Total Fees 1st year"] == 1000
+    assert len(store.find("Register Number", "NEW2")) == 1
+
+
+def test_payment_validation(api, store):
+    reg = store.rows([0]).iloc[0]["Register Number"]
+    status, _ = _json(f"{api}/payments", {"register_number": reg, "year": "5th year", "amount": 10})
+    assert status == 400
+    status, _ = _json(f"{api}/payments", {"register_number": reg, "year": "1st year", "amount": -10})
+    assert status == 400
+    status, _ = _json(f"{api}/payments", {"register_number": "NOPE", "year": "1st year", "amount": 10})
+    assert status == 404
+
+
+def test_certificate_kind_is_validated(api, store):
+    reg = store.rows([0]).iloc[0]["Register Number"]
+    status, error = _json(f"{api}/certificates", {"kind": "XX", "register_number": reg})
+    assert status == 400 and "kind" in error["error"]
+
+
+def test_unexpected_errors_are_500(api, monkeypatch):
+    from service import FeeService
+
+    def broken(self):
+        raise KeyError("a bug, not a missing student")
+    monkeypatch.setattr(FeeService, "dues_totals", broken)
+    status, error = _json(f"{api}/dues")
+    assert status == 500 and error == {"error": "internal server error"}
+    assert _json(f"{api}/health")[0] == 200
+
+
+def test_bad_json_and_unknown_route(api):
+    request = urllib.request.Request(f"{api}/payments", data=b"{not json", method="POST")
+    with pytest.raises(urllib.error.HTTPError) as exc:
+        urllib.request.urlopen(request, timeout=30)
+    assert exc.value.code == 400
+    assert _json(f"{api}/nowhere")[0] == 404
+
+
+def test_paging_parameters_are_bounded(api, store, monkeypatch):
+    status, body = _json(f"{api}/students?offset=0&limit=0")
+    assert status == 200 and len(body["students"]) == 1
+    status, body = _json(f"{api}/students?limit=3&offset=28")
+    assert status == 200 and body["total"] == 30 and len(body["students"]) == 2
+    for query in ("offset=-1", "limit=-5", "limit=ten"):
+        status, error = _json(f"{api}/students?{query}")
+        assert status == 400 and query.split("=")[0] in error["error"]
+    assert _json(f"{api}/dues/students?year=1st%20year&offset=-1")[0] == 400
+
+    asked = []
+    monkeypatch.setattr(type(store), "page", lambda self, filters=(), offset=0, limit=None, columns=None:
+                        asked.append(limit) or store.rows([]))
+    _json(f"{api}/students?limit=1000000")
+    assert asked == [MAX_LIMIT]
+
+
+def _reject_constant(name):
+    raise ValueError(f"{name} is not valid JSON")
+
+
+@pytest.mark.parametrize("name", ["abi.xlsx", "abi.db"])
+def test_analytics_of_an_empty_store_is_valid_json(tmp_path, name):
+    with _serve(str(tmp_path / name)) as url:
+        for path in ("/analytics", "/analytics/rates?by=Department,Year", "/analytics/fee-mix",
+                     "/analytics/monthly"):
+            status, payload = _request(url + path)
+            assert status == 200
+            json.loads(payload, parse_constant=_reject_constant)
+        status, overview = _json(url + "/analytics")
+        assert overview["Collection Rate (%)"] == 0.0
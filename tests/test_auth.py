@@ -0,0 +1,83 @@
+# test_auth.py
+import pandas as pd
+import pytest
+
+import auth
+from auth import ADMIN, CASHIER, VIEWER, CredentialStore, allows, main
+
+
+def test_roles_are_ordered():
+    assert allows(ADMIN, VIEWER) and allows(ADMIN, ADMIN) and allows(CASHIER, VIEWER)
+    assert not allows(VIEWER, CASHIER) and not allows(CASHIER, ADMIN)
+    assert not allows(None, VIEWER) and not allows("root", VIEWER)
+
+
+@pytest.fixture
+def users(tmp_path):
+    users = CredentialStore(str(tmp_path / "credentials.csv"))
+    users.set_user("alice", "correct horse", CASHIER)
+    return users
+
+
+def test_authenticate_returns_the_role(users):
+    assert users.authenticate("alice", "correct horse") == CASHIER
+    assert users.authenticate(" alice ", "correct horse") == CASHIER
+    assert users.authenticate("alice", "wrong password") is None
+    assert users.authenticate("bob", "correct horse") is None
+
+
+def test_passwords_are_not_stored(users):
+    with open(users.path, encoding="utf-8") as f:
+        text = f.read()
+    assert "correct horse" not in text and "pbkdf2_sha256$" in text
+
+
+def test_set_user_validates(users):
+    with pytest.raises(ValueError):
+        users.set_user("bob", "short")
+    with pytest.raises(ValueError):
+        users.set_user("bob", "long enough", role="root")
+    with pytest.raises(ValueError):
+        users.set_user("bob")  # a new user needs a password
+    users.set_user("alice", role=ADMIN)
+    assert users.authenticate("alice", "correct horse") == ADMIN
+
+
+def test_plaintext_file_is_converted_to_admins(tmp_path):
+    path = str(tmp_path / "credentials.csv")
+    pd.DataFrame({"username": ["admin"], "password": ["secret123"]}).to_csv(path, index=False)
+    users = CredentialStore(path)
+    assert users.authenticate("admin", "secret123") == ADMIN
+    assert "secret123" not in open(path, encoding="utf-8").read()
+    assert list(users.users()["role"]) == [ADMIN]
+
+
+def test_another_process_writing_the_file_is_picked_up(users):
+    CredentialStore(users.path).set_user("carol", "another one", VIEWER)
+    assert users.authenticate("carol", "another one") == VIEWER
+
+
+def test_unknown_user_hash_is_made_on_first_use(users):
+    auth._unknown_user_hash.cache_clear()
+    assert auth._unknown_user_hash.cache_info().currsize == 0
+    users.authenticate("alice", "correct horse")
+    assert auth._unknown_user_hash.cache_info().currsize == 0
+    users.authenticate("bob", "correct horse")
+    assert auth._unknown_user_hash.cache_info().currsize == 1
+
+
+def test_command_line_add_never_overwrites_a_user(users, monkeypatch, capsys):
+    monkeypatch.setattr(auth.getpass, "getpass", lambda prompt="": "a new password")
+    assert main(["add", users.path, "alice"]) == 1
+    assert "already exists" in capsys.readouterr().err
+    assert users.authenticate("alice", "correct horse") == CASHIER
+
+    assert main(["passwd", users.path, "alice"]) == 0
+    assert users.authenticate("alice", "a new password") == CASHIER  # role kept
+    assert main(["add", users.path, "bob"]) == 0
+    assert users.authenticate("bob", "a new password") == VIEWER
+    assert main(["role", users.path, "bob", "--role", ADMIN]) == 0
+    assert users.authenticate("bob", "a new password") == ADMIN
+    with pytest.raises(SystemExit):
+        main(["role", users.path, "bob"])  # no --role
+    assert main(["passwd", users.path, "carol"]) == 1
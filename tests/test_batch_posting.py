@@ -0,0 +1,83 @@
+# test_batch_posting.py
+import pytest
+
+from batch_posting import ALL, preview, select_students
+from datastore import CHARGE, PAYMENT
+from integrity import CREDIT_BALANCE, verify
+from journal import JournaledStore
+
+YEAR = "1st year"
+
+
+@pytest.fixture
+def in_credit(students):
+    """students where row 0 has paid 50 more than its 1st year total."""
+    students = students.copy()
+    students.at[0, f"Paid Fees {YEAR}"] = students.at[0, f"Total Fees {YEAR}"] + 50.0
+    students.at[0, f"Remaining Fees {YEAR}"] = 0.0
+    return students
+
+
+@pytest.fixture
+def credit_store(store, in_credit):
+    store.save_frame(in_credit)
+    return store
+
+
+def _mismatches(store):
+    """integrity.verify issues other than the (legitimate) credit balances."""
+    report = verify(store.load())
+    return report[report["issue"] != CREDIT_BALANCE]
+
+
+def _row(store, row=0):
+    return store.rows([row]).iloc[0]
+
+
+def test_charge_within_credit_bills_nothing(credit_store):
+    total = float(_row(credit_store)[f"Total Fees {YEAR}"])
+    credit_store.post_batch([0], YEAR, "Fine", 30.0, CHARGE)
+    student = _row(credit_store)
+    assert student[f"Total Fees {YEAR}"] == pytest.approx(total + 30.0)
+    assert student[f"Remaining Fees {YEAR}"] == 0.0
+    assert _mismatches(credit_store).empty
+
+
+def test_charge_beyond_credit_bills_the_difference(credit_store):
+    credit_store.post_batch([0], YEAR, "Fine", 80.0, CHARGE)
+    assert _row(credit_store)[f"Remaining Fees {YEAR}"] == pytest.approx(30.0)
+    assert _mismatches(credit_store).empty
+
+
+def test_charge_without_credit_adds_to_remaining(store):
+    remaining = float(_row(store, 1)[f"Remaining Fees {YEAR}"])
+    store.post_batch([1], YEAR, "Exam Fees", 500.0, CHARGE)
+    assert _row(store, 1)[f"Remaining Fees {YEAR}"] == pytest.approx(remaining + 500.0)
+
+
+def test_payment_never_takes_remaining_below_zero(store):
+    student = _row(store)
+    store.post_batch([0], YEAR, "Tution Fees", float(student[f"Remaining Fees {YEAR}"]) + 1000.0, PAYMENT)
+    assert _row(store)[f"Remaining Fees {YEAR}"] == 0.0
+
+
+def test_journal_replay_applies_the_same_charge(tmp_path, in_credit):
+    path = str(tmp_path / "abi.xlsx")
+    store = JournaledStore(path)
+    store.save_frame(in_credit)
+    store.post_batch([0], YEAR, "Fine", 30.0, CHARGE)
+    assert JournaledStore(path).load().at[0, f"Remaining Fees {YEAR}"] == 0.0
+
+
+def test_preview_matches_the_posting(credit_store):
+    selected = select_students(credit_store.load(), ALL, ALL).loc[[0, 1]]
+    table, totals = preview(selected, YEAR, "Fine", 80.0, CHARGE)
+    credit_store.post_batch([0, 1], YEAR, "Fine", 80.0, CHARGE)
+    after = credit_store.rows([0, 1])[f"Remaining Fees {YEAR}"]
+    assert list(table[f"Remaining Fees {YEAR} (after)"]) == pytest.approx(list(after))
+    assert totals["outstanding_after"] == pytest.approx(float(after.sum()))
+
+
+def test_unknown_fee_type_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.post_batch([0], YEAR, "Parking", 10.0, CHARGE)
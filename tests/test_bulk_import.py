@@ -0,0 +1,77 @@
+# test_bulk_import.py
+import io
+
+import pandas as pd
+import pytest
+
+from bulk_import import main, read_table, validate
+
+
+def _table(rows):
+    return pd.DataFrame(rows).fillna("").astype(str)
+
+
+def test_valid_rows_get_their_totals():
+    table = _table([{"Register Number": "R1", "Name": "Asha", "Tution Fees 1st year": "1,000",
+                     "Exam Fees 1st year": "500", "Paid Fees 1st year": "300", "Total Fees 1st year": "9"}])
+    valid, report = validate(table)
+    assert report.empty
+    student = valid.iloc[0]
+    assert student["Total Fees 1st year"] == 1500.0  # the file's Total is ignored
+    assert student["Remaining Fees 1st year"] == 1200.0
+    assert student["Hostel Fees 2nd year"] == 0.0
+
+
+def test_every_problem_is_reported_by_spreadsheet_row():
+    table = _table([
+        {"Register Number": "R1", "Name": "Asha", "Exam Fees 1st year": "100"},
+        {"Register Number": "R2", "Name": "", "Exam Fees 1st year": "100"},        # row 3
+        {"Register Number": "R3", "Name": "Bala", "Exam Fees 1st year": "lots"},   # row 4
+        {"Register Number": "R4", "Name": "Chitra", "Exam Fees 1st year": "-5"},   # row 5
+        {"Register Number": "R5", "Name": "Devi", "Exam Fees 1st year": "100"},    # row 6
+        {"Register Number": "R5", "Name": "Devi", "Exam Fees 1st year": "100"},    # row 7
+        {"Register Number": "OLD", "Name": "Ezhil", "Exam Fees 1st year": "100"},  # row 8
+    ])
+    valid, report = validate(table, existing_register_numbers=["OLD"])
+    assert list(valid["Register Number"]) == ["R1"]
+    assert sorted(zip(report["row"], report["column"])) == [
+        (3, "Name"), (4, "Exam Fees 1st year"), (5, "Exam Fees 1st year"),
+        (6, "Register Number"), (7, "Register Number"), (8, "Register Number")]
+
+
+def test_missing_required_column():
+    valid, report = validate(_table([{"Name": "Asha"}]))
+    assert valid.empty
+    assert report.to_dict("records") == [{"row": 1, "column": "Register Number", "error": "missing column"}]
+
+
+def test_read_table_keeps_every_cell_as_text():
+    source = io.StringIO("Register Number ,Name,UMIS Number\n007,Asha,123456789012\n")
+    table = read_table(source, filename="students.csv")
+    assert list(table.columns) == ["Register Number", "Name", "UMIS Number"]
+    assert table.iloc[0].tolist() == ["007", "Asha", "123456789012"]
+
+
+def test_command_line_imports_the_valid_rows(store, tmp_path, capsys):
+    source = tmp_path / "new.csv"
+    source.write_text("Register Number,Name,Exam Fees 1st year\nNEW1,Asha,100\nNEW2,,100\n", encoding="utf-8")
+    count = len(store.load())
+
+    assert main([str(source), store.data_file, "--dry-run"]) == 1
+    assert len(store.load()) == count
+    assert "Validated 1 of 2 rows" in capsys.readouterr().out
+
+    assert main([str(source), store.data_file]) == 1
+    assert list(store.find("Register Number", "NEW1")["Exam Fees 1st year"]) == [100.0]
+    assert store.find("Register Number", "NEW2").empty
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".xlsx"])
+def test_read_table_by_extension(tmp_path, suffix):
+    path = tmp_path / f"students{suffix}"
+    frame = pd.DataFrame({"Register Number": ["R1"], "Name": ["Asha"]})
+    if suffix == ".csv":
+        frame.to_csv(path, index=False)
+    else:
+        frame.to_excel(path, index=False)
+    assert read_table(str(path)).to_dict("records") == [{"Register Number": "R1", "Name": "Asha"}]
@@ -0,0 +1,44 @@
+# test_certificates.py
+import io
+import zipfile
+
+import pandas as pd
+
+from certificates import CC, TC, CertificateNumbers, certificate_numbers, issue_certificate, render_batch_zip
+
+OPTIONS = {"admission_no": "A1", "date_of_admission": "01-06-2021", "date_of_leaving": "30-04-2025",
+           "issue_date": "01-05-2025"}
+
+
+def test_numbers_never_repeat_within_a_second(tmp_path):
+    numbers = CertificateNumbers(str(tmp_path / "abi.ledger.db"))
+    now = pd.Timestamp("2026-05-01 10:00:00")
+    issued = [numbers.next_number(TC, now) for _ in range(3)] + numbers.reserve(TC, 2, now)
+    assert issued == [f"TC-2026-{seq:06d}" for seq in range(1, 6)]
+    assert numbers.next_number(CC, now) == "CC-2026-000001"
+    assert CertificateNumbers(numbers.db_path).next_number(TC, now) == "TC-2026-000006"
+
+
+def test_same_certificate_keeps_its_number_and_pdf(store):
+    numbers = certificate_numbers(store)
+    student = store.rows([0]).iloc[0]
+    number, _, pdf = issue_certificate(numbers, TC, student, **OPTIONS)
+    first = pdf.result(timeout=120)
+    assert first.startswith(b"%PDF")
+
+    again, _, pdf_again = issue_certificate(numbers, TC, student, **OPTIONS)
+    assert again == number
+    assert pdf_again.result() == first
+
+    other, source, _ = issue_certificate(numbers, TC, student, **dict(OPTIONS, issue_date="02-05-2025"))
+    assert other != number
+    assert other in source
+
+
+def test_batch_zip_names_each_pdf_after_its_number_and_student(store):
+    students = store.rows([0, 1])
+    numbers = certificate_numbers(store).reserve(CC, len(students))
+    payload = render_batch_zip(students, CC, numbers, title="Selvan", period_from="2021", period_to="2025",
+                               issue_date="01-05-2025")
+    names = zipfile.ZipFile(io.BytesIO(payload)).namelist()
+    assert names == [f"{number}-{reg}.pdf" for number, reg in zip(numbers, students["Register Number"])]
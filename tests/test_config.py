@@ -0,0 +1,44 @@
+# test_config.py
+import os
+
+import pytest
+
+from config import DEFAULTS, ENV_FILE, load, main, sample
+
+
+def test_defaults_without_a_file(tmp_path, monkeypatch):
+    monkeypatch.setattr("config.DEFAULT_FILE", str(tmp_path / "fms.ini"))
+    current = load(environ={})
+    assert current.source is None
+    assert current.institution == DEFAULTS["institution"]["name"]
+
+
+def test_file_and_environment_overrides(tmp_path):
+    path = tmp_path / "fms.ini"
+    path.write_text("[paths]\ndata_file = data/abi.db\n[institution]\nname = Other College\n", encoding="utf-8")
+    current = load(str(path), environ={"FMS_PAYEE_UPI_ID": "other@upi"})
+    assert current.source == str(path)
+    assert current.data_file == os.path.join(str(tmp_path), "data", "abi.db")
+    assert current.institution == "Other College"
+    assert current.upi_id == "other@upi"
+
+
+@pytest.mark.parametrize("explicit", ["path", "environment"])
+def test_a_named_file_must_exist(tmp_path, explicit):
+    missing = str(tmp_path / "missing.ini")
+    with pytest.raises(FileNotFoundError, match="missing.ini"):
+        if explicit == "path":
+            load(missing, environ={})
+        else:
+            load(environ={ENV_FILE: missing})
+
+
+def test_command_line_reports_a_missing_config(tmp_path, capsys):
+    assert main(["--config", str(tmp_path / "missing.ini")]) == 1
+    assert "missing.ini" in capsys.readouterr().err
+
+
+def test_sample_round_trips(tmp_path):
+    path = tmp_path / "fms.ini"
+    path.write_text(sample(), encoding="utf-8")
+    assert load(str(path), environ={}).values == DEFAULTS
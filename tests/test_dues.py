@@ -0,0 +1,69 @@
+# test_dues.py
+import pandas as pd
+import pytest
+
+from datastore import CHARGE, PAYMENT
+from dues import AGEING_LABELS, ageing, dues_ageing, dues_index
+from ledger import Ledger
+
+NOW = pd.Timestamp("2026-06-30")
+
+
+def _entry(reg, amount, kind, ts, fee_type="Tution Fees", year="1st year"):
+    return {"register_number": reg, "year": year, "fee_type": fee_type, "amount": amount,
+            "kind": kind, "ts": ts, "receipt_no": ""}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return Ledger(str(tmp_path / "abi.ledger.db"))
+
+
+def _buckets(ledger):
+    table = ageing(ledger.unpaid_charges(), now=NOW)
+    return dict(zip(table["Age"], table["Outstanding"]))
+
+
+def test_payments_settle_the_oldest_charges_first(ledger):
+    ledger.post([
+        _entry("A", 1000.0, CHARGE, "2025-12-01T00:00:00"),   # 211 days
+        _entry("A", 500.0, CHARGE, "2026-05-01T00:00:00"),    # 60 days
+        _entry("A", 200.0, CHARGE, "2026-06-20T00:00:00"),    # 10 days
+        _entry("A", 1200.0, PAYMENT, "2026-06-25T00:00:00"),
+    ])
+    assert _buckets(ledger) == {"0-30 days": 200.0, "31-90 days": 300.0, "91-180 days": 0.0, "180+ days": 0.0}
+
+
+def test_students_and_years_settle_separately(ledger):
+    ledger.post([
+        _entry("A", 100.0, CHARGE, "2026-06-01T00:00:00"),
+        _entry("A", 100.0, CHARGE, "2026-06-01T00:00:00", year="2nd year"),
+        _entry("B", 100.0, CHARGE, "2026-06-01T00:00:00"),
+        _entry("A", 150.0, PAYMENT, "2026-06-02T00:00:00"),  # overpays 1st year, not 2nd
+    ])
+    unpaid = ledger.unpaid_charges()
+    assert sorted(zip(unpaid["register_number"], unpaid["year"], unpaid["unpaid"])) == [
+        ("A", "2nd year", 100.0), ("B", "1st year", 100.0)]
+
+
+def test_settled_students_are_not_read(ledger):
+    ledger.post([_entry("A", 100.0, CHARGE, "2026-01-01T00:00:00"),
+                 _entry("A", 100.0, PAYMENT, "2026-01-02T00:00:00")])
+    assert ledger.unpaid_charges().empty
+    assert _buckets(ledger) == dict.fromkeys(AGEING_LABELS, 0.0)
+
+
+def test_ageing_totals_match_the_outstanding_fees(store):
+    total = dues_index(store).totals()["Outstanding"].sum()
+    assert dues_ageing(store)["Outstanding"].sum() == pytest.approx(total)
+
+
+def test_dues_index_follows_payments(store):
+    index = dues_index(store)
+    before = index.totals().set_index("Year")
+    remaining = float(store.rows([0]).iloc[0]["Remaining Fees 1st year"])
+    paid = min(remaining, 1000.0)
+    store.record_payment(0, "1st year", paid, fee_type="Tution Fees", receipt_no="R-1")
+    after = dues_index(store).totals().set_index("Year")
+    assert before.at["1st year", "Outstanding"] - after.at["1st year", "Outstanding"] == pytest.approx(paid)
+    assert dues_ageing(store)["Outstanding"].sum() == pytest.approx(after["Outstanding"].sum())
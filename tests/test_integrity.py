@@ -0,0 +1,53 @@
+# test_integrity.py
+import pytest
+
+from datastore import FEE_COMPONENTS, compute_totals
+from integrity import CREDIT_BALANCE, REMAINING_MISMATCH, TOTAL_MISMATCH, main, repair, verify
+
+
+def test_consistent_data_has_no_issues(students):
+    assert verify(students).empty
+
+
+def test_compute_totals(students):
+    df = students.copy()
+    df["Total Fees 2nd year"] = 0.0
+    df["Remaining Fees 2nd year"] = -1.0
+    compute_totals(df)
+    expected = students[[f"{fee_type} 2nd year" for fee_type in FEE_COMPONENTS]].sum(axis=1)
+    assert list(df["Total Fees 2nd year"]) == pytest.approx(list(expected))
+    assert list(df["Remaining Fees 2nd year"]) == pytest.approx(
+        list((expected - students["Paid Fees 2nd year"]).clip(lower=0)))
+
+
+def test_every_kind_of_issue_is_reported(students):
+    df = students.copy()
+    df.loc[1, "Total Fees 1st year"] += 100.0  # Remaining still matches the components
+    df.loc[2, "Remaining Fees 3rd year"] += 50.0
+    df.loc[3, "Paid Fees 2nd year"] = df.loc[3, "Total Fees 2nd year"] + 10.0
+    df.loc[3, "Remaining Fees 2nd year"] = 0.0
+    report = verify(df)
+    assert sorted(zip(report["row"], report["year"], report["issue"])) == sorted([
+        (1, "1st year", TOTAL_MISMATCH),
+        (2, "3rd year", REMAINING_MISMATCH), (3, "2nd year", CREDIT_BALANCE)])
+
+
+def test_repair_rewrites_the_derived_columns(store, students):
+    df = students.copy()
+    df.loc[0, "Total Fees 1st year"] = 1.0
+    df.loc[5, "Remaining Fees 4th year"] = 99999.0
+    store.save_frame(df)
+    assert repair(store) == 2
+    assert verify(store.load()).empty
+    assert repair(store) == 0
+
+
+def test_command_line(store, students, capsys):
+    assert main([store.data_file]) == 0
+    df = students.copy()
+    df.loc[0, "Total Fees 1st year"] = 1.0
+    store.save_frame(df)
+    assert main([store.data_file]) == 1
+    assert "Total Fees differs" in capsys.readouterr().out
+    assert main([store.data_file, "--fix"]) == 0
+    assert verify(store.load()).empty
@@ -0,0 +1,115 @@
+# test_journal.py
+import multiprocessing
+
+import pytest
+
+from datastore import PAYMENT
+from journal import JournaledStore
+
+PAYMENTS_PER_WRITER = 15
+
+
+def _pay(path, writer):
+    store = JournaledStore(path, compact_every=10)
+    for i in range(PAYMENTS_PER_WRITER):
+        store.record_payment(0, "1st year", 1.0, "Fine", receipt_no=f"W{writer}-{i}")
+
+
+def test_concurrent_writers_lose_no_payment(tmp_path, students):
+    path = str(tmp_path / "abi.xlsx")
+    store = JournaledStore(path, compact_every=10)
+    store.save_frame(students)
+    paid_before = float(store.load().at[0, "Paid Fees 1st year"])
+
+    context = multiprocessing.get_context("spawn")
+    writers = [context.Process(target=_pay, args=(path, w)) for w in range(3)]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join(120)
+        assert process.exitcode == 0
+
+    reader = JournaledStore(path)
+    assert float(reader.load().at[0, "Paid Fees 1st year"]) == paid_before + 3 * PAYMENTS_PER_WRITER
+    receipts = reader.ledger.history(register_number=students.at[0, "Register Number"])["receipt_no"]
+    assert sorted(r for r in receipts if r) == sorted(f"W{w}-{i}" for w in range(3) for i in range(PAYMENTS_PER_WRITER))
+
+
+def _crash_after_append(store, receipt_no):
+    """What record_payment leaves behind when the process dies before the ledger post."""
+    with store._exclusive():
+        store._sync()
+        store._append({"op": "payment", "row": 1, "year": "2nd year", "amount": 50.0, "fee_type": "Fine",
+                       "receipt_no": receipt_no, "register_number": str(store._df.at[1, "Register Number"])})
+
+
+def _ledger_receipts(store):
+    history = store.ledger.history()
+    return list(history.loc[history["kind"] == PAYMENT, "receipt_no"])
+
+
+def test_ledger_catches_up_on_open_after_a_crash(tmp_path, students):
+    path = str(tmp_path / "abi.xlsx")
+    store = JournaledStore(path)
+    store.save_frame(students)
+    store.record_payment(0, "1st year", 10.0, receipt_no="R-1")
+    _crash_after_append(store, "R-LOST")
+    assert "R-LOST" not in _ledger_receipts(store)
+
+    reopened = JournaledStore(path)
+    assert _ledger_receipts(reopened).count("R-LOST") == 1
+    assert _ledger_receipts(reopened).count("R-1") == 1
+    assert reopened.sync_ledger() == 0
+
+
+def test_ledger_catches_up_before_compaction(tmp_path, students):
+    path = str(tmp_path / "abi.xlsx")
+    store = JournaledStore(path)
+    store.save_frame(students)
+    store.record_payment(0, "1st year", 10.0, receipt_no="R-1")
+    _crash_after_append(store, "R-LOST")
+    store.compact()  # folds the event into the base; the journal no longer has it afterwards
+    assert _ledger_receipts(store).count("R-LOST") == 1
+    assert _ledger_receipts(JournaledStore(path)).count("R-LOST") == 1
+
+
+def test_seeding_an_empty_ledger_does_not_repost_journal_events(tmp_path, students):
+    path = str(tmp_path / "abi.xlsx")
+    store = JournaledStore(path)
+    store.save_frame(students)
+    store.record_payment(0, "1st year", 10.0, receipt_no="R-1")
+    store.ledger.clear()
+
+    reopened = JournaledStore(path)
+    paid = reopened.ledger.summary(students.at[0, "Register Number"]).set_index("year").at["1st year", "paid"]
+    assert paid == pytest.approx(float(reopened.load().at[0, "Paid Fees 1st year"]))
+
+
+def test_ledger_of_a_new_workbook_is_seeded_from_its_first_save(tmp_path, students):
+    store = JournaledStore(str(tmp_path / "abi.xlsx"))
+    store.save_frame(students)
+    summary = store.ledger.summary().groupby("year")[["charged", "paid"]].sum()
+    assert summary.at["1st year", "charged"] == pytest.approx(students["Total Fees 1st year"].sum())
+    assert summary.at["1st year", "paid"] == pytest.approx(students["Paid Fees 1st year"].sum())
+
+
+def _pay_row(path, row, receipt_no):
+    JournaledStore(path).record_payment(row, "1st year", 5.0, "Fine", receipt_no=receipt_no)
+
+
+def test_saved_frame_rows_are_addressed_by_position_in_every_process(tmp_path, students):
+    path = str(tmp_path / "abi.xlsx")
+    store = JournaledStore(path)
+    store.save_frame(students.iloc[[3, 1, 4]])
+    assert list(store.load().index) == [0, 1, 2]
+    store.record_payment(2, "1st year", 5.0, "Fine", receipt_no="P-1")
+
+    process = multiprocessing.get_context("spawn").Process(target=_pay_row, args=(path, 2, "P-2"))
+    process.start()
+    process.join(120)
+    assert process.exitcode == 0
+
+    df = JournaledStore(path).load()
+    assert list(df["Register Number"]) == list(students["Register Number"].iloc[[3, 1, 4]])
+    assert df.at[2, "Paid Fees 1st year"] == pytest.approx(students.at[4, "Paid Fees 1st year"] + 10.0)
+    assert df.at[0, "Paid Fees 1st year"] == pytest.approx(students.at[3, "Paid Fees 1st year"])
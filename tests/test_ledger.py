@@ -0,0 +1,87 @@
+# test_ledger.py
+import pandas as pd
+import pytest
+
+from datastore import CHARGE, PAYMENT
+from ledger import OPENING_BALANCE, Ledger, entries_from_frame
+from sqlite_store import SQLiteStore, migrate
+
+
+def _summary(store):
+    return store.ledger.summary().set_index(["register_number", "year"])
+
+
+def test_entries_from_frame(students):
+    entries = entries_from_frame(students.iloc[[0]], ts="2026-01-01T00:00:00")
+    charges = entries[entries["kind"] == CHARGE]
+    opening = entries[entries["kind"] == PAYMENT]
+    assert charges["amount"].sum() == pytest.approx(sum(students.at[0, f"Total Fees {y} year"]
+                                                        for y in ("1st", "2nd", "3rd", "4th")))
+    assert set(opening["fee_type"]) <= {OPENING_BALANCE}
+    assert (entries["amount"] != 0).all() and (entries["ts"] == "2026-01-01T00:00:00").all()
+
+
+def test_summary_matches_the_seeded_data(store, students):
+    summary = _summary(store)
+    reg = students.at[0, "Register Number"]
+    assert summary.at[(reg, "1st year"), "charged"] == pytest.approx(students.at[0, "Total Fees 1st year"])
+    assert summary.at[(reg, "1st year"), "paid"] == pytest.approx(students.at[0, "Paid Fees 1st year"])
+
+
+def test_payment_is_posted_with_its_receipt(store, students):
+    reg = students.at[0, "Register Number"]
+    before = _summary(store).at[(reg, "1st year"), "paid"]
+    store.record_payment(0, "1st year", 250.0, fee_type="Exam Fees", receipt_no="RCPT-2026-000001")
+    payments = store.ledger.payments()
+    assert list(payments["receipt_no"]) == ["RCPT-2026-000001"]
+    assert payments.iloc[0]["register_number"] == reg and payments.iloc[0]["amount"] == 250.0
+    assert _summary(store).at[(reg, "1st year"), "paid"] == pytest.approx(before + 250.0)
+    assert store.ledger.posted_receipts(["RCPT-2026-000001", "RCPT-2026-000002"]) == {"RCPT-2026-000001"}
+
+
+def test_failed_write_posts_nothing(store):
+    entries = len(store.ledger.history())
+    with pytest.raises(KeyError):
+        store.post_payments(pd.DataFrame({"row": [0, 10_000], "year": "1st year", "amount": 10.0,
+                                          "fee_type": "Exam Fees", "receipt_no": ["R-1", "R-2"]}))
+    assert len(store.ledger.history()) == entries
+
+
+def test_history_filters(tmp_path):
+    ledger = Ledger(str(tmp_path / "abi.ledger.db"))
+    ledger.post([
+        {"register_number": "A", "year": "1st year", "fee_type": "Fine", "amount": 5.0, "kind": CHARGE,
+         "ts": "2026-01-01T00:00:00", "receipt_no": ""},
+        {"register_number": "A", "year": "2nd year", "fee_type": "Fine", "amount": 6.0, "kind": CHARGE,
+         "ts": "2026-02-01T00:00:00", "receipt_no": ""},
+        {"register_number": "B", "year": "1st year", "fee_type": "Fine", "amount": 7.0, "kind": CHARGE,
+         "ts": "2026-03-01T00:00:00", "receipt_no": ""},
+    ])
+    assert list(ledger.history(register_number="A")["amount"]) == [5.0, 6.0]
+    assert list(ledger.history(year="1st year")["amount"]) == [5.0, 7.0]
+    assert list(ledger.history(start="2026-01-15", end="2026-03-01")["amount"]) == [6.0]
+
+
+def test_event_is_posted_at_most_once(tmp_path):
+    ledger = Ledger(str(tmp_path / "abi.ledger.db"))
+    entry = {"register_number": "A", "year": "1st year", "fee_type": "Fine", "amount": 5.0, "kind": CHARGE,
+             "ts": "2026-01-01T00:00:00", "receipt_no": ""}
+    assert ledger.post([entry], event=("e1", "g1")) == 1
+    assert ledger.post([entry], event=("e1", "g1")) == 0
+    assert ledger.summary().at[0, "charged"] == 5.0
+    assert ledger.posted_events("g1") == {"e1"}
+    ledger.forget_generations(keep="g2")
+    assert ledger.posted_events("g1") == set()
+
+
+def test_migration_keeps_the_ledger_history(tmp_path, students):
+    from storage import open_store
+
+    source = open_store(str(tmp_path / "abi.xlsx"))
+    source.save_frame(students)
+    source.record_payment(0, "1st year", 100.0, fee_type="Exam Fees", receipt_no="R-1")
+    target = str(tmp_path / "migrated.db")
+    assert migrate(source.data_file, target) == len(students)
+    migrated = SQLiteStore(target)
+    assert list(migrated.ledger.payments()["receipt_no"]) == ["R-1"]
+    assert len(migrated.ledger.history()) == len(source.ledger.history())
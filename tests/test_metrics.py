@@ -0,0 +1,62 @@
+# test_metrics.py
+import json
+
+import pytest
+
+from metrics import registry, set_gauge, timed
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    registry.reset()
+    yield
+    registry.set_sink(None)
+    registry.reset()
+
+
+def test_timed_records_blocks_calls_and_failures():
+    with timed("load", backend="sqlite"):
+        pass
+
+    @timed("render", kind="receipt")
+    def render(fail=False):
+        if fail:
+            raise RuntimeError("boom")
+
+    render()
+    with pytest.raises(RuntimeError):
+        render(fail=True)
+    counts = dict(zip(registry.summary()["metric"], registry.summary()["count"]))
+    assert counts == {"load": 1, "render": 2}
+    assert list(registry.summary()["labels"]) == ["backend=sqlite", "kind=receipt"]
+
+
+def test_prometheus_text():
+    for _ in range(3):
+        with timed("api_request", route='GET /students/{id}'):
+            pass
+    set_gauge("dataset_students", 30)
+    text = registry.prometheus_text()
+    lines = text.splitlines()
+    assert "# TYPE fms_api_request_milliseconds summary" in lines
+    assert any(line.startswith('fms_api_request_milliseconds{route="GET /students/{id}",quantile="0.9"} ')
+               for line in lines)
+    assert 'fms_api_request_milliseconds_count{route="GET /students/{id}"} 3' in lines
+    assert "# TYPE fms_dataset_students gauge" in lines
+    assert "fms_dataset_students 30" in lines
+    assert text.endswith("\n")
+
+
+def test_label_values_are_escaped():
+    with timed("page", title='say "hi"\n'):
+        pass
+    assert 'fms_page_milliseconds_count{title="say \\"hi\\"\\n"} 1' in registry.prometheus_text().splitlines()
+
+
+def test_sink_appends_each_observation(tmp_path):
+    sink = tmp_path / "metrics.jsonl"
+    registry.set_sink(str(sink))
+    with timed("save", backend="journal"):
+        pass
+    record = json.loads(sink.read_text(encoding="utf-8").splitlines()[-1])
+    assert record["metric"] == "save" and record["labels"] == {"backend": "journal"} and record["ms"] >= 0
@@ -0,0 +1,42 @@
+# test_paging.py
+import pandas as pd
+import pytest
+
+from storage import EQUALS, EQUALS_IGNORE_CASE, GREATER_THAN
+
+
+def test_pages_cover_every_row_once_in_order(store, students):
+    pages = [store.page(offset=offset, limit=7) for offset in range(0, len(students), 7)]
+    assert [len(page) for page in pages] == [7, 7, 7, 7, 2]
+    combined = pd.concat(pages)
+    assert list(combined["Register Number"]) == list(students["Register Number"])
+    assert store.page(offset=len(students), limit=7).empty
+
+
+def test_count_and_page_apply_the_same_filters(store, students):
+    batch = students.at[0, "Batch"]
+    filters = [("Batch", EQUALS, batch)]
+    expected = students[students["Batch"] == batch]
+    assert store.count(filters) == len(expected)
+    page = store.page(filters, offset=1, limit=3)
+    assert list(page["Register Number"]) == list(expected["Register Number"].iloc[1:4])
+
+
+def test_filter_operators(store, students):
+    department = students.at[0, "Department"]
+    ignore_case = [("Department", EQUALS_IGNORE_CASE, department.lower())]
+    assert store.count(ignore_case) == int((students["Department"] == department).sum())
+    owing = [("Remaining Fees 1st year", GREATER_THAN, 0)]
+    assert store.count(owing) == int((students["Remaining Fees 1st year"] > 0).sum())
+    assert (store.page(owing, limit=len(students))["Remaining Fees 1st year"] > 0).all()
+
+
+def test_page_projects_columns(store):
+    page = store.page(limit=2, columns=["Register Number", "Name", "No Such Column"])
+    assert list(page.columns) == ["Register Number", "Name"]
+    assert len(page) == 2
+
+
+def test_unknown_operator_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.count([("Batch", "~", "2024")])
@@ -0,0 +1,97 @@
+# test_receipts.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import receipts
+from receipts import ReceiptBook
+from service import FeeService
+
+
+@pytest.fixture
+def book(tmp_path):
+    return ReceiptBook(str(tmp_path / "abi.ledger.db"), str(tmp_path / "abi.receipts"))
+
+
+def _receipt(receipt_no, register_number="953024CSE001"):
+    return {"receipt_no": receipt_no, "date": "2026-05-01", "name": "Arun Kumar",
+            "register_number": register_number, "department": "CSE", "academic_year": "I Year",
+            "fee_type": "Exam Fees", "amount": 500.0, "total": 50000.0, "previous_paid": 1000.0,
+            "paid": 1500.0, "remaining": 48500.0}
+
+
+def test_numbers_are_distinct_across_threads(book):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        numbers = list(pool.map(lambda _: book.next_number(pd.Timestamp("2026-05-01")), range(40)))
+    assert sorted(numbers) == [f"RCPT-2026-{seq:06d}" for seq in range(1, 41)]
+
+
+def test_numbering_restarts_each_year(book):
+    assert book.next_number(pd.Timestamp("2026-12-31")) == "RCPT-2026-000001"
+    assert book.next_number(pd.Timestamp("2027-01-01")) == "RCPT-2027-000001"
+
+
+def test_issue_archives_for_reprint(book):
+    pdf = book.issue(_receipt("RCPT-2026-000001"))
+    assert pdf.startswith(b"%PDF")
+    assert book.reprint("RCPT-2026-000001") == pdf
+    assert book.reprint("RCPT-2026-999999") is None
+    book.issue(_receipt("RCPT-2026-000002"))
+    book.issue(_receipt("RCPT-2026-000003", register_number="OTHER"))
+    assert set(book.for_student("953024CSE001")["receipt_no"]) == {"RCPT-2026-000001", "RCPT-2026-000002"}
+
+
+def test_service_payment_issues_a_matching_receipt(store):
+    service = FeeService(store.data_file)
+    student = store.rows([0]).iloc[0]
+    receipt, pdf = service.pay(0, "1st year", 300.0, "Exam Fees")
+    assert receipt["register_number"] == student["Register Number"]
+    assert receipt["paid"] == pytest.approx(float(student["Paid Fees 1st year"]) + 300.0)
+    assert service.receipts.reprint(receipt["receipt_no"]) == pdf
+    assert list(store.ledger.payments()["receipt_no"]) == [receipt["receipt_no"]]
+
+
+def test_issue_is_idempotent_per_receipt_number(book):
+    pdf = book.issue(_receipt("RCPT-2026-000001"))
+    again = dict(_receipt("RCPT-2026-000001"), amount=999.0)
+    assert book.issue(again) == pdf
+    assert list(book.for_student("953024CSE001")["amount"]) == [500.0]
+
+
+def test_receipt_of_a_payment_whose_issue_failed_is_issued_later(store, monkeypatch):
+    original = receipts.render_receipt_pdf
+    service = FeeService(store.data_file)
+    student = store.rows([0]).iloc[0]
+
+    def broken(receipt, logo_path=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(receipts, "render_receipt_pdf", broken)
+    with pytest.raises(OSError):
+        service.pay(0, "1st year", 300.0, "Exam Fees")
+    (receipt_no,) = store.ledger.payments()["receipt_no"]
+    assert service.receipts.reprint(receipt_no) is None
+
+    rendered = []
+    monkeypatch.undo()
+    monkeypatch.setattr(receipts, "render_receipt_pdf",
+                        lambda receipt, logo_path=None: rendered.append(receipt) or original(receipt, logo_path))
+    assert service.issue_pending_receipts(min_age=60) == []  # may still be in progress
+    assert service.issue_pending_receipts(min_age=0) == [receipt_no]
+    paid = float(student["Paid Fees 1st year"]) + 300.0
+    assert (rendered[0]["previous_paid"], rendered[0]["paid"]) == (pytest.approx(paid - 300.0), pytest.approx(paid))
+    assert rendered[0]["total"] == pytest.approx(float(student["Total Fees 1st year"]))
+    assert service.receipts.reprint(receipt_no).startswith(b"%PDF")
+    (issued,) = service.receipts.for_student(student["Register Number"]).itertuples()
+    assert (issued.receipt_no, issued.amount) == (receipt_no, 300.0)
+    assert list(store.ledger.payments()["receipt_no"]) == [receipt_no]  # posted once
+    assert service.issue_pending_receipts(min_age=0) == []
+
+
+def test_draft_of_a_payment_that_was_never_posted_is_dropped(store):
+    service = FeeService(store.data_file)
+    service.receipts.reserve(_receipt("RCPT-2026-000042"))
+    assert service.issue_pending_receipts(min_age=0) == []
+    assert service.receipts.drafts() == []
+    assert service.receipts.reprint("RCPT-2026-000042") is None
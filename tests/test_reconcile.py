@@ -0,0 +1,116 @@
+# test_reconcile.py
+import io
+
+import pandas as pd
+import pytest
+
+from reconcile import (BAD_LINE, EXCEEDS_DUES, NO_REFERENCE, POSTED, UNKNOWN_REFERENCE, post_review_item,
+                       reconcile, review_queue)
+from upi_qr import payment_reference
+
+
+@pytest.fixture
+def owing(store, students):
+    """store with student 0 owing 5000 and student 1 owing 1234.5 for the 1st year (a unique amount)."""
+    students = students.copy()
+    students["Remaining Fees 1st year"] = students["Remaining Fees 1st year"].clip(upper=1000.0)
+    students.loc[0, "Remaining Fees 1st year"] = 5000.0
+    students.loc[1, "Remaining Fees 1st year"] = 1234.5
+    store.save_frame(students)
+    return store
+
+
+def _statement(owing):
+    reg = owing.rows([0]).iloc[0]["Register Number"]
+    ref = payment_reference(reg, "1st year")
+    return "\n".join([
+        "Txn Date,UTR No,Remarks,Amount,Cr/Dr",
+        f"01/05/2026,UTR1,UPI/{ref}/fees,\"3,000.00\",CR",
+        f"02/05/2026,UTR2,UPI/{ref}/fees,2500,CR",   # only 2000 left after UTR1
+        f"02/05/2026,UTR3,UPI/{ref}/refund,100,DR",  # debit: ignored
+        "03/05/2026,UTR4,UPI/FMSNOBODYY1/fees,50,CR",
+        "03/05/2026,UTR5,UPI/no reference,1234.50,CR",
+        "not a date,UTR6,UPI/x,10,CR",
+    ]) + "\n"
+
+
+def test_reconcile_posts_matches_and_queues_the_rest(owing):
+    summary = reconcile(owing, io.StringIO(_statement(owing)), chunksize=2)
+    assert summary == {"lines": 6, "credits": 5, "already_posted": 0, "matched": 1,
+                       "matched_amount": 3000.0, "review": 4}
+    assert owing.rows([0]).iloc[0]["Remaining Fees 1st year"] == pytest.approx(2000.0)
+    payments = owing.ledger.payments()
+    assert list(payments["receipt_no"]) == ["UPI-UTR1"] and payments.iloc[0]["ts"].startswith("2026-05-01")
+
+    review = review_queue(owing).items().set_index("txn_id")
+    assert review["reason"].to_dict() == {"UTR2": EXCEEDS_DUES, "UTR4": UNKNOWN_REFERENCE,
+                                          "UTR5": NO_REFERENCE, "UTR6": BAD_LINE}
+    assert (review.at["UTR5", "suggested_row"], review.at["UTR5", "suggested_year"]) == (1, "1st year")
+
+
+def test_running_a_statement_twice_posts_nothing_new(owing):
+    reconcile(owing, io.StringIO(_statement(owing)))
+    again = reconcile(owing, io.StringIO(_statement(owing)))
+    assert again["already_posted"] == 1 and again["matched"] == 0 and again["review"] == 0
+    assert len(owing.ledger.payments()) == 1
+
+
+def test_dry_run_writes_nothing(owing):
+    summary = reconcile(owing, io.StringIO(_statement(owing)), dry_run=True)
+    assert summary["matched"] == 1 and summary["review"] == 4
+    assert owing.ledger.payments().empty and review_queue(owing).items().empty
+
+
+def test_review_item_can_be_posted_by_staff(owing):
+    reconcile(owing, io.StringIO(_statement(owing)))
+    queue = review_queue(owing)
+    item = queue.items().set_index("txn_id", drop=False).loc["UTR5"]
+    post_review_item(owing, item, 1, "1st year")
+    assert owing.rows([1]).iloc[0]["Remaining Fees 1st year"] == 0.0
+    assert "UTR5" not in set(queue.items()["txn_id"])
+    assert "UTR5" in set(queue.items(POSTED)["txn_id"])
+
+
+def test_review_item_is_posted_once(owing):
+    reconcile(owing, io.StringIO(_statement(owing)))
+    item = review_queue(owing).items().set_index("txn_id", drop=False).loc["UTR5"]
+    assert post_review_item(owing, item, 1, "1st year") is True
+    assert post_review_item(owing, item, 1, "1st year") is False  # e.g. a second tab still showing the line
+    assert list(owing.ledger.payments()["receipt_no"]) == ["UPI-UTR1", "UPI-UTR5"]
+
+
+def test_claimed_review_item_is_not_posted_by_someone_else(owing):
+    reconcile(owing, io.StringIO(_statement(owing)))
+    queue = review_queue(owing)
+    item = queue.items().set_index("txn_id", drop=False).loc["UTR5"]
+    assert queue.claim("UTR5")
+    assert post_review_item(owing, item, 1, "1st year") is False
+    assert owing.ledger.payments()["receipt_no"].tolist() == ["UPI-UTR1"]
+    assert queue.claim("UTR5", timeout=0)  # a claim left by a poster that stopped can be taken over
+    queue.release("UTR5")
+    assert post_review_item(owing, item, 1, "1st year") is True
+
+
+def test_review_item_already_in_the_ledger_is_closed_without_posting(owing, monkeypatch):
+    reconcile(owing, io.StringIO(_statement(owing)))
+    item = review_queue(owing).items().set_index("txn_id", drop=False).loc["UTR5"]
+
+    def crash(self, *args, **kwargs):
+        raise RuntimeError("lost the connection")
+
+    monkeypatch.setattr(type(owing), "post_payments", crash)
+    with pytest.raises(RuntimeError):
+        post_review_item(owing, item, 1, "1st year")
+    assert "UTR5" in set(review_queue(owing).items()["txn_id"])  # still open, claim released
+    monkeypatch.undo()
+
+    owing.post_payments(pd.DataFrame([{"row": 1, "year": "1st year", "amount": 1234.5, "fee_type": "UPI Payment",
+                                       "receipt_no": "UPI-UTR5", "ts": None}]))  # e.g. posted by a second run
+    assert post_review_item(owing, item, 1, "1st year") is True
+    assert owing.ledger.payments()["receipt_no"].tolist() == ["UPI-UTR1", "UPI-UTR5"]
+    assert "UTR5" in set(review_queue(owing).items(POSTED)["txn_id"])
+
+
+def test_statement_needs_date_and_amount(owing):
+    with pytest.raises(ValueError, match="amount"):
+        reconcile(owing, io.StringIO("Date,Remarks\n01/05/2026,x\n"))
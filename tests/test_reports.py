@@ -0,0 +1,69 @@
+# test_reports.py
+import os
+import zipfile
+
+import pytest
+from openpyxl import load_workbook
+
+from reports import (BREAKDOWN_HEADER, DUES_HEADER, DUES_LETTER, STATEMENT, SUMMARY_HEADER, XLSX,
+                     generate_report, iter_students, report_filters, submit_report, write_pdf_zip)
+
+YEARS = ["1st year", "2nd year", "3rd year", "4th year"]
+
+
+def _owing(students):
+    return students[sum(students[f"Remaining Fees {year}"] for year in YEARS) > 0]
+
+
+def test_statement_zip_has_one_pdf_per_student(store, students, tmp_path):
+    output = str(tmp_path / "statements.zip")
+    result = generate_report(store, output, STATEMENT, workers=1)
+    assert result == {"students": len(students), "output": output}
+    with zipfile.ZipFile(output) as archive:
+        names = archive.namelist()
+        assert len(names) == len(students)
+        assert f"statement-{students.at[0, 'Register Number']}.pdf" in names
+        assert archive.read(names[0]).startswith(b"%PDF")
+    assert not os.path.exists(output + ".tmp")
+
+
+def test_dues_letters_skip_students_without_dues(store, students, tmp_path):
+    output = str(tmp_path / "dues.zip")
+    owing = _owing(students)
+    assert 0 < len(owing) < len(students)
+    assert submit_report(store, output, kind=DUES_LETTER, workers=1).result(120)["students"] == len(owing)
+    with zipfile.ZipFile(output) as archive:
+        assert sorted(archive.namelist()) == sorted(f"dues-letter-{reg}.pdf" for reg in owing["Register Number"])
+
+
+def test_workbook_sheets(store, students, tmp_path):
+    output = str(tmp_path / "fees.xlsx")
+    batch = students.at[0, "Batch"]
+    selected = students[students["Batch"] == batch]
+    assert generate_report(store, output, fmt=XLSX, batch=batch)["students"] == len(selected)
+    book = load_workbook(output, read_only=True)
+    assert book.sheetnames == ["Summary", "Breakdown", "Dues"]
+    summary = list(book["Summary"].values)
+    assert list(summary[0]) == SUMMARY_HEADER
+    assert [row[0] for row in summary[1:]] == list(selected["Register Number"])
+    assert summary[1][-1] == pytest.approx(sum(selected.iloc[0][f"Remaining Fees {year}"] for year in YEARS))
+    breakdown = list(book["Breakdown"].values)
+    assert list(breakdown[0]) == BREAKDOWN_HEADER
+    assert sum(row[4] for row in breakdown[1:]) == pytest.approx(
+        sum(selected[f"Total Fees {year}"].sum() for year in YEARS))
+    dues = list(book["Dues"].values)
+    assert list(dues[0]) == DUES_HEADER
+    assert sum(row[5] for row in dues[1:]) == pytest.approx(
+        sum(selected[f"Remaining Fees {year}"].sum() for year in YEARS))
+
+
+def test_failed_report_leaves_no_files(store, tmp_path):
+    output = str(tmp_path / "statements.zip")
+
+    def chunks():
+        yield from iter_students(store, report_filters(), chunk_size=10)
+        raise OSError("store went away")
+
+    with pytest.raises(OSError):
+        write_pdf_zip(chunks(), output, STATEMENT, workers=1)
+    assert not os.path.exists(output) and not os.path.exists(output + ".tmp")
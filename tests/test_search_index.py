@@ -0,0 +1,67 @@
+# test_search_index.py
+import pandas as pd
+import pytest
+
+from search_index import SearchIndex, label, normalize, search_index
+
+
+@pytest.fixture
+def index():
+    df = pd.DataFrame({
+        "Name": ["Arun Kumar", "Arun Kumar", "Priya Devi", "Karthik Raja"],
+        "Register Number": ["953024CSE001", "953024ECE001", "953024CSE002", "953024MECH01"],
+        "Batch": ["2024", "2024", "2024", "2023"],
+        "Department": ["CSE", "ECE", "CSE", "MECH"],
+        "UMIS Number": [111111.0, 222222.0, 333333.0, None],
+        "EMIS Number": ["9001", "9002", "9003", "9004"],
+    }, index=[10, 11, 12, 13])
+    return SearchIndex(df, version=1)
+
+
+def test_normalize():
+    assert normalize("  Arun   KUMAR ") == "arun kumar"
+    assert normalize(111111.0) == "111111"
+    assert normalize(float("nan")) == ""
+
+
+def test_same_name_students_are_both_found(index):
+    hits = index.search("arun kumar")
+    assert list(hits.index) == [10, 11]
+    assert set(hits["Match"]) == {"exact"}
+    assert label(hits.loc[11]) == "Arun Kumar — Reg. 953024ECE001 (ECE, batch 2024)"
+
+
+def test_prefix_word_and_identifier_matches(index):
+    assert list(index.search("pri").index) == [12]
+    assert index.search("raj").iloc[0]["Match"] == "word"
+    hits = index.search("953024cse")
+    assert list(hits[hits["Match"] == "prefix"].index) == [10, 12]
+    assert list(hits.index[:2]) == [10, 12]  # prefix hits rank above the fuzzy ones
+    assert list(index.search("222222").index) == [11]  # UMIS read back from Excel as 222222.0
+    assert list(index.search("9004").index) == [13]
+
+
+def test_fuzzy_matches_names_but_not_numbers(index):
+    hits = index.search("karthick raja")
+    assert list(hits.index) == [13] and hits.iloc[0]["Match"] == "fuzzy"
+    assert index.search("953025").empty
+
+
+def test_limit_and_empty_query(index):
+    assert len(index.search("953024", limit=2)) == 2
+    assert index.search("   ").empty
+
+
+def test_update_reindexes_changed_rows(index):
+    changed = pd.DataFrame({"Name": ["Priya Lakshmi"], "Register Number": ["953024CSE002"], "Batch": ["2024"],
+                            "Department": ["CSE"], "UMIS Number": [333333.0], "EMIS Number": ["9003"]},
+                           index=[12])
+    index.update(changed)
+    assert list(index.search("lakshmi").index) == [12]
+    assert 12 not in index.search("devi").index
+
+
+def test_store_index_follows_new_students(store):
+    store.append_student({"Register Number": "NEWREG01", "Name": "Zara Quinn"})
+    hits = search_index(store).search("zara")
+    assert list(hits["Register Number"]) == ["NEWREG01"]
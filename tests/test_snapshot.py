@@ -0,0 +1,66 @@
+# test_snapshot.py
+import os
+
+import pandas as pd
+import pytest
+
+from datastore import data_cache, write_excel_data
+from journal import JournaledStore
+from snapshot import read_snapshot, snapshot_path_for, write_snapshot
+
+pytest.importorskip("pyarrow")
+
+
+def test_round_trip_keeps_values_types_and_checkpoint(tmp_path, students):
+    path = str(tmp_path / "abi.snapshot.arrow")
+    df = students.copy()
+    df["Mobile Number"] = [9876543210] + [str(v) for v in df["Mobile Number"].iloc[1:]]  # mixed Excel types
+    write_snapshot(df, path, checkpoint={"generation": "g1", "offset": 42})
+    back = read_snapshot(path)
+    assert back.attrs["checkpoint"] == {"generation": "g1", "offset": 42}
+    assert back["Mobile Number"].iloc[0] == "9876543210"
+    assert back["Paid Fees 1st year"].dtype == "float64"
+    assert list(back["Register Number"]) == list(students["Register Number"])
+    assert back["Total Fees 2nd year"].tolist() == students["Total Fees 2nd year"].tolist()
+
+
+def test_missing_snapshot_reads_empty(tmp_path):
+    df = read_snapshot(str(tmp_path / "none.snapshot.arrow"))
+    assert df.empty and "Register Number" in df.columns and df.attrs["checkpoint"] is None
+
+
+def test_workbook_is_imported_once(tmp_path, students):
+    data_file = str(tmp_path / "abi.xlsx")
+    write_excel_data(students, data_file)
+    df = JournaledStore(data_file).load()
+    assert os.path.exists(snapshot_path_for(data_file))
+    assert list(df["Register Number"]) == list(students["Register Number"])
+    os.remove(data_file)  # later loads read the snapshot only
+    assert list(_reopen(data_file)["Register Number"]) == list(students["Register Number"])
+
+
+def _reopen(data_file):
+    data_cache.invalidate()  # as in a new process
+    return JournaledStore(data_file).load()
+
+
+def test_journal_tail_is_replayed_once_after_the_checkpoint(tmp_path, students):
+    data_file = str(tmp_path / "abi.xlsx")
+    store = JournaledStore(data_file, compact_every=0)
+    store.save_frame(students)
+    paid = float(students.at[0, "Paid Fees 1st year"])
+    store.record_payment(0, "1st year", 10.0, receipt_no="R-1")
+    store.compact()  # R-1 is now in the snapshot; its checkpoint points past it
+    store.record_payment(0, "1st year", 20.0, receipt_no="R-2")  # only in the journal
+    assert read_snapshot(snapshot_path_for(data_file)).at[0, "Paid Fees 1st year"] == pytest.approx(paid + 10.0)
+    assert _reopen(data_file).at[0, "Paid Fees 1st year"] == pytest.approx(paid + 30.0)
+
+
+def test_export_writes_the_current_data_to_the_workbook(tmp_path, students):
+    data_file = str(tmp_path / "abi.xlsx")
+    store = JournaledStore(data_file)
+    store.save_frame(students)
+    store.record_payment(0, "1st year", 10.0, receipt_no="R-1")
+    store.export_excel(data_file)
+    workbook = pd.read_excel(data_file)
+    assert workbook.at[0, "Paid Fees 1st year"] == pytest.approx(students.at[0, "Paid Fees 1st year"] + 10.0)
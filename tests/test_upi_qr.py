@@ -0,0 +1,46 @@
+# test_upi_qr.py
+import io
+import re
+
+import segno
+
+from upi_qr import QR_SCALE, SHEET_COLUMNS, SHEET_ROWS, payment_reference, qr_png, qr_sheet_pdf, student_payments, upi_link
+
+
+def test_payment_reference():
+    assert payment_reference("9530-21 cs/001", "2nd year") == "FMS953021CS001Y2"
+    assert payment_reference(953021001, "4th year") == "FMS953021001Y4"
+
+
+def test_upi_link_payload():
+    link = upi_link("college@oksbi", "DR.G.U.Pope College", 1500, reference="FMSR1Y1", note="Exam fees")
+    assert link == ("upi://pay?pa=college@oksbi&pn=DR.G.U.Pope%20College&am=1500.00&cu=INR"
+                    "&tr=FMSR1Y1&tn=Exam%20fees")
+    assert upi_link("a@b", "P", 10.5) == "upi://pay?pa=a@b&pn=P&am=10.50&cu=INR"
+
+
+def test_qr_encodes_the_link_and_is_cached():
+    png = qr_png("college@oksbi", "College", 1500.0, "FMSR1Y1")
+    assert png.startswith(b"\x89PNG")
+    expected = io.BytesIO()
+    segno.make(upi_link("college@oksbi", "College", 1500.0, "FMSR1Y1"), error="m").save(
+        expected, kind="png", scale=QR_SCALE, border=2)
+    assert png == expected.getvalue()
+    assert qr_png("college@oksbi", "College", "1500", "FMSR1Y1") is png  # same amount, same cache entry
+
+
+def test_student_payments_lists_only_dues(students):
+    payments = student_payments(students, "1st year")
+    owing = students[students["Remaining Fees 1st year"] > 0]
+    assert list(payments["Register Number"]) == list(owing["Register Number"].astype(str))
+    assert list(payments["Amount"]) == list(owing["Remaining Fees 1st year"])
+    assert list(payments["Reference"]) == [payment_reference(reg, "1st year") for reg in owing["Register Number"]]
+
+
+def test_qr_sheet_has_one_page_per_twelve_students(students):
+    payments = student_payments(students, "1st year")
+    pdf = qr_sheet_pdf(payments, "college@oksbi", "College", title="Batch sheet")
+    per_page = SHEET_COLUMNS * SHEET_ROWS
+    pages = len(re.findall(rb"/Type /Page\b(?!s)", pdf))
+    assert pages == max(1, -(-len(payments) // per_page))
+    assert qr_sheet_pdf(payments.iloc[0:0], "college@oksbi", "College").startswith(b"%PDF")